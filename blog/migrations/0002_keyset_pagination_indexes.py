@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogentry',
+            index=models.Index(fields=['-publication_date', '-id'], name='blog_publication_id_idx'),
+        ),
+    ]
@@ -16,3 +16,7 @@ class BlogEntry(models.Model):
     class Meta:
         verbose_name = 'Запись блога'
         verbose_name_plural = 'Записи блога'
+        indexes = [
+            # Постраничный вывод записей блога по ключу (дата публикации, id)
+            models.Index(fields=['-publication_date', '-id'], name='blog_publication_id_idx'),
+        ]
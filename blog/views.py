@@ -6,6 +6,8 @@ from django.views.generic import ListView, CreateView, UpdateView, DeleteView, D
 
 from blog.forms import BlogEntryForm
 from blog.models import BlogEntry
+from config.pagination import KeysetPaginationMixin
+from users.services import has_manager_access
 
 
 class ManagerOrSuperuserMixin(UserPassesTestMixin):
@@ -15,20 +17,20 @@ class ManagerOrSuperuserMixin(UserPassesTestMixin):
     """
 
     def test_func(self) -> bool:
-        user = self.request.user
-        return user.groups.filter(name='Managers').exists() or user.is_superuser
+        return has_manager_access(self.request.user)
 
 
-class BlogEntryListView(ListView):
+class BlogEntryListView(KeysetPaginationMixin, ListView):
     """
     Класс-контроллер для страницы со всеми записями блога,
-    сортированным по дате публикации от более новых к более старым.
+    сортированным по дате публикации от более новых к более старым
+    и выводимым постранично по ключу (дата публикации, id).
     Право просмотра есть у всех
     """
 
     model = BlogEntry
     template_name = 'blog/blog_entry_list.html'
-    ordering = '-publication_date'
+    keyset_ordering = ('-publication_date', '-id')
 
 
 class BlogEntryCreateView(ManagerOrSuperuserMixin, CreateView):
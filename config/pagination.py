@@ -0,0 +1,127 @@
+"""
+Постраничный вывод списков по ключу (keyset pagination).
+
+Вместо номера страницы (OFFSET) и общего количества записей (COUNT(*)) ссылки на соседние
+страницы содержат курсор - значения полей сортировки первой или последней записи страницы.
+Следующая страница выбирается условием "после курсора" по тем же полям, поэтому запрос
+читает из индекса только записи страницы независимо от того, насколько она далеко от начала.
+Последнее поле сортировки должно быть уникальным (обычно id), чтобы порядок был однозначным
+"""
+
+import base64
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.http import Http404
+
+
+@dataclass
+class KeysetPage:
+    """Страница списка: записи и курсоры для ссылок на предыдущую и следующую страницы"""
+
+    object_list: list
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+def encode_cursor(values: list) -> str:
+    """Функция кодирования значений полей сортировки записи в курсор для адреса страницы"""
+
+    data = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, queryset: QuerySet, ordering: tuple[str, ...]) -> list:
+    """
+    Функция декодирования курсора в значения полей сортировки.
+    Для неверного курсора выбрасывается Http404, как для несуществующей страницы
+    """
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError
+        return [
+            queryset.model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except Exception:
+        raise Http404('Неверный курсор страницы')
+
+
+def seek(queryset: QuerySet, ordering: tuple[str, ...], values: list, backwards: bool = False) -> QuerySet:
+    """
+    Функция фильтрации записей, следующих в порядке ordering после записи
+    со значениями полей values (или предшествующих ей, если backwards).
+    Условие (a, b) > (x, y) раскрывается в a > x OR (a = x AND b > y)
+    с учетом направления сортировки каждого поля
+    """
+
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != backwards
+        condition |= equal & Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+        equal &= Q(**{name: value})
+    return queryset.filter(condition)
+
+
+class KeysetPaginationMixin:
+    """
+    Миксин для ListView, заменяющий постраничный вывод Django выводом по ключу.
+
+    Порядок записей задается атрибутом keyset_ordering (последнее поле уникально),
+    курсоры передаются в параметрах адреса after (следующая страница) и before (предыдущая).
+    В шаблоне ссылки выводятся включением pagination.html
+    """
+
+    keyset_ordering: tuple[str, ...] = ('-id',)
+
+    def get_paginate_by(self, queryset: QuerySet) -> int:
+        return self.paginate_by or settings.LIST_PAGE_SIZE
+
+    def get_cursor(self, obj) -> str:
+        return encode_cursor([getattr(obj, field.lstrip('-')) for field in self.keyset_ordering])
+
+    def paginate_queryset(self, queryset: QuerySet, page_size: int) -> tuple:
+        ordering = self.keyset_ordering
+        queryset = queryset.order_by(*ordering)
+        after = self.request.GET.get('after')
+        before = self.request.GET.get('before')
+
+        if before:
+            reverse_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+            values = decode_cursor(before, queryset, ordering)
+            object_list = list(
+                seek(queryset, ordering, values, backwards=True).order_by(*reverse_ordering)[:page_size + 1]
+            )
+            has_previous = len(object_list) > page_size
+            object_list = object_list[:page_size][::-1]
+            has_next = True
+        else:
+            if after:
+                queryset = seek(queryset, ordering, decode_cursor(after, queryset, ordering))
+            object_list = list(queryset[:page_size + 1])
+            has_next = len(object_list) > page_size
+            object_list = object_list[:page_size]
+            has_previous = bool(after)
+
+        page = KeysetPage(object_list)
+        if object_list:
+            if has_next:
+                page.next_cursor = self.get_cursor(object_list[-1])
+            if has_previous:
+                page.previous_cursor = self.get_cursor(object_list[0])
+        return None, page, object_list, page.has_other_pages()
@@ -129,6 +129,62 @@ CRONJOBS = [
     ('*/5 * * * *', 'mailing.services.send_mails_regular'),
 ]
 
+# Количество логов рассылки, записываемых в базу данных одним запросом
+MAILING_LOG_BATCH_SIZE = 500
+
+# Количество потоков для параллельной отправки писем рассылок
+MAILING_WORKERS = 1
+
+# Движок отправки писем: 'smtp' (синхронный) или 'asyncio' (mailing.async_smtp)
+MAILING_ENGINE = 'smtp'
+# Максимальное количество одновременных SMTP-сессий асинхронного движка
+MAILING_ASYNC_CONCURRENCY = 100
+# Количество писем, отправляемых в одной SMTP-сессии асинхронного движка
+MAILING_ASYNC_MESSAGES_PER_CONNECTION = 50
+# Таймаут операций с SMTP-сервером в секундах
+MAILING_SMTP_TIMEOUT = 30
+
+# Интервал подгрузки изменившихся рассылок планировщиком (run_scheduler) в секундах
+MAILING_SCHEDULER_RELOAD_INTERVAL = 60
+
+# Размер пачки получателей, захватываемой процессом отправки в режиме захвата работы
+MAILING_CLAIM_BATCH_SIZE = 100
+# Время аренды захваченной пачки в секундах, после которого она снова доступна другим процессам
+MAILING_CLAIM_LEASE = 600
+# Пауза в секундах перед повторным захватом, если ожидающие записи захватывают другие процессы
+MAILING_CLAIM_RETRY_DELAY = 0.1
+
+# Ограничение скорости отправки писем (лимиты почтового провайдера):
+# писем в секунду (0 - без ограничения), размер всплеска и дневной лимит писем (0 - без лимита)
+MAILING_RATE_LIMIT = float(os.getenv('MAILING_RATE_LIMIT') or 0)
+MAILING_RATE_BURST = int(os.getenv('MAILING_RATE_BURST') or 1)
+MAILING_DAILY_CAP = int(os.getenv('MAILING_DAILY_CAP') or 0)
+# Максимальное время ожидания разрешения на отправку письма в секундах,
+# после которого письмо откладывается до следующего запуска отправки
+MAILING_RATE_MAX_WAIT = 5
+
+# Повторные отправки после неудачных попыток: начальная и максимальная задержка в секундах
+# и количество попыток, после которого письмо считается окончательно не доставленным
+MAILING_RETRY_BASE_DELAY = 60
+MAILING_RETRY_MAX_DELAY = 6 * 60 * 60
+MAILING_RETRY_MAX_ATTEMPTS = 5
+
+# Количество закодированных сообщений рассылок, хранимых в кеше MIME-сообщений
+MAILING_MIME_CACHE_SIZE = 32
+# Количество скомпилированных шаблонов персонализированных сообщений в кеше
+MAILING_TEMPLATE_CACHE_SIZE = 128
+
+# Количество дней, в течение которых хранятся логи рассылок (см. команду compact_logs)
+MAILING_LOG_RETENTION_DAYS = 90
+# Количество дней, в течение которых хранятся отправленные исходящие письма (см. команду purge_outbox)
+MAILING_OUTBOX_RETENTION_DAYS = 7
+
+# Сбор метрик запусков отправки писем: файл JSON lines с метриками каждого запуска
+# и токен доступа к странице метрик в формате Prometheus (/metrics/)
+MAILING_METRICS_ENABLED = True
+MAILING_METRICS_FILE = BASE_DIR / 'dispatch_metrics.jsonl'
+MAILING_METRICS_TOKEN = os.getenv('MAILING_METRICS_TOKEN')
+
 CRONTAB_COMMAND_SUFFIX = f'>> {BASE_DIR / "crontab_log.log"} 2>&1'
 
 # Static files (CSS, JavaScript, Images)
@@ -154,6 +210,9 @@ LOGOUT_REDIRECT_URL = '/'
 
 LOGIN_URL = '/users/'
 
+# Количество записей на странице списков (постраничный вывод по ключу, см. config.pagination)
+LIST_PAGE_SIZE = 20
+
 EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT'))
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
@@ -161,6 +220,10 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL') == 'True'
 
 CACHE_ENABLED = os.getenv('CACHE_ENABLED') == 'True'
+# Время хранения карточки статистики пользователя в кеше (сбрасывается при изменении данных)
+STATISTIC_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+# Время хранения роли пользователя (менеджер или нет) в кеше (сбрасывается при изменении групп)
+USER_ROLE_CACHE_TIMEOUT = 24 * 60 * 60
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from mailing.models import Client, Message, Log, Mailing
+from mailing.models import Client, Message, Log, Mailing, RecipientSchedule, DeliveryRetry, Outbox, \
+    DeliveryStats, UserStats
 
 # Register your models here.
 
@@ -23,6 +24,8 @@ class LogAdmin(admin.ModelAdmin):
     list_display = ('last_try', 'status', 'server_response', 'client', 'mailing')
     search_fields = ('last_try', 'status', 'server_response')
     list_filter = ('last_try', 'status', 'server_response')
+    list_select_related = ('client', 'mailing__message')
+    show_full_result_count = False
 
 
 @admin.register(Mailing)
@@ -30,3 +33,35 @@ class MailingAdmin(admin.ModelAdmin):
     list_display = ('start_time', 'end_time', 'frequency', 'status', 'message')
     search_fields = ('start_time', 'end_time', 'frequency', 'status', 'message')
     list_filter = ('start_time', 'end_time', 'frequency', 'status', 'message')
+
+
+@admin.register(RecipientSchedule)
+class RecipientScheduleAdmin(admin.ModelAdmin):
+    list_display = ('mailing', 'client', 'next_send_at', 'last_try')
+    list_filter = ('next_send_at',)
+
+
+@admin.register(DeliveryRetry)
+class DeliveryRetryAdmin(admin.ModelAdmin):
+    list_display = ('mailing', 'client', 'attempts', 'retry_at', 'status')
+    list_filter = ('status', 'retry_at')
+
+
+@admin.register(Outbox)
+class OutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'email', 'subject', 'status', 'created_at', 'sent_at', 'claimed_by', 'claimed_until')
+    search_fields = ('email', 'subject')
+    list_filter = ('status',)
+
+
+@admin.register(DeliveryStats)
+class DeliveryStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'mailing', 'status', 'count')
+    list_filter = ('day', 'status')
+    list_select_related = ('mailing__message',)
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_mailings', 'active_mailings', 'unique_clients')
+    list_select_related = ('user',)
@@ -0,0 +1,368 @@
+"""
+Асинхронный движок отправки писем по SMTP на asyncio.
+
+Позволяет держать сотни SMTP-сессий одновременно в одном процессе:
+количество одновременных сессий ограничено семафором, каждая сессия отправляет
+пачку писем подряд, а команды конверта письма (MAIL FROM, RCPT TO, DATA)
+передаются одним пакетом, если сервер поддерживает расширение PIPELINING.
+
+Также содержит простой SMTP-сервер-заглушку (StubSMTPServer),
+который принимает все письма и используется для замеров без реального провайдера
+"""
+
+import asyncio
+import base64
+import re
+import ssl
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+
+class AsyncSMTPError(Exception):
+    """Ошибка SMTP-сессии с кодом ответа сервера"""
+
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(f'{code} {message}')
+        self.code = code
+
+
+@dataclass
+class OutgoingEmail:
+    """Готовое к отправке письмо: отправитель, получатели и закодированное тело"""
+
+    from_email: str
+    recipients: list[str]
+    data: bytes
+
+
+@dataclass
+class DeliveryResult:
+    """Результат отправки одного письма"""
+
+    success: bool
+    code: int | None = None
+    error: str | None = None
+    deferred: bool = False
+
+
+class AsyncSMTPSession:
+    """SMTP-сессия поверх потоков asyncio с поддержкой PIPELINING"""
+
+    def __init__(self, host: str, port: int, username: str | None = None, password: str | None = None,
+                 use_ssl: bool = False, use_tls: bool = False, timeout: float = 30) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.extensions = set()
+        self.reader = None
+        self.writer = None
+
+    async def _read_reply(self) -> tuple[int, str]:
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionError('SMTP-сервер закрыл соединение')
+            line = line.decode('utf-8', 'replace').rstrip('\r\n')
+            lines.append(line[4:])
+            if line[3:4] != '-':
+                return int(line[:3]), '\n'.join(lines)
+
+    async def _command(self, command: str, expected: tuple[int, ...]) -> tuple[int, str]:
+        self.writer.write(command.encode() + b'\r\n')
+        await asyncio.wait_for(self.writer.drain(), self.timeout)
+        code, message = await self._read_reply()
+        if code not in expected:
+            raise AsyncSMTPError(code, message)
+        return code, message
+
+    async def _ehlo(self) -> None:
+        code, message = await self._command('EHLO localhost', (250,))
+        self.extensions = {line.split()[0].lower() for line in message.splitlines()[1:] if line}
+
+    async def connect(self) -> None:
+        ssl_context = ssl.create_default_context() if self.use_ssl else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context),
+            self.timeout
+        )
+        code, message = await self._read_reply()
+        if code != 220:
+            raise AsyncSMTPError(code, message)
+
+        await self._ehlo()
+        if self.use_tls and not self.use_ssl:
+            await self._command('STARTTLS', (220,))
+            await asyncio.wait_for(self.writer.start_tls(ssl.create_default_context()), self.timeout)
+            await self._ehlo()
+
+        if self.username and self.password:
+            credentials = f'\0{self.username}\0{self.password}'.encode()
+            await self._command(f'AUTH PLAIN {base64.b64encode(credentials).decode()}', (235,))
+
+    async def send(self, email: OutgoingEmail) -> DeliveryResult:
+        """
+        Отправка одного письма в рамках открытой сессии.
+
+        При поддержке PIPELINING команды конверта отправляются одним пакетом,
+        а ответы на них читаются после этого по очереди
+        """
+
+        commands = [f'MAIL FROM:<{email.from_email}>']
+        commands += [f'RCPT TO:<{recipient}>' for recipient in email.recipients]
+        commands.append('DATA')
+
+        if 'pipelining' in self.extensions:
+            self.writer.write(''.join(f'{command}\r\n' for command in commands).encode())
+            await asyncio.wait_for(self.writer.drain(), self.timeout)
+            replies = [await self._read_reply() for _ in commands]
+        else:
+            replies = []
+            for command in commands:
+                self.writer.write(command.encode() + b'\r\n')
+                await asyncio.wait_for(self.writer.drain(), self.timeout)
+                replies.append(await self._read_reply())
+                if replies[-1][0] >= 400:
+                    break
+
+        code, message = replies[-1]
+        if code != 354:
+            await self._command('RSET', (250,))
+            failed = next((reply for reply in replies if reply[0] >= 400), replies[-1])
+            return DeliveryResult(success=False, code=failed[0], error=failed[1])
+
+        code, message = await self._end_data(email.data)
+        if code != 250:
+            return DeliveryResult(success=False, code=code, error=message)
+        return DeliveryResult(success=True, code=code)
+
+    async def _end_data(self, data: bytes) -> tuple[int, str]:
+        data = re.sub(rb'(?m)^\.', b'..', data)
+        if data and not data.endswith(b'\r\n'):
+            data += b'\r\n'
+        self.writer.write(data + b'.\r\n')
+        await asyncio.wait_for(self.writer.drain(), self.timeout)
+        return await self._read_reply()
+
+    async def close(self) -> None:
+        if self.writer is None:
+            return
+        try:
+            await self._command('QUIT', (221,))
+        except (OSError, asyncio.TimeoutError, AsyncSMTPError):
+            pass
+        finally:
+            self.writer.close()
+            self.writer = None
+
+
+class AsyncSMTPDispatcher:
+    """
+    Диспетчер асинхронной отправки писем.
+
+    Делит письма на пачки не более чем по messages_per_connection так,
+    чтобы задействовать до concurrency сессий; каждая пачка отправляется
+    в своей SMTP-сессии, одновременно открыто не более concurrency сессий.
+
+    Если передан лимитер скорости отправки (limiter, см. mailing.throttling.TokenBucket),
+    перед каждым письмом ожидается токен не дольше max_wait секунд,
+    а письма, для которых токен не получен, помечаются как отложенные (deferred).
+    Синхронный метод limiter.take (кеш Django и блокировка) выполняется в отдельном потоке,
+    чтобы не блокировать цикл событий.
+
+    Если соединение оборвалось или истёк таймаут во время отправки письма, сессия
+    переустанавливается один раз на пачку и письмо отправляется повторно; остальные письма
+    пачки помечаются как неотправленные только при повторном обрыве или ошибке подключения и авторизации.
+
+    Если передан observer, он вызывается с названием замера ('smtp_connect' или 'smtp_send')
+    и его длительностью в секундах после установки каждой сессии и отправки каждого письма
+    """
+
+    def __init__(self, host: str, port: int, username: str | None = None, password: str | None = None,
+                 use_ssl: bool = False, use_tls: bool = False, timeout: float = 30,
+                 concurrency: int = 100, messages_per_connection: int = 50,
+                 limiter=None, max_wait: float = 0,
+                 observer: Callable[[str, float], None] | None = None) -> None:
+        self.session_kwargs = {
+            'host': host,
+            'port': port,
+            'username': username,
+            'password': password,
+            'use_ssl': use_ssl,
+            'use_tls': use_tls,
+            'timeout': timeout,
+        }
+        self.concurrency = concurrency
+        self.messages_per_connection = messages_per_connection
+        self.limiter = limiter
+        self.max_wait = max_wait
+        self.observer = observer
+
+    def _observe(self, name: str, start: float) -> None:
+        if self.observer is not None:
+            self.observer(name, time.perf_counter() - start)
+
+    async def _acquire(self) -> bool:
+        if self.limiter is None:
+            return True
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while True:
+            wait = await asyncio.to_thread(self.limiter.take)
+            if wait is None:
+                return False
+            if wait == 0:
+                return True
+            if loop.time() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    async def _connect(self, session: AsyncSMTPSession) -> None:
+        start = time.perf_counter()
+        await session.connect()
+        self._observe('smtp_connect', start)
+
+    async def _send_chunk(self, semaphore: asyncio.Semaphore, emails: list[OutgoingEmail]) -> list[DeliveryResult]:
+        results = []
+        async with semaphore:
+            session = AsyncSMTPSession(**self.session_kwargs)
+            reconnected = False
+            try:
+                await self._connect(session)
+                for email in emails:
+                    if not await self._acquire():
+                        results.append(DeliveryResult(success=False, deferred=True))
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        result = await session.send(email)
+                    except (OSError, asyncio.TimeoutError):
+                        if reconnected:
+                            raise
+                        reconnected = True
+                        await session.close()
+                        session = AsyncSMTPSession(**self.session_kwargs)
+                        await self._connect(session)
+                        start = time.perf_counter()
+                        result = await session.send(email)
+                    results.append(result)
+                    self._observe('smtp_send', start)
+            except (OSError, asyncio.TimeoutError, AsyncSMTPError) as error:
+                code = error.code if isinstance(error, AsyncSMTPError) else None
+                results += [DeliveryResult(success=False, code=code, error=str(error) or repr(error))
+                            for _ in emails[len(results):]]
+            finally:
+                await session.close()
+        return results
+
+    async def send_all(self, emails: list[OutgoingEmail]) -> list[DeliveryResult]:
+        """Отправка всех писем; результаты возвращаются в порядке писем"""
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        size = max(1, min(self.messages_per_connection, -(-len(emails) // self.concurrency)))
+        chunks = [emails[index:index + size] for index in range(0, len(emails), size)]
+        chunk_results = await asyncio.gather(*(self._send_chunk(semaphore, chunk) for chunk in chunks))
+        return [result for results in chunk_results for result in results]
+
+    def send(self, emails: list[OutgoingEmail]) -> list[DeliveryResult]:
+        return asyncio.run(self.send_all(emails))
+
+
+class StubSMTPServer:
+    """
+    SMTP-сервер-заглушка для замеров производительности.
+
+    Принимает любые письма, кроме адресованных получателям из rejected_recipients
+    (на них отвечает кодом 550), поддерживает PIPELINING и может имитировать
+    задержку ответа сервера (latency, в секундах) на каждое письмо.
+    Принятые письма сохраняются в messages, если включено сохранение (keep_messages).
+    Если задан drop_after, сервер один раз обрывает соединение без ответа на MAIL FROM
+    после того, как принял drop_after писем
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8025, latency: float = 0,
+                 rejected_recipients: tuple[str, ...] = (), keep_messages: bool = False,
+                 drop_after: int | None = None) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.rejected_recipients = {recipient.lower() for recipient in rejected_recipients}
+        self.keep_messages = keep_messages
+        self.drop_after = drop_after
+        self.dropped = False
+        self.received = 0
+        self.messages = []
+        self.server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(b'220 stub ESMTP\r\n')
+        mail_from = None
+        recipients = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                argument = line.decode('utf-8', 'replace').strip()
+                command = argument.upper()
+                if command.startswith(('EHLO', 'HELO')):
+                    writer.write(b'250-stub\r\n250-PIPELINING\r\n250 8BITMIME\r\n')
+                elif command.startswith('MAIL FROM:'):
+                    if self.drop_after is not None and not self.dropped and self.received >= self.drop_after:
+                        self.dropped = True
+                        break
+                    mail_from = argument[10:].strip('<>')
+                    recipients = []
+                    writer.write(b'250 OK\r\n')
+                elif command.startswith('RCPT TO:'):
+                    recipient = argument[8:].strip('<>')
+                    if recipient.lower() in self.rejected_recipients:
+                        writer.write(b'550 Mailbox unavailable\r\n')
+                    else:
+                        recipients.append(recipient)
+                        writer.write(b'250 OK\r\n')
+                elif command == 'DATA':
+                    if not recipients:
+                        writer.write(b'554 No valid recipients\r\n')
+                        await writer.drain()
+                        continue
+                    writer.write(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                    await writer.drain()
+                    lines = []
+                    while (data_line := await reader.readline()) not in (b'.\r\n', b''):
+                        lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self.received += 1
+                    if self.keep_messages:
+                        self.messages.append((mail_from, recipients, b''.join(lines)))
+                    writer.write(b'250 OK\r\n')
+                elif command == 'QUIT':
+                    writer.write(b'221 Bye\r\n')
+                    break
+                else:
+                    writer.write(b'250 OK\r\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
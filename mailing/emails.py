@@ -0,0 +1,192 @@
+"""
+Подготовка писем рассылок к отправке.
+
+MIME-представление сообщения рассылки (Message) собирается и кодируется один раз
+и хранится в небольшом ограниченном кеше по ключу (id сообщения, updated_at).
+Письмо каждому получателю - дешевая копия готового MIME-сообщения
+с подставленными адресом получателя, датой и идентификатором письма.
+
+Если тело сообщения содержит переменные шаблона ({{ name }}, {{ email }}, {{ comment }}),
+оно один раз компилируется в шаблон Django, который хранится в таком же кеше
+и рендерится для каждого получателя с минимальным контекстом.
+Тело без этих переменных отправляется как есть, даже если содержит фигурные скобки.
+Ошибки шаблона (TEMPLATE_ERRORS) проверяются формой сообщения (check_template),
+а при отправке обрабатываются для каждого получателя отдельно
+"""
+
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from email.mime.base import MIMEBase
+from email.utils import formatdate, make_msgid
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.core.mail.utils import DNS_NAME
+from django.template import Context, Engine, Template, TemplateDoesNotExist, TemplateSyntaxError
+
+from mailing.models import Client, Message
+
+# Письма рассылок - простой текст, поэтому значения переменных не экранируются
+template_engine = Engine(autoescape=False)
+
+# Переменные получателя, доступные в теле сообщения
+TEMPLATE_VARIABLES = ('name', 'email', 'comment')
+TEMPLATE_VARIABLE_RE = re.compile(r'{{\s*(%s)\b' % '|'.join(TEMPLATE_VARIABLES))
+
+# Ошибки компиляции и рендеринга шаблона тела сообщения
+TEMPLATE_ERRORS = (TemplateSyntaxError, TemplateDoesNotExist)
+
+
+class LRUCache:
+    """Потокобезопасный кеш ограниченного размера с вытеснением давно не использованных записей"""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self.lock:
+            if key not in self.items:
+                return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def set(self, key: Hashable, value) -> None:
+        with self.lock:
+            self.items[key] = value
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+_mime_cache = LRUCache(settings.MAILING_MIME_CACHE_SIZE)
+_template_cache = LRUCache(settings.MAILING_TEMPLATE_CACHE_SIZE)
+
+
+def get_prebuilt_mime(message: Message) -> MIMEBase:
+    """
+    Функция, возвращающая закодированное MIME-представление сообщения рассылки
+    без адреса получателя, даты и идентификатора письма.
+
+    Результат кешируется по ключу (id сообщения, updated_at); при превышении
+    размера кеша MAILING_MIME_CACHE_SIZE удаляется давно не использованная запись
+    """
+
+    key = (message.pk, message.updated_at)
+    mime = _mime_cache.get(key)
+    if mime is not None:
+        return mime
+
+    mime = EmailMessage(
+        subject=message.subject,
+        body=message.body,
+        from_email=settings.EMAIL_HOST_USER
+    ).message()
+    del mime['Date']
+    del mime['Message-ID']
+
+    _mime_cache.set(key, mime)
+    return mime
+
+
+def is_personalised(message: Message) -> bool:
+    """
+    Функция проверки, содержит ли тело сообщения переменные получателя (TEMPLATE_VARIABLES).
+    Тела с другими фигурными скобками шаблоном не считаются
+    """
+
+    return TEMPLATE_VARIABLE_RE.search(message.body or '') is not None
+
+
+def check_template(body: str) -> None:
+    """
+    Функция проверки тела сообщения с переменными получателя: шаблон компилируется
+    и рендерится с пустыми значениями переменных. Выбрасывает исключение из TEMPLATE_ERRORS
+    """
+
+    template_engine.from_string(body).render(Context(dict.fromkeys(TEMPLATE_VARIABLES, '')))
+
+
+def get_compiled_template(message: Message) -> Template:
+    """
+    Функция, возвращающая скомпилированный шаблон тела сообщения рассылки.
+    Шаблоны кешируются по ключу (id сообщения, updated_at)
+    """
+
+    key = (message.pk, message.updated_at)
+    template = _template_cache.get(key)
+    if template is None:
+        template = template_engine.from_string(message.body or '')
+        _template_cache.set(key, template)
+    return template
+
+
+def render_body(message: Message, client: Client) -> str:
+    """Функция персонализации тела сообщения рассылки для конкретного клиента"""
+
+    return get_compiled_template(message).render(Context({
+        'name': client.name,
+        'email': client.email,
+        'comment': client.comment or '',
+    }))
+
+
+def build_mailing_email(message: Message, client: Client) -> EmailMessage:
+    """
+    Функция создания письма с сообщением рассылки для конкретного клиента.
+
+    Сообщение без переменных шаблона отправляется копией закешированного MIME-сообщения,
+    сообщение с переменными рендерится для клиента из закешированного шаблона.
+    Для ошибочного шаблона выбрасывается исключение из TEMPLATE_ERRORS
+    """
+
+    if not is_personalised(message):
+        return PrebuiltEmailMessage(message, to=[client.email])
+
+    return EmailMessage(
+        subject=message.subject,
+        body=render_body(message, client),
+        from_email=settings.EMAIL_HOST_USER,
+        to=[client.email]
+    )
+
+
+def benchmark_render(message: Message, client: Client, iterations: int) -> float:
+    """Функция замера скорости рендеринга тела сообщения (рендеров в секунду)"""
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render_body(message, client)
+    duration = time.perf_counter() - start
+    return iterations / duration if duration else 0
+
+
+class PrebuiltEmailMessage(EmailMessage):
+    """
+    Письмо рассылки, MIME-представление которого берется из кеша (get_prebuilt_mime)
+    и только копируется с заменой заголовков получателя
+    """
+
+    def __init__(self, message: Message, to: list[str]) -> None:
+        super().__init__(
+            subject=message.subject,
+            body=message.body,
+            from_email=settings.EMAIL_HOST_USER,
+            to=to
+        )
+        self.prebuilt_mime = get_prebuilt_mime(message)
+
+    def message(self) -> MIMEBase:
+        mime = copy.copy(self.prebuilt_mime)
+        mime._headers = list(self.prebuilt_mime._headers)
+        self._set_list_header_if_not_empty(mime, 'To', self.to)
+        mime['Date'] = formatdate(localtime=settings.EMAIL_USE_LOCALTIME)
+        mime['Message-ID'] = make_msgid(domain=DNS_NAME)
+        return mime
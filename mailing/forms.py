@@ -1,6 +1,7 @@
 from django import forms
 from django.forms import DateTimeInput
 
+from mailing.emails import TEMPLATE_ERRORS, check_template, is_personalised
 from mailing.models import Client, Message, Mailing
 
 
@@ -36,8 +37,19 @@ class MessageForm(StyleFormMixin, forms.ModelForm):
     Форма для модели Сообщения (Message).
 
     Устанавливает по умолчанию высоту области ввода тела письма равной 3 строкам
+    и подсказку о переменных для персонализации письма.
+    Тело письма с переменными проверяется как шаблон
     """
 
+    def clean_body(self) -> str:
+        body = self.cleaned_data['body']
+        if is_personalised(Message(body=body)):
+            try:
+                check_template(body)
+            except TEMPLATE_ERRORS as error:
+                raise forms.ValidationError(f'Ошибка в шаблоне письма: {error}')
+        return body
+
     class Meta:
         model = Message
         fields = '__all__'
@@ -48,6 +60,9 @@ class MessageForm(StyleFormMixin, forms.ModelForm):
         widgets = {
             'body': forms.Textarea(attrs={'rows': 3}),
         }
+        help_texts = {
+            'body': 'Можно использовать переменные {{ name }}, {{ email }} и {{ comment }} получателя',
+        }
 
 
 class MailingForm(StyleFormMixin, forms.ModelForm):
@@ -0,0 +1,263 @@
+"""
+Генерация синтетических данных для нагрузочного тестирования.
+
+Пользователи, клиенты, сообщения, рассылки и записи блога создаются через bulk_create.
+Получатели рассылок (промежуточная таблица M2M), история логов рассылок и расписание отправок,
+объем которых измеряется миллионами строк, записываются пачками многострочными INSERT
+(на PostgreSQL) или через executemany без создания объектов моделей;
+расписание и сводная статистика считаются по сгенерированным логам в памяти,
+без повторного чтения таблицы логов.
+Все случайные значения берутся из генератора с заданным зерном (seed),
+поэтому при одинаковых параметрах данные воспроизводятся
+"""
+
+import random
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Model
+from django.utils import timezone
+
+from blog.models import BlogEntry
+from mailing import services
+from mailing.models import Client, Log, Mailing, Message, RecipientSchedule, DeliveryStats
+from users.models import User
+
+
+def bulk_create_chunked(model: type[Model], objects: Iterable[Model], batch_size: int) -> int:
+    """
+    Функция записи объектов через bulk_create пачками по batch_size
+    без построения полного списка объектов в памяти.
+    Возвращает количество записанных объектов
+    """
+
+    objects = iter(objects)
+    count = 0
+    while chunk := list(islice(objects, batch_size)):
+        model.objects.bulk_create(chunk, batch_size=batch_size)
+        count += len(chunk)
+    return count
+
+
+def generate_load_data(users: int = 10, clients: int = 10000, messages: int = 20, mailings: int = 100,
+                       recipients: int = 1000, logs: int = 100000, log_days: int = 90, blog_entries: int = 50,
+                       seed: int = 0, batch_size: int = 5000, prefix: str = 'load') -> dict[str, int]:
+    """
+    Функция генерации синтетических данных заданного объема.
+
+    Клиенты распределяются между пользователями, получатели рассылки (до recipients)
+    выбираются среди клиентов ее владельца, логи равномерно распределены
+    по парам (рассылка, получатель) и по последним log_days дням.
+    Адреса пользователей и клиентов начинаются с prefix, что позволяет
+    сгенерировать несколько наборов данных в одной базе.
+    Расписание отправок и сводная статистика заполняются по сгенерированным логам,
+    счетчики статистики пользователей пересчитываются по созданным рассылкам и клиентам.
+    Возвращает количество созданных объектов каждого типа
+    """
+
+    generator = random.Random(seed)
+    now = timezone.now()
+    password = make_password(None)
+
+    with transaction.atomic():
+        user_objects = User.objects.bulk_create(
+            [
+                User(email=f'{prefix}-user{index}@example.com', password=password, is_active=True)
+                for index in range(users)
+            ],
+            batch_size=batch_size
+        )
+
+        bulk_create_chunked(
+            Client,
+            (
+                Client(
+                    email=f'{prefix}-client{index}@example.com',
+                    name=f'Клиент {index}',
+                    comment=generator.choice(('', 'Постоянный клиент', 'Новый клиент')),
+                    owner=user_objects[index % users]
+                )
+                for index in range(clients)
+            ),
+            batch_size
+        )
+        client_ids = {user.pk: [] for user in user_objects}
+        for client_id, owner_id in Client.objects.filter(
+            owner__in=user_objects
+        ).order_by('pk').values_list('pk', 'owner_id'):
+            client_ids[owner_id].append(client_id)
+
+        message_objects = Message.objects.bulk_create(
+            [
+                Message(
+                    subject=f'Рассылка {index}',
+                    body='Здравствуйте, {{ name }}!' if index % 2 else f'Текст рассылки {index}'
+                )
+                for index in range(messages)
+            ],
+            batch_size=batch_size
+        )
+
+        mailing_objects = Mailing.objects.bulk_create(
+            [
+                Mailing(
+                    start_time=now - timedelta(days=generator.randint(0, log_days)),
+                    end_time=now + timedelta(days=generator.randint(1, 90)) if generator.random() < 0.8 else None,
+                    frequency=generator.choice(Mailing.FREQUENCY)[0],
+                    status=generator.choices(Mailing.STATUSES, weights=(1, 3, 1))[0][0],
+                    message=generator.choice(message_objects),
+                    owner=user_objects[index % users]
+                )
+                for index in range(mailings)
+            ],
+            batch_size=batch_size
+        )
+
+        pairs = []
+        for mailing in mailing_objects:
+            candidates = client_ids[mailing.owner_id]
+            for client_id in generator.sample(candidates, min(recipients, len(candidates))):
+                pairs.append((mailing.pk, client_id))
+
+        recipient_count = insert_rows(Mailing.recipients.through, ('mailing', 'client'), pairs, batch_size)
+
+        log_count = 0
+        last_tries = {}
+        stats = Counter()
+        if pairs:
+            log_count = insert_rows(
+                Log,
+                ('last_try', 'status', 'server_response', 'mailing', 'client'),
+                generate_logs(generator, pairs, logs, now, log_days, last_tries, stats),
+                batch_size
+            )
+
+        blog_count = bulk_create_chunked(
+            BlogEntry,
+            (
+                BlogEntry(
+                    title=f'Запись блога {index}',
+                    content=' '.join(generator.choices(('рассылка', 'клиент', 'письмо', 'сервис'), k=50)),
+                    views_number=generator.randint(0, 1000)
+                )
+                for index in range(blog_entries)
+            ),
+            batch_size
+        )
+
+        mailings_by_id = {mailing.pk: mailing for mailing in mailing_objects}
+        insert_rows(
+            RecipientSchedule,
+            ('mailing', 'client', 'next_send_at', 'last_try'),
+            (
+                (
+                    mailing_id,
+                    client_id,
+                    connection.ops.adapt_datetimefield_value(
+                        services.get_next_send_at(mailings_by_id[mailing_id], last_tries.get((mailing_id, client_id)))
+                    ),
+                    connection.ops.adapt_datetimefield_value(last_tries.get((mailing_id, client_id)))
+                )
+                for mailing_id, client_id in pairs
+            ),
+            batch_size
+        )
+        bulk_create_chunked(
+            DeliveryStats,
+            (
+                DeliveryStats(mailing_id=mailing_id, day=day, status=status, count=count)
+                for (mailing_id, day, status), count in stats.items()
+            ),
+            batch_size
+        )
+        services.rebuild_user_stats([user.pk for user in user_objects])
+
+    return {
+        'users': len(user_objects),
+        'clients': clients,
+        'messages': len(message_objects),
+        'mailings': len(mailing_objects),
+        'recipients': recipient_count,
+        'logs': log_count,
+        'blog_entries': blog_count,
+    }
+
+
+def insert_rows(model: type[Model], field_names: tuple[str, ...], rows: Iterable[tuple], batch_size: int) -> int:
+    """
+    Функция записи строк в таблицу модели пачками по batch_size без создания объектов моделей.
+    Значения в строках должны быть уже подготовлены для базы данных.
+    На PostgreSQL пачка записывается одним многострочным INSERT (psycopg2.extras.execute_values),
+    так как executemany в psycopg2 выполняет отдельный запрос на каждую строку;
+    на остальных базах данных используется executemany.
+    Возвращает количество записанных строк
+    """
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in field_names)
+    sql = f'INSERT INTO {table} ({columns}) VALUES '
+
+    rows = iter(rows)
+    count = 0
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            from psycopg2.extras import execute_values
+
+            while chunk := list(islice(rows, batch_size)):
+                execute_values(cursor.cursor, f'{sql}%s', chunk, page_size=batch_size)
+                count += len(chunk)
+        else:
+            sql = f'{sql}({", ".join(["%s"] * len(field_names))})'
+            while chunk := list(islice(rows, batch_size)):
+                cursor.executemany(sql, chunk)
+                count += len(chunk)
+    return count
+
+
+def generate_logs(generator: random.Random, pairs: list[tuple[int, int]], count: int, now: datetime, log_days: int,
+                  last_tries: dict, stats: Counter) -> Iterator[tuple]:
+    """
+    Генератор строк логов, равномерно распределенных по парам (рассылка, клиент)
+    и по последним log_days дням, готовых для записи через insert_rows.
+
+    По ходу генерации заполняются время последней попытки каждой пары (last_tries)
+    и счетчики сводной статистики по ключу (рассылка, день, статус) (stats)
+    """
+
+    now = now.replace(microsecond=0)
+    timestamp = int(now.timestamp())
+    # Время логов передается в базу данных без часового пояса, в UTC (как его хранит Django),
+    # что избавляет от преобразования часового пояса для каждой строки
+    utc_now = timezone.make_naive(now, timezone.utc) if timezone.is_aware(now) else now
+    adapt = connection.ops.adapt_datetimefield_value
+    period = log_days * 24 * 60 * 60
+    offsets = {}
+    days = {}
+
+    for _ in range(count):
+        pair = generator.choice(pairs)
+        offset = generator.randrange(period)
+        # Смещения часовых поясов кратны 15 минутам, поэтому день определяется по четверти часа
+        quarter = (timestamp - offset) // 900
+        day = days.get(quarter)
+        if day is None:
+            day = days[quarter] = timezone.localdate(datetime.fromtimestamp(quarter * 900, tz=timezone.utc))
+
+        status = Log.STATUSES[0][0] if generator.random() < 0.95 else Log.STATUSES[1][0]
+        stats[(pair[0], day, status)] += 1
+        if offsets.get(pair, period) > offset:
+            offsets[pair] = offset
+
+        yield (
+            adapt(utc_now - timedelta(seconds=offset)),
+            status,
+            '250' if status == Log.STATUSES[0][0] else '550',
+            pair[0],
+            pair[1]
+        )
+
+    last_tries.update((pair, now - timedelta(seconds=offset)) for pair, offset in offsets.items())
@@ -1,15 +1,48 @@
-from django.core.management import BaseCommand
-from django.utils import timezone
-from mailing.models import Mailing
-from mailing import services
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from mailing import services, simulation
 
 
 class Command(BaseCommand):
     """
     Кастомная консольная команда, позволяющая изменить статус всех рассылок,
     у которых уже наступило время старта на момент исполнения команды,
-    с 'created' на 'started'
+    с 'created' на 'started', а также завершить рассылки,
+    у которых прошло время окончания.
+    С опциями --dry-run --simulate-days N команда прогоняет N дней запусков
+    на модельных часах без изменений в базе данных (см. mailing.simulation)
     """
 
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Симулировать запуски на модельных часах без изменений в базе данных'
+        )
+        parser.add_argument('--simulate-days', type=int, default=1, help='Количество дней симуляции')
+        parser.add_argument(
+            '--tick-minutes',
+            type=int,
+            default=5,
+            help='Интервал между запусками в симуляции в минутах'
+        )
+
     def handle(self, *args, **options) -> None:
-        services.change_status_to_started()
+        if options['dry_run']:
+            if options['simulate_days'] < 1 or options['tick_minutes'] < 1:
+                raise CommandError('Количество дней и интервал симуляции должны быть положительными')
+
+            reports = simulation.simulate(
+                lambda clock: sum(services.change_status_to_started(clock=clock).values()),
+                days=options['simulate_days'],
+                tick=timedelta(minutes=options['tick_minutes'])
+            )
+            for line in simulation.format_report(reports, 'изменено статусов', options['verbosity'] > 1):
+                self.stdout.write(line)
+            return
+
+        transitions = services.change_status_to_started()
+        self.stdout.write(
+            f'Запущено рассылок: {transitions["started"]}, завершено рассылок: {transitions["finished"]}'
+        )
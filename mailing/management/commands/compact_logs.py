@@ -0,0 +1,29 @@
+from django.core.management import BaseCommand
+from config import settings
+from mailing import services
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда, удаляющая логи рассылок старше заданного количества дней.
+    Количество попыток за удаленные дни сохраняется в сводной статистике отправок (DeliveryStats)
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.MAILING_LOG_RETENTION_DAYS,
+            help='Количество дней, за которые логи сохраняются'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.MAILING_LOG_BATCH_SIZE,
+            help='Количество логов, удаляемых одним запросом'
+        )
+
+    def handle(self, *args, **options) -> None:
+        deleted = services.compact_logs(days=options['days'], chunk_size=options['chunk_size'])
+
+        self.stdout.write(f'Удалено логов: {deleted}')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management import BaseCommand
+from config import settings
+from mailing import services
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда этапа доставки рассылок:
+    отправляет письма из таблицы исходящих писем (Outbox) в порядке их создания.
+    Может быть запущена в нескольких экземплярах и перезапущена в любой момент
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.MAILING_LOG_BATCH_SIZE,
+            help='Количество писем, отправляемых и отмечаемых одной пачкой'
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=settings.MAILING_CLAIM_LEASE,
+            help='Время аренды захваченной пачки в секундах'
+        )
+
+    def handle(self, *args, **options) -> None:
+        start = time.perf_counter()
+        sent = services.deliver_outbox(batch_size=options['batch_size'], lease=options['lease'])
+        duration = time.perf_counter() - start
+
+        rate = sent / duration if duration else 0
+        self.stdout.write(f'Отправлено писем: {sent} за {duration:.2f} с ({rate:.1f} писем/с)')
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management import BaseCommand
+from mailing.load_data import generate_load_data
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда генерации синтетических данных для нагрузочного тестирования:
+    пользователей, клиентов, сообщений, рассылок с получателями, истории логов и записей блога.
+    При одинаковых параметрах и зерне (--seed) данные воспроизводятся
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--users', type=int, default=10, help='Количество пользователей')
+        parser.add_argument('--clients', type=int, default=10000, help='Количество клиентов')
+        parser.add_argument('--messages', type=int, default=20, help='Количество сообщений')
+        parser.add_argument('--mailings', type=int, default=100, help='Количество рассылок')
+        parser.add_argument('--recipients', type=int, default=1000, help='Количество получателей одной рассылки')
+        parser.add_argument('--logs', type=int, default=100000, help='Количество логов рассылок')
+        parser.add_argument('--log-days', type=int, default=90, help='Количество дней истории логов')
+        parser.add_argument('--blog-entries', type=int, default=50, help='Количество записей блога')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Количество строк в одной пачке вставки')
+        parser.add_argument('--prefix', default='load', help='Префикс адресов пользователей и клиентов')
+
+    def handle(self, *args, **options) -> None:
+        start = time.perf_counter()
+        counts = generate_load_data(
+            users=max(options['users'], 1),
+            clients=options['clients'],
+            messages=max(options['messages'], 1),
+            mailings=options['mailings'],
+            recipients=options['recipients'],
+            logs=options['logs'],
+            log_days=max(options['log_days'], 1),
+            blog_entries=options['blog_entries'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix']
+        )
+        duration = time.perf_counter() - start
+
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(f'Данные сгенерированы за {duration:.1f} с')
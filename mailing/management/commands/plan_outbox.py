@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+from mailing import services
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда этапа планирования рассылок:
+    записывает готовые письма для получателей, которым пора отправить сообщение,
+    в таблицу исходящих писем (Outbox) без обращения к SMTP-серверу
+    """
+
+    def handle(self, *args, **options) -> None:
+        planned = services.plan_outbox()
+        self.stdout.write(f'Запланировано писем: {planned}')
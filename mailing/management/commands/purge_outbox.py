@@ -0,0 +1,29 @@
+from django.core.management import BaseCommand
+from config import settings
+from mailing import services
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда, удаляющая отправленные исходящие письма (Outbox)
+    старше заданного количества дней. Результаты отправки сохраняются в логах рассылок
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.MAILING_OUTBOX_RETENTION_DAYS,
+            help='Количество дней, в течение которых хранятся отправленные письма'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.MAILING_LOG_BATCH_SIZE,
+            help='Количество писем, удаляемых одним запросом'
+        )
+
+    def handle(self, *args, **options) -> None:
+        deleted = services.purge_outbox(days=options['days'], chunk_size=options['chunk_size'])
+
+        self.stdout.write(f'Удалено исходящих писем: {deleted}')
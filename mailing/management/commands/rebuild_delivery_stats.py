@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from mailing import services
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда, позволяющая заново построить сводную статистику отправок
+    (DeliveryStats) по существующим логам рассылок.
+    Статистика за дни, логи которых уже удалены, не изменяется
+    """
+
+    def handle(self, *args, **options) -> None:
+        count = services.rebuild_delivery_stats()
+
+        self.stdout.write(f'Статистика построена: {count} записей')
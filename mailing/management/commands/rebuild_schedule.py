@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from mailing import services
+from mailing.models import Mailing, RecipientSchedule
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда, позволяющая заново построить расписание отправок
+    (RecipientSchedule) по получателям рассылок и существующим логам.
+    Записи расписания для пар, которых больше нет среди получателей рассылок, удаляются
+    """
+
+    def handle(self, *args, **options) -> None:
+        with transaction.atomic():
+            RecipientSchedule.objects.exclude(Exists(Mailing.recipients.through.objects.filter(
+                mailing_id=OuterRef('mailing_id'),
+                client_id=OuterRef('client_id')
+            ))).delete()
+            count = services.rebuild_schedule()
+
+        self.stdout.write(f'Расписание построено для {count} получателей')
@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from mailing import services
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда, позволяющая заново вычислить счетчики статистики
+    пользователей (UserStats) по их рассылкам и клиентам для сверки с инкрементальными счетчиками
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--user', type=int, nargs='*', dest='user_ids', help='Идентификаторы пользователей')
+
+    def handle(self, *args, **options) -> None:
+        count = services.rebuild_user_stats(options['user_ids'] or None)
+
+        self.stdout.write(f'Статистика пересчитана для {count} пользователей')
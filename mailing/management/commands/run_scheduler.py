@@ -0,0 +1,48 @@
+import logging
+
+from django.core.management import BaseCommand
+from config import settings
+from mailing.scheduler import MailingScheduler
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда, запускающая планировщик рассылок
+    в виде постоянно работающего процесса вместо периодических задач cron.
+
+    Планировщик просыпается к моменту старта, окончания рассылок и ближайшей отправки писем,
+    подгружает изменившиеся рассылки раз в --reload-interval секунд
+    и корректно завершается по сигналу SIGTERM
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--reload-interval',
+            type=float,
+            default=settings.MAILING_SCHEDULER_RELOAD_INTERVAL,
+            help='Интервал подгрузки изменившихся рассылок в секундах'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.MAILING_WORKERS,
+            help='Количество потоков для параллельной отправки писем'
+        )
+        parser.add_argument(
+            '--engine',
+            choices=('smtp', 'asyncio'),
+            default=settings.MAILING_ENGINE,
+            help='Движок отправки писем'
+        )
+
+    def handle(self, *args, **options) -> None:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+        scheduler = MailingScheduler(
+            reload_interval=options['reload_interval'],
+            workers=options['workers'],
+            engine=options['engine']
+        )
+        self.stdout.write('Планировщик рассылок запущен')
+        scheduler.run()
+        self.stdout.write('Планировщик рассылок остановлен')
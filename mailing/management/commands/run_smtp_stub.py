@@ -0,0 +1,25 @@
+import asyncio
+
+from django.core.management import BaseCommand
+from mailing.async_smtp import StubSMTPServer
+
+
+class Command(BaseCommand):
+    """
+    Кастомная консольная команда для запуска локального SMTP-сервера-заглушки,
+    который принимает все письма. Используется для замеров скорости отправки
+    без реального почтового провайдера
+    """
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--host', default='127.0.0.1', help='Адрес сервера')
+        parser.add_argument('--port', type=int, default=8025, help='Порт сервера')
+        parser.add_argument('--latency', type=float, default=0, help='Задержка ответа на письмо в секундах')
+
+    def handle(self, *args, **options) -> None:
+        server = StubSMTPServer(host=options['host'], port=options['port'], latency=options['latency'])
+        self.stdout.write(f'SMTP-заглушка запущена на {options["host"]}:{options["port"]}')
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            self.stdout.write(f'Принято писем: {server.received}')
@@ -1,5 +1,11 @@
-from django.core.management import BaseCommand
-from mailing import services
+import time
+
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from config import settings
+from mailing import emails, services, simulation
+from mailing.models import Mailing
 
 
 class Command(BaseCommand):
@@ -8,9 +14,133 @@ class Command(BaseCommand):
     указанным в качестве получателей в тех рассылках, статус которых указан
     как 'started'.
 
-    Если время и дата окончания рассылки меньше, чем время на момент исполнения команды,
-    то рассылка переводится в статус 'finished'
+    Получатели, которым пора отправить письмо, определяются
+    планировщиком services.get_due_recipients.
+    Количество потоков отправки задается опцией --workers,
+    движок отправки - опцией --engine.
+    С опцией --claim команда работает в режиме захвата работы
+    и может быть запущена одновременно на нескольких узлах.
+    Опция --benchmark-render замеряет скорость персонализации сообщений без отправки.
+    С опциями --dry-run --simulate-days N команда прогоняет N дней запусков
+    на модельных часах без отправки писем и изменений в базе данных
+    (см. mailing.simulation) и выводит количество отправок, запросов и время каждого запуска
     """
 
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.MAILING_WORKERS,
+            help='Количество потоков для параллельной отправки писем'
+        )
+        parser.add_argument(
+            '--engine',
+            choices=('smtp', 'asyncio'),
+            default=settings.MAILING_ENGINE,
+            help='Движок отправки писем'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.MAILING_ASYNC_CONCURRENCY,
+            help='Максимальное количество одновременных SMTP-сессий движка asyncio'
+        )
+        parser.add_argument(
+            '--claim',
+            action='store_true',
+            help='Захватывать получателей пачками для одновременной работы нескольких процессов'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.MAILING_CLAIM_BATCH_SIZE,
+            help='Размер захватываемой пачки получателей'
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=settings.MAILING_CLAIM_LEASE,
+            help='Время аренды захваченной пачки в секундах'
+        )
+        parser.add_argument('--worker-id', help='Идентификатор процесса отправки в режиме захвата работы')
+        parser.add_argument(
+            '--benchmark-render',
+            type=int,
+            metavar='ITERATIONS',
+            help='Вместо отправки замерить скорость персонализации сообщений запущенных рассылок'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Симулировать отправку на модельных часах без отправки писем и изменений в базе данных'
+        )
+        parser.add_argument('--simulate-days', type=int, default=1, help='Количество дней симуляции')
+        parser.add_argument(
+            '--tick-minutes',
+            type=int,
+            default=5,
+            help='Интервал между запусками отправки в симуляции в минутах'
+        )
+
+    def benchmark_render(self, iterations: int) -> None:
+        """Замер скорости рендеринга сообщений запущенных рассылок для их первого получателя"""
+
+        mailings = Mailing.objects.filter(
+            status=Mailing.STATUSES[1][0],
+            message__isnull=False
+        ).select_related('message')
+
+        for mailing in mailings:
+            client = mailing.recipients.first()
+            if client is None:
+                continue
+            rate = emails.benchmark_render(mailing.message, client, iterations)
+            self.stdout.write(f'{mailing}: {rate:.0f} рендеров/с')
+
+    def simulate(self, days: int, tick_minutes: int, all_ticks: bool) -> None:
+        """
+        Симуляция запусков отправки писем; отправка выполняется последовательно,
+        так как база данных симуляции подменяется только в текущем потоке,
+        а движок asyncio отправляет письма напрямую по SMTP
+        """
+
+        if days < 1 or tick_minutes < 1:
+            raise CommandError('Количество дней и интервал симуляции должны быть положительными')
+
+        reports = simulation.simulate(
+            lambda clock: services.send_mails_regular(clock=clock),
+            days=days,
+            tick=timedelta(minutes=tick_minutes)
+        )
+        for line in simulation.format_report(reports, 'отправлено писем', all_ticks):
+            self.stdout.write(line)
+
     def handle(self, *args, **options) -> None:
-        services.send_mails_regular()
+        if options['benchmark_render']:
+            self.benchmark_render(options['benchmark_render'])
+            return
+
+        if options['dry_run']:
+            self.simulate(options['simulate_days'], options['tick_minutes'], options['verbosity'] > 1)
+            return
+
+        dispatch_options = {
+            'workers': options['workers'],
+            'engine': options['engine'],
+            'concurrency': options['concurrency'],
+        }
+
+        start = time.perf_counter()
+        if options['claim']:
+            sent = services.send_mails_claimed(
+                worker_id=options['worker_id'],
+                batch_size=options['batch_size'],
+                lease=options['lease'],
+                **dispatch_options
+            )
+        else:
+            sent = services.send_mails_regular(**dispatch_options)
+        duration = time.perf_counter() - start
+
+        rate = sent / duration if duration else 0
+        self.stdout.write(f'Отправлено писем: {sent} за {duration:.2f} с ({rate:.1f} писем/с)')
@@ -0,0 +1,215 @@
+"""
+Метрики запусков отправки писем рассылок.
+
+На время запуска отправки (dispatch_run) создается объект DispatchMetrics, в который
+функции отправки записывают счетчики и задержки SMTP-соединений и отправки писем,
+а обертка выполнения запросов (execute_wrapper) считает запросы к базе данных и их время.
+По окончании запуска метрики дописываются строкой JSON в файл MAILING_METRICS_FILE
+и сохраняются в кеше Django, откуда их отдает страница метрик в формате Prometheus
+"""
+
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+CACHE_KEY = 'mailing_dispatch_metrics'
+
+# Границы интервалов гистограмм задержек в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+COUNTERS = ('mailings_scanned', 'pairs_evaluated', 'sends_attempted', 'sends_succeeded', 'db_queries')
+
+
+class Histogram:
+    """Гистограмма задержек с фиксированными границами интервалов (как в Prometheus)"""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class DispatchMetrics:
+    """
+    Метрики одного запуска отправки писем.
+    Запись метрик потокобезопасна, так как письма могут отправляться пулом потоков
+    """
+
+    def __init__(self) -> None:
+        self.started_at = timezone.now()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.db_time = 0.0
+        self.wall_time = 0.0
+        self.histograms = {
+            'smtp_connect': Histogram(),
+            'smtp_send': Histogram(),
+        }
+        self.lock = threading.Lock()
+
+    def add(self, **counters: int) -> None:
+        with self.lock:
+            for name, value in counters.items():
+                self.counters[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.histograms[name].observe(seconds)
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.counters['db_queries'] += 1
+                self.db_time += duration
+
+    def to_dict(self) -> dict:
+        return {
+            'started_at': self.started_at.isoformat(),
+            **self.counters,
+            'db_time': self.db_time,
+            'wall_time': self.wall_time,
+            **{name: histogram.to_dict() for name, histogram in self.histograms.items()},
+        }
+
+
+_current: DispatchMetrics | None = None
+
+
+def get_current() -> DispatchMetrics | None:
+    """Функция, возвращающая метрики текущего запуска отправки или None вне запуска"""
+
+    return _current
+
+
+def add(**counters: int) -> None:
+    """Увеличение счетчиков текущего запуска отправки, если он есть"""
+
+    if _current is not None:
+        _current.add(**counters)
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Замер задержки блока кода в гистограмму name текущего запуска отправки, если он есть"""
+
+    if _current is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current.observe(name, time.perf_counter() - start)
+
+
+def track_queries():
+    """
+    Контекстный менеджер подсчета запросов к базе данных через подключение текущего потока.
+    Используется в потоках пула отправки, у каждого из которых свое подключение
+    """
+
+    if _current is None:
+        return nullcontext()
+    return connection.execute_wrapper(_current.execute_wrapper)
+
+
+def publish(metrics: DispatchMetrics) -> None:
+    """Запись метрик запуска в файл JSON lines и в кеш для страницы метрик"""
+
+    data = metrics.to_dict()
+    if settings.MAILING_METRICS_FILE:
+        with open(settings.MAILING_METRICS_FILE, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(data, ensure_ascii=False) + '\n')
+    cache.set(CACHE_KEY, data, timeout=None)
+
+
+@contextmanager
+def dispatch_run() -> Iterator[DispatchMetrics]:
+    """
+    Контекстный менеджер запуска отправки писем: собирает метрики запуска
+    и публикует их по окончании (если MAILING_METRICS_ENABLED).
+    Вложенные запуски (например, отправка внутри планировщика) учитываются во внешнем
+    """
+
+    global _current
+
+    if _current is not None or not settings.MAILING_METRICS_ENABLED:
+        yield _current or DispatchMetrics()
+        return
+
+    metrics = DispatchMetrics()
+    _current = metrics
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(metrics.execute_wrapper):
+            yield metrics
+    finally:
+        metrics.wall_time = time.perf_counter() - start
+        _current = None
+        publish(metrics)
+
+
+def render_prometheus(data: dict | None) -> str:
+    """Функция, формирующая текст метрик последнего запуска отправки в формате Prometheus"""
+
+    if data is None:
+        return ''
+
+    prefix = 'mailing_dispatch_last_run'
+    lines = [
+        f'# HELP {prefix}_timestamp_seconds Время начала последнего запуска отправки',
+        f'# TYPE {prefix}_timestamp_seconds gauge',
+        f'{prefix}_timestamp_seconds {datetime.fromisoformat(data["started_at"]).timestamp()}',
+    ]
+    for name in (*COUNTERS, 'db_time', 'wall_time'):
+        metric = f'{prefix}_{name}_seconds' if name.endswith('_time') else f'{prefix}_{name}'
+        lines += [f'# TYPE {metric} gauge', f'{metric} {data[name]}']
+
+    for name in ('smtp_connect', 'smtp_send'):
+        metric = f'{prefix}_{name}_seconds'
+        histogram = data[name]
+        lines.append(f'# TYPE {metric} histogram')
+        for bound, count in histogram['buckets'].items():
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+        lines += [
+            f'{metric}_bucket{{le="+Inf"}} {histogram["count"]}',
+            f'{metric}_sum {histogram["sum"]}',
+            f'{metric}_count {histogram["count"]}',
+        ]
+
+    return '\n'.join(lines) + '\n'
+
+
+def get_last_run() -> dict | None:
+    """Функция, возвращающая метрики последнего запуска отправки из кеша"""
+
+    return cache.get(CACHE_KEY)
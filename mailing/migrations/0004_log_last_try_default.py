@@ -0,0 +1,19 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:22
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing', '0003_client_owner_mailing_owner'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='log',
+            name='last_try',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата и время последней попытки'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing', '0004_log_last_try_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipientSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_send_at', models.DateTimeField(db_index=True, verbose_name='Время следующей отправки')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mailing.client', verbose_name='Клиент')),
+                ('mailing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mailing.mailing', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Расписание отправки',
+                'verbose_name_plural': 'Расписание отправок',
+                'unique_together': {('mailing', 'client')},
+            },
+        ),
+    ]
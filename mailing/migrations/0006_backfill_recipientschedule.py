@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Max
+
+SCHEDULE = {
+    'daily': 1,
+    'weekly': 7,
+    'monthly': 30,
+}
+
+
+def backfill_recipient_schedule(apps, schema_editor):
+    """Заполняет расписание отправок по получателям рассылок и существующим логам"""
+
+    Mailing = apps.get_model('mailing', 'Mailing')
+    Log = apps.get_model('mailing', 'Log')
+    RecipientSchedule = apps.get_model('mailing', 'RecipientSchedule')
+
+    last_tries = {
+        (row['mailing_id'], row['client_id']): row['last_try']
+        for row in Log.objects.values('mailing_id', 'client_id').annotate(last_try=Max('last_try'))
+    }
+    mailings = Mailing.objects.only('start_time', 'frequency').in_bulk()
+
+    schedule = []
+    for mailing_id, client_id in Mailing.recipients.through.objects.values_list('mailing_id', 'client_id'):
+        mailing = mailings[mailing_id]
+        last_try = last_tries.get((mailing_id, client_id))
+        if last_try is None:
+            next_send_at = mailing.start_time
+        else:
+            next_send_at = last_try + timedelta(days=SCHEDULE[mailing.frequency])
+        schedule.append(RecipientSchedule(mailing_id=mailing_id, client_id=client_id, next_send_at=next_send_at))
+
+    RecipientSchedule.objects.bulk_create(schedule, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing', '0005_recipientschedule'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_recipient_schedule, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing', '0006_backfill_recipientschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipientschedule',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Захвачено процессом'),
+        ),
+        migrations.AddField(
+            model_name='recipientschedule',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Захвачено до'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing', '0007_recipientschedule_claim'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryRetry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Количество неудачных попыток')),
+                ('retry_at', models.DateTimeField(db_index=True, verbose_name='Время следующей попытки')),
+                ('status', models.CharField(choices=[('pending', 'ожидает повтора'), ('failed', 'не доставлено')], default='pending', max_length=7, verbose_name='Статус')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mailing.client', verbose_name='Клиент')),
+                ('mailing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mailing.mailing', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Повторная отправка',
+                'verbose_name_plural': 'Повторные отправки',
+                'unique_together': {('mailing', 'client')},
+            },
+        ),
+    ]
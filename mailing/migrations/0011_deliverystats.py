@@ -0,0 +1,34 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing', '0010_message_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipientschedule',
+            name='last_try',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата и время последней попытки'),
+        ),
+        migrations.CreateModel(
+            name='DeliveryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('status', models.CharField(choices=[('successful', 'успешно'), ('error', 'ошибка')], max_length=10, verbose_name='Статус попытки')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество попыток')),
+                ('mailing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mailing.mailing', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Статистика отправок',
+                'verbose_name_plural': 'Статистика отправок',
+                'unique_together': {('mailing', 'day', 'status')},
+            },
+        ),
+    ]
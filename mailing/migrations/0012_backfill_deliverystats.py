@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    """
+    Заполняет время последней попытки в расписании отправок
+    и сводную статистику отправок по существующим логам
+    """
+
+    Log = apps.get_model('mailing', 'Log')
+    RecipientSchedule = apps.get_model('mailing', 'RecipientSchedule')
+    DeliveryStats = apps.get_model('mailing', 'DeliveryStats')
+
+    last_try = Log.objects.filter(
+        mailing_id=OuterRef('mailing_id'),
+        client_id=OuterRef('client_id')
+    ).values('mailing_id', 'client_id').annotate(last_try=Max('last_try')).values('last_try')
+    RecipientSchedule.objects.update(last_try=Subquery(last_try))
+
+    rows = Log.objects.annotate(
+        day=TruncDate('last_try', tzinfo=timezone.get_current_timezone())
+    ).values('mailing_id', 'day', 'status').annotate(count=Count('id'))
+    DeliveryStats.objects.bulk_create(
+        [DeliveryStats(mailing_id=row['mailing_id'], day=row['day'], status=row['status'], count=row['count'])
+         for row in rows],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing', '0011_deliverystats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('mailing', '0013_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('total_mailings', models.PositiveIntegerField(default=0, verbose_name='Всего рассылок')),
+                ('active_mailings', models.PositiveIntegerField(default=0, verbose_name='Активных рассылок')),
+                ('unique_clients', models.PositiveIntegerField(default=0, verbose_name='Уникальных клиентов')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.4 on 2026-10-17 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing', '0015_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outbox',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Захвачено процессом'),
+        ),
+        migrations.AddField(
+            model_name='outbox',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Захвачено до'),
+        ),
+        migrations.AlterField(
+            model_name='outbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'ожидает отправки'), ('sent', 'отправлено'), ('error', 'ошибка'), ('sending', 'отправляется')], db_index=True, default='pending', max_length=7, verbose_name='Статус'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from users.models import User
 
@@ -19,6 +20,12 @@ class Client(models.Model):
         verbose_name = 'Клиент'
         verbose_name_plural = 'Клиенты'
         ordering = ['name']
+        indexes = [
+            # Список клиентов пользователя, отсортированный по имени
+            models.Index(fields=['owner', 'name'], name='client_owner_name_idx'),
+            # Постраничный вывод всех клиентов по ключу (имя, id)
+            models.Index(fields=['name', 'id'], name='client_name_id_idx'),
+        ]
 
 
 class Message(models.Model):
@@ -26,6 +33,7 @@ class Message(models.Model):
 
     subject = models.CharField(default='No subject', max_length=100, verbose_name='Тема')
     body = models.TextField(null=True, blank=True, verbose_name='Тело письма')
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.subject
@@ -76,6 +84,14 @@ class Mailing(models.Model):
     class Meta:
         verbose_name = 'Рассылка'
         verbose_name_plural = 'Рассылки'
+        indexes = [
+            # Переходы жизненного цикла рассылок: status=... AND start_time < now
+            models.Index(fields=['status', 'start_time'], name='mailing_status_start_idx'),
+            # Список рассылок пользователя, отсортированный по времени изменения
+            models.Index(fields=['owner', '-updated_at'], name='mailing_owner_updated_idx'),
+            # Постраничный вывод всех рассылок по ключу (время изменения, id)
+            models.Index(fields=['-updated_at', '-id'], name='mailing_updated_id_idx'),
+        ]
 
 
 class Log(models.Model):
@@ -89,7 +105,7 @@ class Log(models.Model):
         ('error', 'ошибка')
     )
 
-    last_try = models.DateTimeField(auto_now_add=True, verbose_name='Дата и время последней попытки')
+    last_try = models.DateTimeField(default=timezone.now, verbose_name='Дата и время последней попытки')
     status = models.CharField(max_length=10, choices=STATUSES, verbose_name='Статус попытки')
     server_response = models.CharField(null=True, blank=True, max_length=3, verbose_name='Ответ сервера')
 
@@ -102,4 +118,153 @@ class Log(models.Model):
     class Meta:
         verbose_name = 'Лог'
         verbose_name_plural = 'Логи'
+        indexes = [
+            # Последняя попытка отправки клиенту рассылки: ORDER BY last_try DESC
+            models.Index(fields=['mailing', 'client', '-last_try'], name='log_mailing_client_try_idx'),
+        ]
+
+
+class RecipientSchedule(models.Model):
+    """
+    Модель для хранения расписания отправки сообщения рассылки конкретному клиенту.
+
+    Поле next_send_at хранит время, начиная с которого клиенту пора отправить
+    следующее сообщение рассылки, и обновляется при записи лога отправки
+    и при изменении списка получателей рассылки.
+    Поле last_try хранит время последней попытки отправки независимо от того,
+    сохранились ли логи этой попытки после очистки старых логов.
+    Поля claimed_by и claimed_until описывают аренду записи процессом отправки
+    в режиме захвата работы (несколько процессов отправки одновременно)
+    """
+
+    next_send_at = models.DateTimeField(db_index=True, verbose_name='Время следующей отправки')
+    last_try = models.DateTimeField(null=True, blank=True, verbose_name='Дата и время последней попытки')
+    claimed_by = models.CharField(null=True, blank=True, max_length=100, verbose_name='Захвачено процессом')
+    claimed_until = models.DateTimeField(null=True, blank=True, verbose_name='Захвачено до')
+
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент')
+    mailing = models.ForeignKey(Mailing, on_delete=models.CASCADE, verbose_name='Рассылка')
+
+    def __str__(self):
+        return f'{self.mailing_id} -> {self.client_id}: {self.next_send_at}'
+
+    class Meta:
+        verbose_name = 'Расписание отправки'
+        verbose_name_plural = 'Расписание отправок'
+        unique_together = ('mailing', 'client')
+
+
+class DeliveryRetry(models.Model):
+    """
+    Модель для описания повторной попытки отправки сообщения рассылки клиенту
+    после неудачной отправки.
+
+    Хранит количество неудачных попыток и время следующей попытки (retry_at).
+    После исчерпания допустимого количества попыток запись переводится в статус 'failed'
+    """
+
+    STATUSES = (
+        ('pending', 'ожидает повтора'),
+        ('failed', 'не доставлено')
+    )
+
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Количество неудачных попыток')
+    retry_at = models.DateTimeField(db_index=True, verbose_name='Время следующей попытки')
+    status = models.CharField(max_length=7, default='pending', choices=STATUSES, verbose_name='Статус')
+
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент')
+    mailing = models.ForeignKey(Mailing, on_delete=models.CASCADE, verbose_name='Рассылка')
+
+    def __str__(self):
+        return f'{self.mailing_id} -> {self.client_id}: {self.status} ({self.attempts})'
+
+    class Meta:
+        verbose_name = 'Повторная отправка'
+        verbose_name_plural = 'Повторные отправки'
+        unique_together = ('mailing', 'client')
+
+
+class Outbox(models.Model):
+    """
+    Модель исходящего письма, подготовленного к отправке.
+
+    Письма создаются этапом планирования рассылок уже в готовом виде (тема, текст, адрес)
+    и отправляются отдельными процессами доставки в порядке первичного ключа.
+    На время отправки письмо захватывается процессом доставки (статус 'sending',
+    поля claimed_by и claimed_until); если процесс упал, аренда истекает
+    и письмо снова становится доступно для доставки
+    """
 
+    STATUSES = (
+        ('pending', 'ожидает отправки'),
+        ('sent', 'отправлено'),
+        ('error', 'ошибка'),
+        ('sending', 'отправляется')
+    )
+
+    email = models.EmailField(max_length=60, verbose_name='e-mail')
+    subject = models.CharField(max_length=100, verbose_name='Тема')
+    body = models.TextField(null=True, blank=True, verbose_name='Тело письма')
+    status = models.CharField(max_length=7, default='pending', choices=STATUSES, db_index=True,
+                              verbose_name='Статус')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата отправки')
+    claimed_by = models.CharField(null=True, blank=True, max_length=100, verbose_name='Захвачено процессом')
+    claimed_until = models.DateTimeField(null=True, blank=True, verbose_name='Захвачено до')
+
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент')
+    mailing = models.ForeignKey(Mailing, on_delete=models.CASCADE, verbose_name='Рассылка')
+
+    def __str__(self):
+        return f'{self.email}: {self.subject} ({self.status})'
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+
+class DeliveryStats(models.Model):
+    """
+    Модель для хранения сводной статистики отправок рассылки:
+    количество попыток с определенным статусом за день.
+
+    Обновляется при записи логов рассылок, поэтому статистика сохраняется
+    и после удаления старых логов
+    """
+
+    day = models.DateField(verbose_name='День')
+    status = models.CharField(max_length=10, choices=Log.STATUSES, verbose_name='Статус попытки')
+    count = models.PositiveIntegerField(default=0, verbose_name='Количество попыток')
+
+    mailing = models.ForeignKey(Mailing, on_delete=models.CASCADE, verbose_name='Рассылка')
+
+    def __str__(self):
+        return f'{self.day}: {self.status} ({self.count})'
+
+    class Meta:
+        verbose_name = 'Статистика отправок'
+        verbose_name_plural = 'Статистика отправок'
+        unique_together = ('mailing', 'day', 'status')
+
+
+class UserStats(models.Model):
+    """
+    Модель для хранения счетчиков карточки статистики пользователя:
+    количество рассылок, активных рассылок и клиентов с уникальными e-mail.
+
+    Счетчики обновляются при сохранении и удалении рассылок и клиентов
+    и при смене статусов рассылок, поэтому карточка читается по первичному ключу
+    независимо от количества рассылок и клиентов пользователя
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, verbose_name='Пользователь')
+    total_mailings = models.PositiveIntegerField(default=0, verbose_name='Всего рассылок')
+    active_mailings = models.PositiveIntegerField(default=0, verbose_name='Активных рассылок')
+    unique_clients = models.PositiveIntegerField(default=0, verbose_name='Уникальных клиентов')
+
+    def __str__(self):
+        return f'{self.user_id}: {self.total_mailings}/{self.active_mailings}/{self.unique_clients}'
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
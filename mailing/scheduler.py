@@ -0,0 +1,182 @@
+"""
+Планировщик рассылок, работающий как постоянно запущенный процесс.
+
+Заменяет периодический запуск задач через cron: хранит в памяти очередь
+с приоритетом (кучу) ближайших событий рассылок - старта, окончания и отправки писем -
+и просыпается ровно к моменту наступления ближайшего события.
+Изменившиеся рассылки подгружаются инкрементально по полю updated_at
+"""
+
+import heapq
+import itertools
+import logging
+import signal
+import threading
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from mailing import services
+from mailing.models import Mailing
+from mailing.throttling import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class MailingScheduler:
+    """
+    Планировщик событий рассылок.
+
+    События хранятся в куче в виде кортежей (время, порядковый номер, тип, id рассылки, версия).
+    Версия события - значение updated_at рассылки на момент планирования:
+    если рассылка с тех пор изменилась, событие считается устаревшим и пропускается.
+    Событие отправки ('send') одно на всех - ближайшее время, к которому появятся записи для отправки
+    """
+
+    START = 'start'
+    END = 'end'
+    SEND = 'send'
+
+    # Минимальный интервал между запусками отправки писем
+    MIN_SEND_INTERVAL = timedelta(seconds=1)
+    # Интервал повторной обработки события старта или окончания рассылки после ошибки
+    RETRY_INTERVAL = timedelta(seconds=5)
+
+    def __init__(self, reload_interval: float = 60, clock: Callable[[], datetime] = timezone.now,
+                 **dispatch_options) -> None:
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self.dispatch_options = dispatch_options
+        self.events = []
+        self.versions = {}
+        self.counter = itertools.count()
+        self.last_reload = None
+        self.next_reload = None
+        self.send_resume_at = None
+        self.stop_event = threading.Event()
+
+    def push(self, when: datetime, kind: str, mailing_id: int | None = None, version: datetime | None = None) -> None:
+        heapq.heappush(self.events, (when, next(self.counter), kind, mailing_id, version))
+
+    def reload(self) -> None:
+        """
+        Подгрузка рассылок, изменившихся с момента предыдущей загрузки,
+        и пересчет времени ближайшей отправки писем
+        """
+
+        now = self.clock()
+        mailings = Mailing.objects.filter(
+            status__in=(Mailing.STATUSES[0][0], Mailing.STATUSES[1][0])
+        ).only('start_time', 'end_time', 'status', 'updated_at')
+        if self.last_reload is not None:
+            mailings = mailings.filter(updated_at__gte=self.last_reload)
+
+        for mailing in mailings:
+            self.versions[mailing.pk] = mailing.updated_at
+            if mailing.status == Mailing.STATUSES[0][0]:
+                self.push(mailing.start_time, self.START, mailing.pk, mailing.updated_at)
+            if mailing.end_time is not None:
+                self.push(mailing.end_time, self.END, mailing.pk, mailing.updated_at)
+
+        self.schedule_send(now)
+        self.last_reload = now
+        self.next_reload = now + timedelta(seconds=self.reload_interval)
+
+    def schedule_send(self, now: datetime, not_before: datetime | None = None) -> None:
+        """
+        Планирование события отправки на ближайшее время, к которому появятся записи для отправки
+        (services.get_next_dispatch_at), но не раньше not_before
+        и не раньше сброса исчерпанного дневного лимита отправки
+        """
+
+        self.events = [event for event in self.events if event[2] != self.SEND]
+        heapq.heapify(self.events)
+
+        next_send = services.get_next_dispatch_at(now)
+        if next_send is None:
+            return
+
+        for bound in (not_before, self.send_resume_at):
+            if bound is not None and next_send < bound:
+                next_send = bound
+        self.push(next_send, self.SEND)
+
+    def get_send_not_before(self, now: datetime, sent: int) -> datetime:
+        """
+        Время, раньше которого не нужно запускать следующую отправку.
+        Если дневной лимит отправки исчерпан, отправка откладывается до его сброса,
+        если запуск ничего не отправил (записи отложены лимитером или произошла ошибка) -
+        до следующей подгрузки рассылок, иначе - на минимальный интервал между запусками
+        """
+
+        limiter = get_rate_limiter()
+        daily_reset = limiter.get_daily_reset() if limiter else None
+        if daily_reset is not None:
+            self.send_resume_at = daily_reset
+            return daily_reset
+        if not sent:
+            return max(self.next_reload, now + self.MIN_SEND_INTERVAL)
+        return now + self.MIN_SEND_INTERVAL
+
+    def handle(self, kind: str, now: datetime) -> None:
+        if kind in (self.START, self.END):
+            transitions = services.update_mailing_statuses(now)
+            logger.info('Изменены статусы рассылок: %s', transitions)
+            self.schedule_send(now)
+        elif kind == self.SEND:
+            sent = 0
+            try:
+                sent = services.send_mails_regular(clock=self.clock, **self.dispatch_options)
+                logger.info('Отправлено писем: %s', sent)
+            finally:
+                # Событие отправки планируется заново и после ошибки, иначе отправка остановится до reload
+                now = self.clock()
+                self.schedule_send(now, not_before=self.get_send_not_before(now, sent))
+
+    def run_pending(self) -> None:
+        """Обработка всех событий, время которых уже наступило"""
+
+        now = self.clock()
+        if self.next_reload is None or now >= self.next_reload:
+            self.reload()
+
+        while self.events and self.events[0][0] <= now and not self.stop_event.is_set():
+            when, _, kind, mailing_id, version = heapq.heappop(self.events)
+            if mailing_id is not None and self.versions.get(mailing_id) != version:
+                continue
+            try:
+                self.handle(kind, now)
+            except Exception:
+                logger.exception('Ошибка при обработке события %s рассылки %s', kind, mailing_id)
+                if kind in (self.START, self.END):
+                    # Неизменившаяся рассылка не будет подгружена заново, поэтому событие повторяется
+                    self.push(now + self.RETRY_INTERVAL, kind, mailing_id, version)
+
+    def seconds_until_next_event(self) -> float:
+        now = self.clock()
+        wake_at = self.next_reload
+        if self.events and self.events[0][0] < wake_at:
+            wake_at = self.events[0][0]
+        return max((wake_at - now).total_seconds(), 0)
+
+    def stop(self, *args) -> None:
+        self.stop_event.set()
+
+    def run(self) -> None:
+        """
+        Основной цикл планировщика. Завершается после получения SIGTERM или SIGINT,
+        дождавшись окончания обработки текущего события
+        """
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                self.run_pending()
+                self.stop_event.wait(self.seconds_until_next_event())
+        finally:
+            connections.close_all()
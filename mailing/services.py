@@ -1,121 +1,1264 @@
-from smtplib import SMTPException
+import os
+import random
+import socket
+import time
+import uuid
+import zlib
+from collections import Counter
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import date, datetime, timedelta
+from smtplib import SMTPException, SMTPServerDisconnected
 
 from django.core.cache import cache
+from django.db import IntegrityError, connection as db_connection, connections, transaction
+from django.db.models import Count, F, Max, Q, QuerySet
+from django.db.models.functions import Greatest, TruncDate
 from django.utils import timezone
-from django.core.mail import send_mail, mail_admins
+from django.core.mail import EmailMessage, get_connection, mail_admins
+from django.core.mail.backends.base import BaseEmailBackend
 from config import settings
-from mailing.models import Mailing, Log, Client
+from mailing import metrics
+from mailing.async_smtp import AsyncSMTPDispatcher, OutgoingEmail
+from mailing.emails import TEMPLATE_ERRORS, build_mailing_email
+from mailing.models import Mailing, Log, Client, RecipientSchedule, DeliveryRetry, Outbox, DeliveryStats, \
+    UserStats
+from mailing.throttling import get_rate_limiter
 from users.models import User
 
 
-def change_status_to_started() -> None:
+def get_next_send_at(mailing: Mailing, last_try: datetime | None) -> datetime:
+    """
+    Функция, вычисляющая время следующей отправки сообщения рассылки клиенту
+    по времени последней попытки и периодичности рассылки (Mailing.SCHEDULE).
+    Если попыток еще не было, сообщение нужно отправить с момента старта рассылки
+    """
+
+    if last_try is None:
+        return mailing.start_time
+    return last_try + timedelta(days=Mailing.SCHEDULE[mailing.frequency])
+
+
+def update_schedule(logs: list[Log]) -> None:
+    """
+    Функция, обновляющая расписание отправок (RecipientSchedule)
+    по только что записанным логам рассылок.
+    Вместе с временем следующей отправки сохраняется время последней попытки
+    и снимается захват записи в работу
+    """
+
+    last_tries = {}
+    for log in logs:
+        key = (log.mailing_id, log.client_id)
+        if key not in last_tries or last_tries[key].last_try < log.last_try:
+            last_tries[key] = log
+
+    RecipientSchedule.objects.bulk_create(
+        [
+            RecipientSchedule(
+                mailing_id=log.mailing_id,
+                client_id=log.client_id,
+                next_send_at=get_next_send_at(log.mailing, log.last_try),
+                last_try=log.last_try
+            )
+            for log in last_tries.values()
+        ],
+        update_conflicts=True,
+        unique_fields=['mailing', 'client'],
+        update_fields=['next_send_at', 'last_try', 'claimed_by', 'claimed_until']
+    )
+
+
+def rebuild_schedule(mailing_ids: Iterable[int] | None = None, client_ids: Iterable[int] | None = None) -> int:
+    """
+    Функция, пересчитывающая расписание отправок (RecipientSchedule)
+    по получателям рассылок и существующим логам.
+
+    Время последней попытки берется из сгруппированного Max('last_try')
+    по парам (рассылка, клиент), а если логи пары уже удалены при очистке -
+    из сохраненного в расписании поля last_try. Пересчет можно ограничить рассылками (mailing_ids)
+    и/или клиентами (client_ids). Возвращает количество пересчитанных пар
+    """
+
+    recipients = Mailing.recipients.through.objects.all()
+    logs = Log.objects.all()
+    existing = RecipientSchedule.objects.filter(last_try__isnull=False)
+    if mailing_ids is not None:
+        recipients = recipients.filter(mailing_id__in=mailing_ids)
+        logs = logs.filter(mailing_id__in=mailing_ids)
+        existing = existing.filter(mailing_id__in=mailing_ids)
+    if client_ids is not None:
+        recipients = recipients.filter(client_id__in=client_ids)
+        logs = logs.filter(client_id__in=client_ids)
+        existing = existing.filter(client_id__in=client_ids)
+
+    last_tries = {
+        (mailing_id, client_id): last_try
+        for mailing_id, client_id, last_try in existing.values_list('mailing_id', 'client_id', 'last_try')
+    }
+    for row in logs.values('mailing_id', 'client_id').annotate(last_try=Max('last_try')):
+        key = (row['mailing_id'], row['client_id'])
+        if key not in last_tries or last_tries[key] < row['last_try']:
+            last_tries[key] = row['last_try']
+
+    recipients = list(recipients.values_list('mailing_id', 'client_id'))
+    mailings = Mailing.objects.only('start_time', 'frequency').in_bulk({mailing_id for mailing_id, _ in recipients})
+
+    schedule = [
+        RecipientSchedule(
+            mailing_id=mailing_id,
+            client_id=client_id,
+            next_send_at=get_next_send_at(mailings[mailing_id], last_tries.get((mailing_id, client_id))),
+            last_try=last_tries.get((mailing_id, client_id))
+        )
+        for mailing_id, client_id in recipients
+    ]
+
+    RecipientSchedule.objects.bulk_create(
+        schedule,
+        batch_size=settings.MAILING_LOG_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['mailing', 'client'],
+        update_fields=['next_send_at', 'last_try']
+    )
+    return len(schedule)
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    """
+    Функция, вычисляющая задержку перед повторной попыткой отправки:
+    экспоненциальный рост от MAILING_RETRY_BASE_DELAY с ограничением MAILING_RETRY_MAX_DELAY
+    и случайным разбросом (jitter), чтобы повторы не отправлялись одной волной
+    """
+
+    delay = min(settings.MAILING_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.MAILING_RETRY_MAX_DELAY)
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def update_retries(logs: list[Log]) -> None:
+    """
+    Функция, обновляющая очередь повторных отправок (DeliveryRetry) по записанным логам.
+
+    Для неудачных попыток увеличивается счетчик попыток и назначается время
+    следующей попытки с экспоненциальной задержкой; после MAILING_RETRY_MAX_ATTEMPTS
+    попыток запись помечается как окончательно не доставленная ('failed').
+    Успешная отправка удаляет пару из очереди повторов, а с началом нового цикла отправки
+    по расписанию запись очереди удаляется (reset_retries), и счетчик попыток начинается заново
+    """
+
+    last_logs = {}
+    for log in logs:
+        key = (log.mailing_id, log.client_id)
+        if key not in last_logs or last_logs[key].last_try < log.last_try:
+            last_logs[key] = log
+
+    delivered = {}
+    failed = []
+    for key, log in last_logs.items():
+        if log.status == Log.STATUSES[0][0]:
+            delivered.setdefault(log.mailing_id, []).append(log.client_id)
+        else:
+            failed.append(log)
+
+    if delivered:
+        condition = Q()
+        for mailing_id, client_ids in delivered.items():
+            condition |= Q(mailing_id=mailing_id, client_id__in=client_ids)
+        DeliveryRetry.objects.filter(condition).delete()
+
+    if not failed:
+        return
+
+    condition = Q()
+    for log in failed:
+        condition |= Q(mailing_id=log.mailing_id, client_id=log.client_id)
+    attempts = {
+        (retry.mailing_id, retry.client_id): retry.attempts
+        for retry in DeliveryRetry.objects.filter(condition).only('mailing_id', 'client_id', 'attempts')
+    }
+
+    retries = []
+    for log in failed:
+        retry_attempts = attempts.get((log.mailing_id, log.client_id), 0) + 1
+        if retry_attempts >= settings.MAILING_RETRY_MAX_ATTEMPTS:
+            status = DeliveryRetry.STATUSES[1][0]
+        else:
+            status = DeliveryRetry.STATUSES[0][0]
+        retries.append(DeliveryRetry(
+            mailing_id=log.mailing_id,
+            client_id=log.client_id,
+            attempts=retry_attempts,
+            retry_at=log.last_try + get_retry_delay(retry_attempts),
+            status=status
+        ))
+
+    DeliveryRetry.objects.bulk_create(
+        retries,
+        update_conflicts=True,
+        unique_fields=['mailing', 'client'],
+        update_fields=['attempts', 'retry_at', 'status']
+    )
+
+
+def reset_retries(recipients: list[tuple[Mailing, Client]]) -> None:
+    """
+    Функция, начинающая новый цикл отправки для пар (рассылка, клиент), которым пора
+    отправить сообщение по расписанию: записи очереди повторных отправок предыдущего цикла
+    удаляются, поэтому неудачи нового цикла снова получают MAILING_RETRY_MAX_ATTEMPTS попыток,
+    а пара не отправляется в том же запуске еще и проходом повторных отправок
+    """
+
+    client_ids = {}
+    for mailing, client in recipients:
+        client_ids.setdefault(mailing.pk, []).append(client.pk)
+    if not client_ids:
+        return
+
+    condition = Q()
+    for mailing_id, ids in client_ids.items():
+        condition |= Q(mailing_id=mailing_id, client_id__in=ids)
+    DeliveryRetry.objects.filter(condition).delete()
+
+
+def update_delivery_stats(logs: list[Log]) -> None:
+    """
+    Функция, увеличивающая счетчики сводной статистики отправок (DeliveryStats)
+    по записанным логам: один запрос UPDATE ... SET count = count + n
+    на каждую тройку (рассылка, день, статус), а для новой тройки - создание записи
+    """
+
+    counts = Counter(
+        (log.mailing_id, timezone.localdate(log.last_try), log.status)
+        for log in logs
+    )
+
+    for (mailing_id, day, status), count in counts.items():
+        stats = DeliveryStats.objects.filter(mailing_id=mailing_id, day=day, status=status)
+        if stats.update(count=F('count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                DeliveryStats.objects.create(mailing_id=mailing_id, day=day, status=status, count=count)
+        except IntegrityError:
+            # Запись успел создать параллельный процесс отправки
+            stats.update(count=F('count') + count)
+
+
+def rebuild_delivery_stats(since: date | None = None) -> int:
+    """
+    Функция, пересчитывающая сводную статистику отправок (DeliveryStats) по существующим логам.
+
+    Пересчитываются только дни начиная с since (по умолчанию - с дня самого старого лога),
+    поэтому статистика за дни, логи которых уже удалены при очистке, сохраняется.
+    Возвращает количество записей статистики
+    """
+
+    logs = Log.objects.annotate(day=TruncDate('last_try', tzinfo=timezone.get_current_timezone()))
+    if since is None:
+        oldest = Log.objects.order_by('last_try').values_list('last_try', flat=True).first()
+        if oldest is None:
+            return 0
+        since = timezone.localdate(oldest)
+    logs = logs.filter(day__gte=since)
+
+    stats = [
+        DeliveryStats(mailing_id=row['mailing_id'], day=row['day'], status=row['status'], count=row['count'])
+        for row in logs.values('mailing_id', 'day', 'status').annotate(count=Count('id'))
+    ]
+
+    with transaction.atomic():
+        DeliveryStats.objects.filter(day__gte=since).delete()
+        DeliveryStats.objects.bulk_create(stats, batch_size=settings.MAILING_LOG_BATCH_SIZE)
+    return len(stats)
+
+
+def compact_logs(days: int | None = None, chunk_size: int | None = None) -> int:
+    """
+    Функция очистки логов рассылок старше days дней (по умолчанию MAILING_LOG_RETENTION_DAYS).
+
+    Граница хранения округляется до начала дня, чтобы в сводной статистике
+    не оставалось частично очищенных дней. Логи удаляются пачками по chunk_size
+    в порядке первичного ключа, каждая пачка - отдельным коротким запросом DELETE.
+    Время последней попытки для расписания хранится в RecipientSchedule.last_try,
+    количество попыток - в DeliveryStats. Возвращает количество удаленных логов
+    """
+
+    days = settings.MAILING_LOG_RETENTION_DAYS if days is None else days
+    chunk_size = chunk_size or settings.MAILING_LOG_BATCH_SIZE
+    cutoff_day = timezone.localdate() - timedelta(days=days)
+    cutoff = timezone.make_aware(datetime.combine(cutoff_day, datetime.min.time()))
+
+    deleted = 0
+    while True:
+        pks = list(Log.objects.filter(last_try__lt=cutoff).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        deleted += Log.objects.filter(pk__in=pks).delete()[0]
+
+
+def record_logs(logs: list[Log], batch_size: int | None = None) -> None:
+    """
+    Функция записи логов рассылок в базу данных одной транзакцией
+    вместе с обновлением расписания отправок, очереди повторных отправок
+    и сводной статистики отправок.
+    Количество попыток и успешных отправок учитывается в метриках текущего запуска отправки
+    """
+
+    with transaction.atomic():
+        Log.objects.bulk_create(logs, batch_size=batch_size)
+        update_schedule(logs)
+        update_retries(logs)
+        update_delivery_stats(logs)
+
+    metrics.add(
+        sends_attempted=len(logs),
+        sends_succeeded=sum(1 for log in logs if log.status == Log.STATUSES[0][0])
+    )
+
+
+def update_mailing_statuses(datetime_now: datetime | None = None) -> dict[str, int]:
+    """
+    Функция-движок жизненного цикла рассылок.
+
+    Переводит рассылки, у которых наступило время старта, из статуса 'created' в 'started',
+    а рассылки, у которых наступило время окончания, из статуса 'started' в 'finished'.
+    Границы включаются, поэтому событие планировщика, сработавшее ровно во время старта
+    или окончания рассылки, меняет ее статус.
+    Каждый переход выполняется короткой транзакцией (apply_status_transitions),
+    в которой вместе со статусами обновляются счетчики активных рассылок владельцев (UserStats).
+    Возвращает количество рассылок, изменивших статус, для каждого перехода
+    """
+
+    datetime_now = datetime_now or timezone.now()
+
+    started = apply_status_transitions(
+        Mailing.objects.filter(status=Mailing.STATUSES[0][0], start_time__lte=datetime_now),
+        Mailing.STATUSES[1][0], datetime_now, 1
+    )
+    # Рассылки, запущенные и завершенные за один вызов, уже учтены выше, поэтому в сумме не меняют счетчик
+    finished = apply_status_transitions(
+        Mailing.objects.filter(status=Mailing.STATUSES[1][0], end_time__lte=datetime_now),
+        Mailing.STATUSES[2][0], datetime_now, -1
+    )
+
+    return {
+        Mailing.STATUSES[1][0]: started,
+        Mailing.STATUSES[2][0]: finished,
+    }
+
+
+def apply_status_transitions(mailings: QuerySet, status: str, datetime_now: datetime, delta: int) -> int:
+    """
+    Функция перевода рассылок mailings в статус status.
+
+    Рассылки выбираются с блокировкой строк (SELECT ... FOR UPDATE) и изменяются по первичному ключу,
+    а счетчики активных рассылок их владельцев (UserStats) меняются на delta по этим же строкам,
+    поэтому параллельный вызов или рассылка, измененная в то же время, не учитываются дважды.
+    Возвращает количество рассылок, изменивших статус
+    """
+
+    with transaction.atomic():
+        rows = list(mailings.select_for_update().values_list('pk', 'owner_id'))
+        if not rows:
+            return 0
+
+        Mailing.objects.filter(pk__in=[pk for pk, _ in rows]).update(status=status, updated_at=datetime_now)
+        owners = Counter(owner_id for _, owner_id in rows if owner_id is not None)
+        for owner_id, count in owners.items():
+            update_user_stats(owner_id, active_mailings=delta * count)
+    return len(rows)
+
+
+def change_status_to_started(clock: Callable[[], datetime] = timezone.now) -> dict[str, int]:
     """
     Функция, позволяющая изменить статус всех рассылок,
     у которых уже наступило время старта на момент вызова функции,
-    с 'created' на 'started'
+    с 'created' на 'started', а также завершить рассылки,
+    у которых прошло время окончания (см. update_mailing_statuses).
+    Текущее время берется из часов clock
+    """
+
+    return update_mailing_statuses(clock())
+
+
+class LogBuffer:
+    """
+    Буфер логов рассылки.
+
+    Накапливает объекты Log во время отправки и записывает их в базу данных
+    через bulk_create пачками по batch_size в одной транзакции
+    вместе с обновлением расписания отправок.
+    При использовании в качестве контекстного менеджера оставшиеся логи
+    записываются при выходе из блока, в том числе при возникновении исключения
+    """
+
+    def __init__(self, batch_size: int | None = None) -> None:
+        self.batch_size = batch_size or settings.MAILING_LOG_BATCH_SIZE
+        self.logs = []
+
+    def add(self, log: Log) -> None:
+        self.logs.append(log)
+        if len(self.logs) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.logs:
+            return
+
+        logs, self.logs = self.logs, []
+        record_logs(logs, batch_size=self.batch_size)
+
+    def __enter__(self) -> 'LogBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.flush()
+
+
+def deliver_email(connection: BaseEmailBackend, email: EmailMessage) -> int:
+    """
+    Функция отправки готового письма через уже открытое соединение почтового бэкенда.
+
+    Если сервер разорвал соединение, оно переоткрывается
+    и письмо отправляется повторно один раз.
+    Возвращает количество отправленных писем (0 или 1)
+    """
+
+    try:
+        return connection.send_messages([email])
+    except SMTPServerDisconnected:
+        connection.close()
+        connection.open()
+        return connection.send_messages([email])
+
+
+def build_email(mailing: Mailing, client: Client) -> EmailMessage:
     """
+    Функция создания письма с сообщением рассылки для конкретного клиента.
 
-    datetime_now = timezone.now()
-    mailing_list_created = Mailing.objects.filter(status=Mailing.STATUSES[0][0])
+    MIME-представление сообщения собирается один раз на сообщение
+    и берется из кеша (mailing.emails), для клиента меняется только адрес получателя.
+    Сообщения с переменными шаблона ({{ name }}, {{ email }}, {{ comment }})
+    персонализируются для клиента; для ошибочного шаблона выбрасывается исключение из TEMPLATE_ERRORS
+    """
 
-    for mailing in mailing_list_created:
-        if mailing.start_time < datetime_now:
-            mailing.status = Mailing.STATUSES[1][0]
-            mailing.save()
+    return build_mailing_email(mailing.message, client)
 
 
-def send_mailing(mailing: Mailing, client: Client) -> None:
+def send_mailing(mailing: Mailing, client: Client, connection: BaseEmailBackend | None = None,
+                 log_buffer: LogBuffer | None = None, clock: Callable[[], datetime] = timezone.now) -> None:
     """
     Функция отправки сообщения конкретному клиенту рассылки.
 
+    Если передано открытое соединение почтового бэкенда (connection),
+    письмо отправляется через него без установки нового SMTP-соединения.
+
     Сразу после отправки сообщения создается объект лога,
     который описывает результат отправки (успешно/неуспешно)
-    и фиксирует время попытки
+    и фиксирует время попытки по часам clock.
+    Если передан буфер логов (log_buffer), лог добавляется в него
+    и записывается в базу данных вместе с остальными логами буфера.
+    Если письмо не удалось собрать из-за ошибки в шаблоне сообщения,
+    записывается лог с ошибкой, и отправка остальным получателям продолжается
     """
 
-    message = mailing.message
-
     try:
-        result = send_mail(
-            subject=message.subject,
-            message=message.body,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[client.email]
-        )
+        email = build_email(mailing, client)
+        with metrics.timer('smtp_send'):
+            if connection is None:
+                result = email.send()
+            else:
+                result = deliver_email(connection, email)
         if result:
             status = Log.STATUSES[0][0]
         else:
             status = Log.STATUSES[1][0]
 
-    except SMTPException as error:
+    except TEMPLATE_ERRORS as error:
+        status = Log.STATUSES[1][0]
+        mail_admins('Ошибка в шаблоне сообщения рассылки', str(error))
+
+    except (SMTPException, OSError) as error:
+        # OSError - обрыв соединения или таймаут, в том числе при повторном подключении в deliver_email;
+        # при недоступном сервере письмо администраторам тоже может не уйти, что не должно прерывать отправку
         status = Log.STATUSES[1][0]
-        mail_admins('Ошибка в приложении', error)
+        mail_admins('Ошибка в приложении', str(error), fail_silently=True)
 
-    Log.objects.create(
-        last_try=timezone.now(),
+    log = Log(
+        last_try=clock(),
         status=status,
         client=client,
         mailing=mailing
     )
+    if log_buffer is None:
+        record_logs([log])
+    else:
+        log_buffer.add(log)
+
+
+def record_connection_failure(recipients: Iterable[tuple[Mailing, Client]], error: Exception,
+                              clock: Callable[[], datetime] = timezone.now) -> int:
+    """
+    Функция записи логов с ошибкой для всех пар (рассылка, клиент), которым не удалось
+    отправить письмо из-за ошибки подключения к почтовому серверу, с уведомлением администраторов.
+    По логам с ошибкой пары попадают в очередь повторных отправок.
+    Возвращает количество попыток отправки
+    """
 
-            
-def send_mails_regular() -> None:
+    mail_admins('Ошибка подключения к почтовому серверу', str(error), fail_silently=True)
+
+    attempts = 0
+    last_try = clock()
+    with LogBuffer() as log_buffer:
+        for mailing, client in recipients:
+            log_buffer.add(Log(last_try=last_try, status=Log.STATUSES[1][0], client=client, mailing=mailing))
+            attempts += 1
+    return attempts
+
+
+def send_mailings(recipients: Iterable[tuple[Mailing, Client]], clock: Callable[[], datetime] = timezone.now) -> int:
+    """
+    Функция отправки сообщений набору пар (рассылка, клиент).
+
+    Для всего набора открывается одно соединение почтового бэкенда (get_connection),
+    которое используется для всех писем и закрывается по окончании отправки.
+    Логи отправки записываются в базу данных пачками через буфер логов (LogBuffer).
+
+    Если настроен лимитер скорости отправки (mailing.throttling) и лимит исчерпан,
+    оставшиеся письма не отправляются и откладываются до следующего запуска.
+    Если не удалось подключиться к почтовому серверу, для всех пар записываются логи с ошибкой
+    (record_connection_failure), по которым назначаются повторные отправки.
+    Возвращает количество попыток отправки
+    """
+
+    limiter = get_rate_limiter()
+    attempts = 0
+
+    connection = get_connection()
+    try:
+        with metrics.timer('smtp_connect'):
+            connection.open()
+    except (SMTPException, OSError) as error:
+        return record_connection_failure(recipients, error, clock)
+    try:
+        with LogBuffer() as log_buffer:
+            for mailing, client in recipients:
+                if limiter and not limiter.acquire(settings.MAILING_RATE_MAX_WAIT):
+                    break
+                send_mailing(mailing=mailing, client=client, connection=connection, log_buffer=log_buffer, clock=clock)
+                attempts += 1
+    finally:
+        connection.close()
+
+    return attempts
+
+
+def get_due_schedule(datetime_now: datetime) -> QuerySet:
+    """
+    Функция, возвращающая записи расписания отправок (RecipientSchedule),
+    которым на момент datetime_now пора отправить сообщение
+    и которые не захвачены в работу другим процессом отправки
+    """
+
+    return RecipientSchedule.objects.filter(
+        next_send_at__lte=datetime_now,
+        mailing__status=Mailing.STATUSES[1][0],
+        mailing__start_time__lte=datetime_now,
+    ).filter(
+        Q(mailing__end_time__isnull=True) | Q(mailing__end_time__gt=datetime_now)
+    ).filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=datetime_now)
+    )
+
+
+def get_next_dispatch_at(datetime_now: datetime) -> datetime | None:
+    """
+    Функция, возвращающая ближайшее время, к которому появятся записи для отправки
+    по тем же условиям, что и в get_due_schedule и claim_retries, или None, если отправлять нечего.
+
+    Записи, захваченные другим процессом, учитываются по времени окончания аренды,
+    записи рассылок, время старта которых еще не наступило, - по времени старта.
+    Время раньше datetime_now означает, что записи уже ожидают отправки
+    """
+
+    active = Q(mailing__status=Mailing.STATUSES[1][0]) & (
+        Q(mailing__end_time__isnull=True) | Q(mailing__end_time__gt=datetime_now)
+    )
+    schedule = RecipientSchedule.objects.filter(active)
+
+    candidates = [
+        schedule.filter(
+            Q(claimed_until__isnull=True) | Q(claimed_until__lt=datetime_now),
+            mailing__start_time__lte=F('next_send_at')
+        ).order_by('next_send_at').values_list('next_send_at', flat=True).first(),
+        schedule.filter(claimed_until__gte=datetime_now).order_by(
+            'claimed_until'
+        ).values_list('claimed_until', flat=True).first(),
+        Mailing.objects.filter(status=Mailing.STATUSES[1][0], start_time__gt=datetime_now).order_by(
+            'start_time'
+        ).values_list('start_time', flat=True).first(),
+        DeliveryRetry.objects.filter(active, status=DeliveryRetry.STATUSES[0][0]).order_by(
+            'retry_at'
+        ).values_list('retry_at', flat=True).first(),
+    ]
+    candidates = [candidate for candidate in candidates if candidate is not None]
+    return min(candidates) if candidates else None
+
+
+def get_due_recipients(datetime_now: datetime) -> list[tuple[Mailing, Client]]:
+    """
+    Функция-планировщик, определяющая все пары (рассылка, клиент),
+    которым на момент datetime_now пора отправить сообщение.
+
+    Выполняется одним запросом к расписанию отправок (RecipientSchedule)
+    по индексу next_send_at <= datetime_now, поэтому стоимость вызова
+    зависит от количества ожидающих отправки пар, а не от истории логов
+    """
+
+    schedule = get_due_schedule(datetime_now).select_related(
+        'mailing__message', 'client'
+    ).order_by('next_send_at', 'pk')
+
+    return [(item.mailing, item.client) for item in schedule]
+
+
+def claim_due_recipients(datetime_now: datetime, worker_id: str, batch_size: int,
+                         lease: int) -> list[tuple[Mailing, Client]]:
+    """
+    Функция захвата в работу пачки пар (рассылка, клиент), которым пора отправить сообщение.
+
+    Захват оформляется арендой записи расписания: поля claimed_by и claimed_until.
+    На PostgreSQL записи выбираются через SELECT ... FOR UPDATE SKIP LOCKED,
+    поэтому параллельные процессы получают разные пачки, не дожидаясь друг друга.
+    На базах без SKIP LOCKED (SQLite) запись захватывается условным UPDATE,
+    который меняет только не захваченные записи.
+    Аренда снимается при записи лога отправки, а если процесс отправки упал,
+    она истекает через lease секунд
+    """
+
+    claimed_until = datetime_now + timedelta(seconds=lease)
+    due_schedule = get_due_schedule(datetime_now).order_by('next_send_at', 'pk')
+
+    if db_connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                due_schedule.select_for_update(skip_locked=True, of=('self',)).values_list('pk', flat=True)[:batch_size]
+            )
+            RecipientSchedule.objects.filter(pk__in=ids).update(claimed_by=worker_id, claimed_until=claimed_until)
+    else:
+        ids = list(due_schedule.values_list('pk', flat=True)[:batch_size])
+        RecipientSchedule.objects.filter(pk__in=ids).filter(
+            Q(claimed_until__isnull=True) | Q(claimed_until__lt=datetime_now)
+        ).update(claimed_by=worker_id, claimed_until=claimed_until)
+
+    schedule = RecipientSchedule.objects.filter(
+        pk__in=ids,
+        claimed_by=worker_id
+    ).select_related('mailing__message', 'client').order_by('next_send_at', 'pk')
+
+    return [(item.mailing, item.client) for item in schedule]
+
+
+def send_mailings_async(recipients: list[tuple[Mailing, Client]], concurrency: int | None = None,
+                        clock: Callable[[], datetime] = timezone.now) -> int:
+    """
+    Функция отправки сообщений асинхронным движком (mailing.async_smtp).
+
+    Письма заранее собираются и кодируются, затем отправляются через
+    до concurrency одновременных SMTP-сессий, после чего результаты
+    записываются в логи рассылки так же, как и при синхронной отправке.
+    Письма, отложенные лимитером скорости отправки, в логи не записываются,
+    письма с ошибкой в шаблоне сообщения не отправляются и записываются в логи как ошибка.
+    Возвращает количество попыток отправки
+    """
+
+    emails = []
+    sendable = []
+    broken = []
+    for mailing, client in recipients:
+        try:
+            emails.append(build_email(mailing, client))
+        except TEMPLATE_ERRORS as error:
+            broken.append((mailing, client))
+            mail_admins('Ошибка в шаблоне сообщения рассылки', str(error))
+        else:
+            sendable.append((mailing, client))
+
+    outgoing_emails = [
+        OutgoingEmail(
+            from_email=email.from_email,
+            recipients=email.recipients(),
+            data=email.message().as_bytes(linesep='\r\n')
+        )
+        for email in emails
+    ]
+
+    dispatcher = AsyncSMTPDispatcher(
+        host=settings.EMAIL_HOST,
+        port=settings.EMAIL_PORT,
+        username=settings.EMAIL_HOST_USER,
+        password=settings.EMAIL_HOST_PASSWORD,
+        use_ssl=settings.EMAIL_USE_SSL,
+        timeout=settings.MAILING_SMTP_TIMEOUT,
+        concurrency=concurrency or settings.MAILING_ASYNC_CONCURRENCY,
+        messages_per_connection=settings.MAILING_ASYNC_MESSAGES_PER_CONNECTION,
+        limiter=get_rate_limiter(),
+        max_wait=settings.MAILING_RATE_MAX_WAIT,
+        observer=metrics.get_current().observe if metrics.get_current() else None
+    )
+    results = dispatcher.send(outgoing_emails) if outgoing_emails else []
+
+    attempts = len(broken)
+    with LogBuffer() as log_buffer:
+        for mailing, client in broken:
+            log_buffer.add(Log(last_try=clock(), status=Log.STATUSES[1][0], client=client, mailing=mailing))
+
+        for (mailing, client), result in zip(sendable, results):
+            if result.deferred:
+                continue
+
+            attempts += 1
+            if result.success:
+                status = Log.STATUSES[0][0]
+            else:
+                status = Log.STATUSES[1][0]
+                mail_admins('Ошибка в приложении', result.error)
+
+            log_buffer.add(Log(
+                last_try=clock(),
+                status=status,
+                server_response=str(result.code) if result.code else None,
+                client=client,
+                mailing=mailing
+            ))
+
+    return attempts
+
+
+def _send_mailings_in_thread(recipients: list[tuple[Mailing, Client]],
+                             clock: Callable[[], datetime] = timezone.now) -> int:
+    """
+    Отправка части набора пар (рассылка, клиент) в отдельном потоке.
+
+    Каждый поток работает со своим подключением к базе данных,
+    которое закрывается по окончании работы потока
+    """
+
+    try:
+        with metrics.track_queries():
+            return send_mailings(recipients, clock)
+    finally:
+        connections.close_all()
+
+
+def send_mailings_parallel(recipients: list[tuple[Mailing, Client]], workers: int,
+                           clock: Callable[[], datetime] = timezone.now) -> int:
+    """
+    Функция параллельной отправки сообщений пулом потоков.
+
+    Пары (рассылка, клиент) распределяются между workers потоками по e-mail клиента,
+    поэтому все письма одному адресату отправляются одним потоком
+    в том же порядке, что и при последовательной отправке.
+    Возвращает количество попыток отправки
+    """
+
+    partitions = [[] for _ in range(workers)]
+    for mailing, client in recipients:
+        index = zlib.crc32(client.email.lower().encode()) % workers
+        partitions[index].append((mailing, client))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(
+            partial(_send_mailings_in_thread, clock=clock),
+            [partition for partition in partitions if partition]
+        ))
+
+
+def claim_retries(datetime_now: datetime, lease: int) -> list[tuple[Mailing, Client]]:
+    """
+    Функция выборки повторных отправок, время которых наступило.
+
+    Выбранные записи сразу откладываются на lease секунд, чтобы параллельный запуск
+    не взял их повторно; на PostgreSQL записи выбираются через SELECT ... FOR UPDATE SKIP LOCKED.
+    Время следующей попытки окончательно назначается при записи лога отправки
+    """
+
+    due_retries = DeliveryRetry.objects.filter(
+        status=DeliveryRetry.STATUSES[0][0],
+        retry_at__lte=datetime_now,
+        mailing__status=Mailing.STATUSES[1][0],
+    ).filter(
+        Q(mailing__end_time__isnull=True) | Q(mailing__end_time__gt=datetime_now)
+    ).order_by('retry_at', 'pk')
+
+    with transaction.atomic():
+        if db_connection.features.has_select_for_update_skip_locked:
+            due_retries = due_retries.select_for_update(skip_locked=True, of=('self',))
+        ids = list(due_retries.values_list('pk', flat=True))
+        DeliveryRetry.objects.filter(pk__in=ids).update(retry_at=datetime_now + timedelta(seconds=lease))
+
+    retries = DeliveryRetry.objects.filter(pk__in=ids).select_related('mailing__message', 'client').order_by('pk')
+    return [(retry.mailing, retry.client) for retry in retries]
+
+
+def send_retries(lease: int | None = None, **dispatch_options) -> int:
+    """
+    Функция отдельного прохода повторных отправок после неудачных попыток.
+    Возвращает количество попыток отправки
+    """
+
+    clock = dispatch_options.get('clock', timezone.now)
+    recipients = claim_retries(clock(), lease or settings.MAILING_CLAIM_LEASE)
+    metrics.add(pairs_evaluated=len(recipients))
+    if not recipients:
+        return 0
+
+    return dispatch(recipients, **dispatch_options)
+
+
+def dispatch(recipients: list[tuple[Mailing, Client]], workers: int = 1, engine: str = 'smtp',
+             concurrency: int | None = None, clock: Callable[[], datetime] = timezone.now) -> int:
+    """
+    Функция отправки сообщений набору пар (рассылка, клиент) выбранным способом:
+    асинхронным движком (engine='asyncio'), пулом потоков (workers > 1)
+    или последовательно через одно соединение почтового бэкенда.
+    Время попыток в логах берется из часов clock.
+    Возвращает количество попыток отправки
+    """
+
+    if engine == 'asyncio':
+        return send_mailings_async(recipients, concurrency, clock)
+    elif workers > 1:
+        return send_mailings_parallel(recipients, workers, clock)
+    else:
+        return send_mailings(recipients, clock)
+
+
+def send_mails_claimed(worker_id: str | None = None, batch_size: int | None = None, lease: int | None = None,
+                       **dispatch_options) -> int:
+    """
+    Функция отправки писем в режиме захвата работы, позволяющем запускать
+    отправку одновременно на нескольких узлах без повторной отправки писем.
+
+    Процесс по очереди захватывает пачки по batch_size ожидающих отправки пар
+    (claim_due_recipients) и отправляет их, пока не останется ожидающих пар,
+    не захваченных другими процессами, после чего выполняет проход повторных отправок.
+    Если лимитер скорости отложил письма пачки, захват оставшихся записей снимается
+    и отправка завершается до следующего запуска.
+    Возвращает количество попыток отправки
+    """
+
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    batch_size = batch_size or settings.MAILING_CLAIM_BATCH_SIZE
+    lease = lease or settings.MAILING_CLAIM_LEASE
+
+    clock = dispatch_options.get('clock', timezone.now)
+    total = 0
+    with metrics.dispatch_run():
+        while True:
+            datetime_now = clock()
+            recipients = claim_due_recipients(datetime_now, worker_id, batch_size, lease)
+            if not recipients:
+                if get_due_schedule(datetime_now).exists():
+                    # Записи в этот момент захватывает другой процесс: повтор после паузы, а не в холостом цикле
+                    time.sleep(settings.MAILING_CLAIM_RETRY_DELAY)
+                    continue
+                return total + send_retries(lease, **dispatch_options)
+
+            metrics.add(
+                mailings_scanned=len({mailing.pk for mailing, _ in recipients}),
+                pairs_evaluated=len(recipients)
+            )
+            reset_retries(recipients)
+            attempts = dispatch(recipients, **dispatch_options)
+            total += attempts
+
+            if attempts < len(recipients):
+                # Лимит отправки исчерпан: отложенные записи освобождаются до следующего запуска
+                RecipientSchedule.objects.filter(claimed_by=worker_id).update(claimed_by=None, claimed_until=None)
+                return total
+
+
+def send_mails_regular(workers: int = 1, engine: str = 'smtp', concurrency: int | None = None,
+                       clock: Callable[[], datetime] = timezone.now) -> int:
     """
     Функция, позволяющая отправить письма клиентам,
     указанным в качестве получателей в тех рассылках, статус которых указан
     как 'started'.
 
-    Если время и дата окончания рассылки меньше, чем время на момент вызова функции,
-    то рассылка переводится в статус 'finished'
+    Перед отправкой статусы рассылок обновляются движком жизненного цикла
+    (update_mailing_statuses), поэтому завершившиеся рассылки больше не рассматриваются.
+
+    Список пар (рассылка, клиент), которым пора отправить письмо,
+    вычисляется планировщиком get_due_recipients за постоянное число запросов,
+    а все письма отправляются через одно соединение почтового бэкенда.
+    При workers > 1 письма отправляются параллельно пулом из workers потоков.
+    При engine='asyncio' используется асинхронный движок отправки
+    с не более чем concurrency одновременными SMTP-сессиями.
+    После основной отправки выполняется проход повторных отправок (send_retries).
+    Текущее время и время попыток в логах берутся из часов clock.
+    Метрики запуска собираются и публикуются модулем mailing.metrics.
+
+    Возвращает количество попыток отправки
     """
 
-    datetime_now = timezone.now()
-    mailing_list_started = Mailing.objects.filter(status=Mailing.STATUSES[1][0])
+    dispatch_options = {
+        'workers': workers,
+        'engine': engine,
+        'concurrency': concurrency,
+        'clock': clock,
+    }
+
+    with metrics.dispatch_run():
+        datetime_now = clock()
+        update_mailing_statuses(datetime_now)
+        due_recipients = get_due_recipients(datetime_now)
+        metrics.add(
+            mailings_scanned=len({mailing.pk for mailing, _ in due_recipients}),
+            pairs_evaluated=len(due_recipients)
+        )
 
-    for mailing in mailing_list_started:
-        if mailing.end_time < datetime_now:
-            mailing.status = Mailing.STATUSES[2][0]
-        elif (mailing.start_time < datetime_now) and (mailing.end_time > datetime_now):
-            for client in mailing.recipients.all():
-                mailing_log = Log.objects.filter(
-                    mailing=mailing,
-                    client=client
+        attempts = 0
+        if due_recipients:
+            reset_retries(due_recipients)
+            attempts = dispatch(due_recipients, **dispatch_options)
+
+        return attempts + send_retries(**dispatch_options)
+
+
+def plan_outbox(datetime_now: datetime | None = None) -> int:
+    """
+    Функция этапа планирования рассылок через таблицу исходящих писем (Outbox).
+
+    Без обращения к SMTP-серверу определяет пары (рассылка, клиент), которым пора
+    отправить сообщение, и одной транзакцией записывает для них готовые письма в Outbox,
+    сдвигая время следующей отправки в расписании и сохраняя время планирования
+    как время последней попытки, чтобы пары не попали в план повторно,
+    в том числе после пересчета расписания при изменении рассылки (rebuild_schedule).
+    В Outbox планируются и повторные отправки, время которых наступило (claim_retries),
+    кроме пар, письма которых еще ожидают доставки.
+    Для писем с ошибкой в шаблоне сообщения сразу записываются логи с ошибкой.
+    Возвращает количество запланированных писем
+    """
+
+    datetime_now = datetime_now or timezone.now()
+    update_mailing_statuses(datetime_now)
+    due_recipients = get_due_recipients(datetime_now)
+    reset_retries(due_recipients)
+
+    retry_recipients = claim_retries(datetime_now, settings.MAILING_CLAIM_LEASE)
+    if retry_recipients:
+        queued = set(Outbox.objects.filter(
+            status__in=(Outbox.STATUSES[0][0], Outbox.STATUSES[3][0]),
+            mailing_id__in={mailing.pk for mailing, _ in retry_recipients},
+            client_id__in={client.pk for _, client in retry_recipients}
+        ).values_list('mailing_id', 'client_id'))
+        retry_recipients = [
+            (mailing, client) for mailing, client in retry_recipients if (mailing.pk, client.pk) not in queued
+        ]
+
+    outbox = []
+    schedule = []
+    logs = []
+    for recipients, is_retry in ((due_recipients, False), (retry_recipients, True)):
+        for mailing, client in recipients:
+            try:
+                email = build_email(mailing, client)
+            except TEMPLATE_ERRORS as error:
+                logs.append(Log(last_try=datetime_now, status=Log.STATUSES[1][0], client=client, mailing=mailing))
+                mail_admins('Ошибка в шаблоне сообщения рассылки', str(error))
+                continue
+
+            outbox.append(Outbox(
+                email=client.email,
+                subject=email.subject,
+                body=email.body,
+                mailing=mailing,
+                client=client
+            ))
+            if not is_retry:
+                schedule.append(RecipientSchedule(
+                    mailing_id=mailing.pk,
+                    client_id=client.pk,
+                    next_send_at=get_next_send_at(mailing, datetime_now),
+                    last_try=datetime_now
+                ))
+
+    with transaction.atomic():
+        Outbox.objects.bulk_create(outbox, batch_size=settings.MAILING_LOG_BATCH_SIZE)
+        RecipientSchedule.objects.bulk_create(
+            schedule,
+            batch_size=settings.MAILING_LOG_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['mailing', 'client'],
+            update_fields=['next_send_at', 'last_try']
+        )
+        if logs:
+            record_logs(logs)
+
+    return len(outbox)
+
+
+def claim_outbox(datetime_now: datetime, worker_id: str, batch_size: int, lease: int) -> list[Outbox]:
+    """
+    Функция захвата в работу пачки исходящих писем короткой транзакцией.
+
+    Захватываются ожидающие отправки письма, а также письма в статусе 'sending',
+    аренда которых истекла (процесс доставки упал, не записав результат отправки).
+    На PostgreSQL письма выбираются через SELECT ... FOR UPDATE SKIP LOCKED,
+    на базах без SKIP LOCKED (SQLite) захватываются условным UPDATE
+    """
+
+    claimable = Outbox.objects.filter(
+        Q(status=Outbox.STATUSES[0][0]) | Q(status=Outbox.STATUSES[3][0], claimed_until__lt=datetime_now)
+    )
+    claim = {
+        'status': Outbox.STATUSES[3][0],
+        'claimed_by': worker_id,
+        'claimed_until': datetime_now + timedelta(seconds=lease),
+    }
+
+    if db_connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                claimable.select_for_update(skip_locked=True).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            Outbox.objects.filter(pk__in=ids).update(**claim)
+    else:
+        ids = list(claimable.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        claimable.filter(pk__in=ids).update(**claim)
+
+    return list(Outbox.objects.filter(pk__in=ids, claimed_by=worker_id).select_related('mailing').order_by('pk'))
+
+
+def deliver_outbox(batch_size: int | None = None, lease: int | None = None, worker_id: str | None = None,
+                   clock: Callable[[], datetime] = timezone.now) -> int:
+    """
+    Функция этапа доставки писем из таблицы исходящих писем (Outbox).
+
+    Письма захватываются пачками по batch_size короткой транзакцией (claim_outbox)
+    и отправляются вне транзакции через одно соединение почтового бэкенда,
+    поэтому медленный SMTP-сервер не удерживает блокировки строк.
+    Результаты отправки (логи и статусы писем) записываются второй короткой транзакцией,
+    в том числе для уже отправленных писем пачки, если отправка прервалась исключением.
+    Если процесс упал между отправкой и записью результата, письма пачки остаются
+    в статусе 'sending' и по истечении аренды (lease) доставляются повторно.
+    Письма, отложенные лимитером скорости отправки, освобождаются до следующего запуска.
+    Возвращает количество попыток отправки
+    """
+
+    batch_size = batch_size or settings.MAILING_LOG_BATCH_SIZE
+    lease = lease or settings.MAILING_CLAIM_LEASE
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    limiter = get_rate_limiter()
+    attempts = 0
+
+    connection = get_connection()
+    connection.open()
+    try:
+        while True:
+            batch = claim_outbox(clock(), worker_id, batch_size, lease)
+            if not batch:
+                return attempts
+
+            logs = []
+            delivered = []
+            try:
+                for item in batch:
+                    if limiter and not limiter.acquire(settings.MAILING_RATE_MAX_WAIT):
+                        break
+
+                    email = EmailMessage(
+                        subject=item.subject,
+                        body=item.body,
+                        from_email=settings.EMAIL_HOST_USER,
+                        to=[item.email]
+                    )
+                    try:
+                        result = deliver_email(connection, email)
+                    except SMTPException as error:
+                        result = 0
+                        mail_admins('Ошибка в приложении', error)
+
+                    item.sent_at = clock()
+                    item.status = Outbox.STATUSES[1][0] if result else Outbox.STATUSES[2][0]
+                    item.claimed_by = None
+                    item.claimed_until = None
+                    logs.append(Log(
+                        last_try=item.sent_at,
+                        status=Log.STATUSES[0][0] if result else Log.STATUSES[1][0],
+                        client_id=item.client_id,
+                        mailing=item.mailing
+                    ))
+                    delivered.append(item)
+            finally:
+                with transaction.atomic():
+                    if logs:
+                        record_logs(logs)
+                        Outbox.objects.bulk_update(delivered, ['status', 'sent_at', 'claimed_by', 'claimed_until'])
+
+            attempts += len(delivered)
+            if len(delivered) < len(batch):
+                # Лимит отправки исчерпан: неотправленные письма пачки освобождаются до следующего запуска
+                Outbox.objects.filter(claimed_by=worker_id, status=Outbox.STATUSES[3][0]).update(
+                    status=Outbox.STATUSES[0][0],
+                    claimed_by=None,
+                    claimed_until=None
                 )
-                if mailing_log.exists():
-                    last_try_date = mailing_log.order_by('-last_try').first().last_try
-                    timedelta = (datetime_now - last_try_date).days
-                    frequency = Mailing.SCHEDULE.get(mailing.frequency)
+                return attempts
+    finally:
+        connection.close()
+
+
+def purge_outbox(days: int | None = None, chunk_size: int | None = None) -> int:
+    """
+    Функция удаления отправленных исходящих писем, отправленных больше days дней назад
+    (по умолчанию MAILING_OUTBOX_RETENTION_DAYS). Результаты отправки сохраняются в логах рассылок.
+    Письма удаляются пачками по chunk_size в порядке первичного ключа.
+    Возвращает количество удаленных писем
+    """
 
-                    if frequency and timedelta >= frequency:
-                        send_mailing(mailing=mailing, client=client)
+    days = settings.MAILING_OUTBOX_RETENTION_DAYS if days is None else days
+    chunk_size = chunk_size or settings.MAILING_LOG_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+
+    deleted = 0
+    while True:
+        pks = list(
+            Outbox.objects.filter(status=Outbox.STATUSES[1][0], sent_at__lt=cutoff)
+            .order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not pks:
+            return deleted
+        deleted += Outbox.objects.filter(pk__in=pks).delete()[0]
+
+
+def get_statistic_card_key(user_id: int) -> str:
+    """
+    Функция, возвращающая ключ кеша карточки статистики пользователя.
+    Ключ содержит номер версии, который увеличивается при изменении данных пользователя,
+    поэтому устаревшие записи не читаются и удаляются из кеша по истечении времени хранения
+    """
+
+    version_key = f'statistic_card_version:{user_id}'
+    cache.add(version_key, 1, timeout=None)
+    return f'statistic_card:{user_id}:{cache.get(version_key, 1)}'
+
+
+def invalidate_statistic_card(user_ids: Iterable[int | None]) -> None:
+    """Функция, сбрасывающая кеш карточки статистики пользователей (увеличением версии ключа)"""
+
+    for user_id in set(user_ids):
+        if user_id is None:
+            continue
+        version_key = f'statistic_card_version:{user_id}'
+        if not cache.add(version_key, 2, timeout=None):
+            try:
+                cache.incr(version_key)
+            except ValueError:
+                # Ключ версии удален из кеша между add и incr
+                cache.add(version_key, 1, timeout=None)
 
-                else:
-                    send_mailing(mailing=mailing, client=client)
+
+def rebuild_user_stats(user_ids: Iterable[int] | None = None) -> int:
+    """
+    Функция, заново вычисляющая счетчики статистики пользователей (UserStats)
+    по рассылкам и клиентам. Пересчет можно ограничить пользователями (user_ids).
+    Возвращает количество пересчитанных пользователей
+    """
+
+    users = User.objects.all()
+    mailings = Mailing.objects.filter(owner__isnull=False)
+    clients = Client.objects.filter(owner__isnull=False)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        mailings = mailings.filter(owner_id__in=user_ids)
+        clients = clients.filter(owner_id__in=user_ids)
+
+    mailing_counts = {
+        row['owner_id']: row
+        for row in mailings.order_by().values('owner_id').annotate(
+            total=Count('pk'),
+            active=Count('pk', filter=Q(status=Mailing.STATUSES[1][0]))
+        )
+    }
+    client_counts = dict(
+        clients.order_by().values('owner_id').annotate(count=Count('email', distinct=True)).values_list(
+            'owner_id', 'count'
+        )
+    )
+
+    stats = [
+        UserStats(
+            user_id=user_id,
+            total_mailings=mailing_counts.get(user_id, {}).get('total', 0),
+            active_mailings=mailing_counts.get(user_id, {}).get('active', 0),
+            unique_clients=client_counts.get(user_id, 0)
+        )
+        for user_id in users.values_list('pk', flat=True)
+    ]
+
+    UserStats.objects.bulk_create(
+        stats,
+        batch_size=settings.MAILING_LOG_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['total_mailings', 'active_mailings', 'unique_clients']
+    )
+    invalidate_statistic_card(stat.user_id for stat in stats)
+    return len(stats)
+
+
+def update_user_stats(user_id: int | None, **deltas: int) -> None:
+    """
+    Функция, изменяющая счетчики статистики пользователя (UserStats) на deltas
+    одним запросом UPDATE ... SET поле = поле + delta и сбрасывающая кеш его карточки статистики.
+    Если записи статистики пользователя еще нет, она вычисляется целиком (rebuild_user_stats)
+    """
+
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if user_id is None or not deltas:
+        return
+
+    updated = UserStats.objects.filter(pk=user_id).update(**{
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    })
+    if updated:
+        invalidate_statistic_card([user_id])
+    else:
+        rebuild_user_stats([user_id])
+
+
+def get_statistic_card(user: User) -> dict:
+    """
+    Функция, возвращающая данные карточки статистики пользователя
+    чтением записи UserStats по первичному ключу
+    """
+
+    fields = ('total_mailings', 'active_mailings', 'unique_clients')
+    card_info = UserStats.objects.filter(pk=user.pk).values(*fields).first()
+    if card_info is None:
+        rebuild_user_stats([user.pk])
+        card_info = UserStats.objects.filter(pk=user.pk).values(*fields).get()
+    return card_info
 
 
 def cache_statistic_card(user: User) -> dict:
     """
     Функция для кеширования загружаемой информации,
-    которая используется в карточке статистики юзера на домашней странице
-    """
-
-    if settings.CACHE_ENABLED:
-        key = 'card_info'
-        card_info = cache.get(key)
-        if card_info is None:
-            mailings = user.mailing_set.all()
-            card_info = {
-                'total_mailings': len(mailings),
-                'active_mailings': len(mailings.filter(status=Mailing.STATUSES[1][0])),
-                'unique_clients': len(user.client_set.values('email').distinct())
-            }
-            cache.set(key, card_info)
-    else:
-        mailings = user.mailing_set.all()
-        card_info = {
-            'total_mailings': len(mailings),
-            'active_mailings': len(mailings.filter(status=Mailing.STATUSES[1][0])),
-            'unique_clients': len(user.client_set.values('email').distinct())
-        }
+    которая используется в карточке статистики юзера на домашней странице.
+
+    Данные кешируются для каждого пользователя отдельно по версионированному ключу
+    (get_statistic_card_key); версия увеличивается при каждом изменении счетчиков UserStats
+    """
+
+    if not settings.CACHE_ENABLED:
+        return get_statistic_card(user)
 
+    key = get_statistic_card_key(user.pk)
+    card_info = cache.get(key)
+    if card_info is None:
+        card_info = get_statistic_card(user)
+        cache.set(key, card_info, timeout=settings.STATISTIC_CARD_CACHE_TIMEOUT)
     return card_info
@@ -0,0 +1,123 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from mailing import services
+from mailing.models import Client, Mailing, RecipientSchedule
+
+
+@receiver(m2m_changed, sender=Mailing.recipients.through)
+def sync_recipient_schedule(sender, instance, action: str, reverse: bool, pk_set: set | None, **kwargs) -> None:
+    """
+    Поддерживает расписание отправок (RecipientSchedule) в актуальном состоянии
+    при изменении списка получателей рассылки: для добавленных получателей
+    расписание пересчитывается, для удаленных - удаляется
+    """
+
+    if action == 'post_add' and pk_set:
+        if reverse:
+            services.rebuild_schedule(mailing_ids=pk_set, client_ids=[instance.pk])
+        else:
+            services.rebuild_schedule(mailing_ids=[instance.pk], client_ids=pk_set)
+
+    elif action == 'post_remove' and pk_set:
+        if reverse:
+            RecipientSchedule.objects.filter(client=instance, mailing_id__in=pk_set).delete()
+        else:
+            RecipientSchedule.objects.filter(mailing=instance, client_id__in=pk_set).delete()
+
+    elif action == 'post_clear':
+        if reverse:
+            RecipientSchedule.objects.filter(client=instance).delete()
+        else:
+            RecipientSchedule.objects.filter(mailing=instance).delete()
+
+
+@receiver(post_save, sender=Mailing)
+def refresh_mailing_schedule(sender, instance: Mailing, created: bool, **kwargs) -> None:
+    """
+    Пересчитывает расписание отправок рассылки при её изменении,
+    так как время старта и периодичность влияют на время следующей отправки.
+    Для завершенной рассылки расписание не используется, поэтому не пересчитывается
+    """
+
+    if not created and instance.status != Mailing.STATUSES[2][0]:
+        services.rebuild_schedule(mailing_ids=[instance.pk])
+
+
+@receiver(pre_save, sender=Mailing)
+@receiver(pre_save, sender=Client)
+def remember_previous_state(sender, instance: Mailing | Client, **kwargs) -> None:
+    """
+    Запоминает владельца и статус (для рассылки) или e-mail (для клиента) до сохранения,
+    чтобы после сохранения изменить счетчики статистики пользователей на разницу
+    """
+
+    fields = ('owner_id', 'status') if sender is Mailing else ('owner_id', 'email')
+    instance._previous_state = None
+    if instance.pk is not None:
+        instance._previous_state = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def has_other_client(owner_id: int, email: str, client_pk: int) -> bool:
+    return Client.objects.filter(owner_id=owner_id, email=email).exclude(pk=client_pk).exists()
+
+
+@receiver(post_save, sender=Mailing)
+def update_stats_on_mailing_save(sender, instance: Mailing, **kwargs) -> None:
+    """Обновляет счетчики рассылок владельца (UserStats) при создании или изменении рассылки"""
+
+    active = Mailing.STATUSES[1][0]
+    previous = getattr(instance, '_previous_state', None)
+    if previous is None:
+        services.update_user_stats(
+            instance.owner_id, total_mailings=1, active_mailings=int(instance.status == active)
+        )
+    elif previous['owner_id'] != instance.owner_id:
+        services.update_user_stats(
+            previous['owner_id'], total_mailings=-1, active_mailings=-int(previous['status'] == active)
+        )
+        services.update_user_stats(
+            instance.owner_id, total_mailings=1, active_mailings=int(instance.status == active)
+        )
+    else:
+        services.update_user_stats(
+            instance.owner_id, active_mailings=int(instance.status == active) - int(previous['status'] == active)
+        )
+
+
+@receiver(post_delete, sender=Mailing)
+def update_stats_on_mailing_delete(sender, instance: Mailing, **kwargs) -> None:
+    """Обновляет счетчики рассылок владельца (UserStats) при удалении рассылки"""
+
+    services.update_user_stats(
+        instance.owner_id,
+        total_mailings=-1,
+        active_mailings=-int(instance.status == Mailing.STATUSES[1][0])
+    )
+
+
+@receiver(post_save, sender=Client)
+def update_stats_on_client_save(sender, instance: Client, **kwargs) -> None:
+    """
+    Обновляет счетчик клиентов с уникальными e-mail владельца (UserStats)
+    при создании клиента или изменении его e-mail или владельца
+    """
+
+    previous = getattr(instance, '_previous_state', None)
+    if previous is not None and (previous['owner_id'], previous['email']) == (instance.owner_id, instance.email):
+        return
+
+    if previous is not None and previous['owner_id'] is not None:
+        if not has_other_client(previous['owner_id'], previous['email'], instance.pk):
+            services.update_user_stats(previous['owner_id'], unique_clients=-1)
+
+    if instance.owner_id is not None and not has_other_client(instance.owner_id, instance.email, instance.pk):
+        services.update_user_stats(instance.owner_id, unique_clients=1)
+
+
+@receiver(post_delete, sender=Client)
+def update_stats_on_client_delete(sender, instance: Client, **kwargs) -> None:
+    """Обновляет счетчик клиентов с уникальными e-mail владельца (UserStats) при удалении клиента"""
+
+    if instance.owner_id is not None and not has_other_client(instance.owner_id, instance.email, instance.pk):
+        services.update_user_stats(instance.owner_id, unique_clients=-1)
@@ -0,0 +1,192 @@
+"""
+Симуляция работы рассылок на модельных часах (dry-run).
+
+Позволяет прогнать заданное количество дней периодических запусков
+(например, send_mails_regular каждые 5 минут, как в CRONJOBS) без реальной отправки писем
+и без изменений в рабочей базе данных и кеше.
+Перед симуляцией данные, нужные для отправки (пользователи, клиенты, сообщения, рассылки,
+получатели, расписание и очередь повторов), копируются во временную базу данных SQLite в памяти,
+которая на время симуляции подменяет подключение по умолчанию; кеш по умолчанию
+подменяется отдельным кешем в памяти. Вместо почтового бэкенда используется бэкенд-пустышка,
+лимит скорости отправки и публикация метрик запусков отключаются
+(как в django.conf.settings, так и в config.settings, из которого их читают сервисы).
+Подмена подключения действует только в текущем потоке, поэтому запуски выполняются последовательно.
+Для каждого запуска (тика) замеряются количество отправок, запросов к базе данных и время работы
+"""
+
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.utils import load_backend
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from config import settings as config_settings
+from mailing.models import Client, DeliveryRetry, Mailing, Message, RecipientSchedule, UserStats
+from users.models import User
+
+# Модели, данные которых копируются в базу данных симуляции (в порядке зависимостей)
+SIMULATION_MODELS = (User, UserStats, Client, Message, Mailing, Mailing.recipients.through, RecipientSchedule,
+                     DeliveryRetry)
+
+# Настройки на время симуляции
+SIMULATION_SETTINGS = {
+    'EMAIL_BACKEND': 'django.core.mail.backends.dummy.EmailBackend',
+    'MAILING_RATE_LIMIT': 0,
+    'MAILING_METRICS_ENABLED': False,
+}
+
+
+class QueryCounter:
+    """
+    Обертка выполнения запросов (connection.execute_wrapper), считающая запросы к базе данных.
+    В отличие от CaptureQueriesContext не зависит от connection.queries_log,
+    длина которого ограничена, поэтому на длинных симуляциях счет не обнуляется
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class SimulatedClock:
+    """Модельные часы, время которых сдвигается вручную"""
+
+    def __init__(self, start: datetime) -> None:
+        self.now = start
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, delta: timedelta) -> None:
+        self.now += delta
+
+
+@dataclass
+class TickReport:
+    """Результат одного запуска в симуляции"""
+
+    at: datetime
+    result: int
+    queries: int
+    duration: float
+
+
+@contextmanager
+def patch_settings(**values) -> Iterator[None]:
+    """
+    Контекстный менеджер временной замены настроек как в django.conf.settings,
+    так и в модуле config.settings, из которого настройки читают сервисы рассылок
+    """
+
+    missing = object()
+    previous = {name: getattr(config_settings, name, missing) for name in values}
+    with override_settings(**values):
+        for name, value in values.items():
+            setattr(config_settings, name, value)
+        try:
+            yield
+        finally:
+            for name, value in previous.items():
+                if value is missing:
+                    delattr(config_settings, name)
+                else:
+                    setattr(config_settings, name, value)
+
+
+@contextmanager
+def isolated_environment() -> Iterator[None]:
+    """
+    Контекстный менеджер изолированного окружения симуляции: копия данных рассылок
+    во временной базе данных SQLite в памяти, отдельный кеш в памяти и настройки SIMULATION_SETTINGS.
+    По выходе восстанавливаются рабочие подключение к базе данных, кеш и настройки
+    """
+
+    rows = [list(model._base_manager.order_by('pk')) for model in SIMULATION_MODELS]
+
+    live_connection = connections[DEFAULT_DB_ALIAS]
+    live_cache = caches[DEFAULT_CACHE_ALIAS]
+    settings_dict = connections.configure_settings({
+        DEFAULT_DB_ALIAS: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+    })[DEFAULT_DB_ALIAS]
+    simulation_connection = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, DEFAULT_DB_ALIAS)
+
+    connections[DEFAULT_DB_ALIAS] = simulation_connection
+    caches[DEFAULT_CACHE_ALIAS] = LocMemCache('mailing-simulation', {})
+    try:
+        with simulation_connection.schema_editor() as editor:
+            for model in apps.get_models():
+                if model._meta.managed and not model._meta.proxy:
+                    editor.create_model(model)
+        for model, objects in zip(SIMULATION_MODELS, rows):
+            model._base_manager.bulk_create(objects, batch_size=config_settings.MAILING_LOG_BATCH_SIZE)
+
+        with patch_settings(**SIMULATION_SETTINGS):
+            yield
+    finally:
+        connections[DEFAULT_DB_ALIAS] = live_connection
+        caches[DEFAULT_CACHE_ALIAS] = live_cache
+        simulation_connection.close()
+
+
+def simulate(step: Callable[[SimulatedClock], int], days: int, tick: timedelta,
+             start: datetime | None = None) -> list[TickReport]:
+    """
+    Функция симуляции days дней периодических запусков step с интервалом tick.
+
+    step получает модельные часы и возвращает результат запуска (например, количество отправок).
+    Запуски выполняются в изолированном окружении (isolated_environment),
+    рабочие база данных и кеш не изменяются.
+    Возвращает отчеты по каждому тику
+    """
+
+    clock = SimulatedClock(start or timezone.now())
+    end = clock.now + timedelta(days=days)
+    reports = []
+
+    with isolated_environment():
+        while clock.now < end:
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                started = time.perf_counter()
+                result = step(clock)
+                duration = time.perf_counter() - started
+            reports.append(TickReport(at=clock.now, result=result, queries=queries.count, duration=duration))
+            clock.advance(tick)
+
+    return reports
+
+
+def format_report(reports: list[TickReport], label: str, all_ticks: bool = False) -> list[str]:
+    """
+    Функция, формирующая строки отчета о симуляции: по строке на каждый тик,
+    в котором что-то произошло (или на каждый тик при all_ticks), и итоговую строку
+    """
+
+    lines = [
+        f'{timezone.localtime(report.at):%Y-%m-%d %H:%M}: {label} {report.result}, '
+        f'запросов {report.queries}, {report.duration * 1000:.1f} мс'
+        for report in reports
+        if all_ticks or report.result
+    ]
+
+    if reports:
+        total_duration = sum(report.duration for report in reports)
+        lines.append(
+            f'Тиков: {len(reports)}, {label} всего: {sum(report.result for report in reports)}, '
+            f'запросов за тик: в среднем {sum(report.queries for report in reports) / len(reports):.1f}, '
+            f'максимум {max(report.queries for report in reports)}, '
+            f'время тика: в среднем {total_duration / len(reports) * 1000:.1f} мс, '
+            f'максимум {max(report.duration for report in reports) * 1000:.1f} мс'
+        )
+    return lines
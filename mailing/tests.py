@@ -1,3 +1,1427 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from email import message_from_bytes, policy
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.views.generic import ListView
+
+from mailing import services, simulation
+from mailing.async_smtp import AsyncSMTPDispatcher, OutgoingEmail, StubSMTPServer
+from mailing.emails import build_mailing_email, is_personalised
+from mailing.forms import MessageForm
+from mailing.load_data import generate_load_data
+from mailing.scheduler import MailingScheduler
+from mailing.throttling import TokenBucket
+from mailing.models import Client, DeliveryRetry, DeliveryStats, Log, Mailing, Message, Outbox, RecipientSchedule, \
+    UserStats
+from config import settings as config_settings
+from config.pagination import KeysetPaginationMixin, decode_cursor, encode_cursor
+from users.models import User
+
+
+class HotQueryIndexTestCase(TestCase):
+    """
+    Проверка планов выполнения основных запросов рассылок через EXPLAIN:
+    каждый запрос должен использовать составной индекс, а не последовательное чтение таблицы
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        now = timezone.now()
+        cls.users = User.objects.bulk_create([User(email=f'user{index}@example.com') for index in range(5)])
+        cls.clients = Client.objects.bulk_create([
+            Client(email=f'client{index}@example.com', name=f'Клиент {index}', owner=cls.users[index % 5])
+            for index in range(500)
+        ])
+        message = Message.objects.create(subject='Тема', body='Текст')
+        cls.mailings = Mailing.objects.bulk_create([
+            Mailing(
+                start_time=now + timedelta(hours=index - 50),
+                frequency=Mailing.FREQUENCY[index % 3][0],
+                status=Mailing.STATUSES[index % 3][0],
+                message=message,
+                owner=cls.users[index % 5]
+            )
+            for index in range(100)
+        ])
+        Log.objects.bulk_create([
+            Log(
+                last_try=now - timedelta(minutes=index),
+                status=Log.STATUSES[index % 2][0],
+                client=cls.clients[index % 500],
+                mailing=cls.mailings[index % 100]
+            )
+            for index in range(5000)
+        ])
+
+    def setUp(self) -> None:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # На небольших тестовых данных PostgreSQL предпочитает последовательное чтение.
+                # SET LOCAL действует до отката транзакции теста и не влияет на следующие тесты
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            else:
+                cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset: QuerySet, index_name: str) -> None:
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('Seq Scan', plan)
+        # Полное чтение таблицы в SQLite: строка плана "SCAN <таблица>" без индекса
+        self.assertIsNone(re.search(r'\bSCAN \w+\s*$', plan, re.MULTILINE), plan)
+
+    def test_last_log_of_recipient(self) -> None:
+        queryset = Log.objects.filter(mailing=self.mailings[0], client=self.clients[0]).order_by('-last_try')
+        self.assertUsesIndex(queryset, 'log_mailing_client_try_idx')
+
+    def test_mailings_to_start(self) -> None:
+        queryset = Mailing.objects.filter(status=Mailing.STATUSES[0][0], start_time__lte=timezone.now())
+        self.assertUsesIndex(queryset, 'mailing_status_start_idx')
+
+    def test_clients_of_owner(self) -> None:
+        queryset = Client.objects.filter(owner=self.users[0]).order_by('name')
+        self.assertUsesIndex(queryset, 'client_owner_name_idx')
+
+    def test_mailings_of_owner(self) -> None:
+        queryset = Mailing.objects.filter(owner=self.users[0]).order_by('-updated_at')
+        self.assertUsesIndex(queryset, 'mailing_owner_updated_idx')
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    MAILING_RATE_LIMIT=0,
+    MAILING_METRICS_ENABLED=False
+)
+class DispatcherBenchmarkTestCase(TestCase):
+    """
+    Замеры функций mailing.services на наборах данных возрастающего размера.
+
+    Для каждого замера записываются время и количество запросов к базе данных;
+    количество запросов не должно превышать бюджет, не зависящий от количества получателей,
+    поэтому возврат к запросам на каждого получателя приводит к падению теста.
+    Результаты записываются в JSON-файл, только если его путь задан
+    переменной окружения MAILING_BENCHMARK_RESULTS
+    """
+
+    # Количество клиентов (и получателей каждой рассылки) в наборах данных
+    SIZES = (10, 50, 200)
+    MAILINGS = 2
+
+    # Бюджеты запросов: все отправки одного запуска помещаются в одну пачку логов,
+    # каждый переход статусов - отдельная транзакция (внутри теста - точка сохранения)
+    # с запросом обновления счетчиков на каждого владельца (в наборе он один)
+    BUDGETS = {
+        'send_mails_regular': 30,
+        'change_status_to_started': 8,
+        'send_mailing': 10,
+        'cache_statistic_card': 1,
+    }
+
+    results = []
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        path = os.getenv('MAILING_BENCHMARK_RESULTS')
+        if not path:
+            return
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(cls.results, file, ensure_ascii=False, indent=2)
+
+    def make_dataset(self, size: int) -> User:
+        generate_load_data(
+            users=1, clients=size, messages=self.MAILINGS, mailings=self.MAILINGS, recipients=size,
+            logs=0, blog_entries=0, seed=size, prefix=f'benchmark{size}'
+        )
+        owner = User.objects.get(email=f'benchmark{size}-user0@example.com')
+        mailings = Mailing.objects.filter(owner=owner)
+        mailings.update(start_time=timezone.now() - timedelta(days=1), end_time=None)
+        RecipientSchedule.objects.filter(mailing__in=mailings).update(next_send_at=timezone.now() - timedelta(days=1))
+        return owner
+
+    def measure(self, name: str, size: int, function, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            duration = time.perf_counter() - start
+
+        self.results.append({
+            'benchmark': name,
+            'size': size,
+            'queries': len(queries),
+            'budget': self.BUDGETS[name],
+            'duration': duration,
+        })
+        self.assertLessEqual(len(queries), self.BUDGETS[name], f'{name} ({size}): {len(queries)} запросов')
+        return result
+
+    def test_send_mails_regular(self) -> None:
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                self.make_dataset(size)
+                Mailing.objects.update(status=Mailing.STATUSES[1][0])
+                mail.outbox = []
+
+                sent = self.measure('send_mails_regular', size, services.send_mails_regular)
+
+                self.assertEqual(sent, size * self.MAILINGS)
+                self.assertEqual(len(mail.outbox), sent)
+                Mailing.objects.update(status=Mailing.STATUSES[2][0])
+
+    def test_change_status_to_started(self) -> None:
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                owner = self.make_dataset(size)
+                Mailing.objects.filter(owner=owner).update(status=Mailing.STATUSES[0][0])
+
+                transitions = self.measure('change_status_to_started', size, services.change_status_to_started)
+
+                self.assertEqual(transitions[Mailing.STATUSES[1][0]], self.MAILINGS)
+
+    def test_send_mailing(self) -> None:
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                owner = self.make_dataset(size)
+                mailing = Mailing.objects.filter(owner=owner).select_related('message').first()
+                client = Client.objects.filter(owner=owner).first()
+
+                self.measure('send_mailing', size, services.send_mailing, mailing, client)
+
+                self.assertTrue(Log.objects.filter(mailing=mailing, client=client).exists())
+
+    def test_cache_statistic_card(self) -> None:
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                owner = self.make_dataset(size)
+                cache.clear()
+
+                card_info = self.measure('cache_statistic_card', size, services.cache_statistic_card, owner)
+
+                self.assertEqual(card_info['total_mailings'], self.MAILINGS)
+                self.assertEqual(card_info['unique_clients'], size)
+
+
+class ViewQueryCountTestCase(TestCase):
+    """
+    Проверка количества запросов к базе данных страниц рассылок и клиентов:
+    оно не должно превышать бюджет и не должно зависеть от количества выводимых записей
+    """
+
+    # Количество клиентов и рассылок пользователя в наборах данных
+    SIZES = (3, 15)
+
+    # Бюджеты запросов: сессия, пользователь и проверка группы менеджеров (3 запроса,
+    # группа проверяется один раз за запрос) плюс запросы самой страницы
+    BUDGETS = {
+        'mailing:mailing_list': 4,
+        'mailing:recipients_list': 4,
+        'mailing:mailing_card': 5,
+        'mailing:update_mailing': 6,
+        'mailing:delete_mailing': 4,
+        'mailing:update_recipient': 4,
+        'mailing:delete_recipient': 4,
+    }
+
+    def make_dataset(self, size: int) -> tuple[User, Mailing, Client]:
+        owner = User.objects.create(email=f'owner{size}@example.com', is_active=True)
+        clients = Client.objects.bulk_create([
+            Client(email=f'client{size}-{index}@example.com', name=f'Клиент {index}', owner=owner)
+            for index in range(size)
+        ])
+        for index in range(size):
+            mailing = Mailing.objects.create(
+                start_time=timezone.now(),
+                frequency=Mailing.FREQUENCY[0][0],
+                message=Message.objects.create(subject=f'Тема {index}', body='Текст'),
+                owner=owner
+            )
+            mailing.recipients.set(clients)
+        return owner, mailing, clients[0]
+
+    def count_queries(self, user: User, name: str, pk: int | None = None) -> int:
+        self.client.force_login(user)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name, args=[pk] if pk else None))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_counts(self) -> None:
+        counts = {}
+        for size in self.SIZES:
+            owner, mailing, client = self.make_dataset(size)
+            pages = {
+                'mailing:mailing_list': None,
+                'mailing:recipients_list': None,
+                'mailing:mailing_card': mailing.pk,
+                'mailing:update_mailing': mailing.pk,
+                'mailing:delete_mailing': mailing.pk,
+                'mailing:update_recipient': client.pk,
+                'mailing:delete_recipient': client.pk,
+            }
+            for name, pk in pages.items():
+                counts.setdefault(name, []).append(self.count_queries(owner, name, pk))
+
+        for name, page_counts in counts.items():
+            with self.subTest(page=name):
+                self.assertEqual(len(set(page_counts)), 1, f'{name}: {page_counts}')
+                self.assertLessEqual(page_counts[0], self.BUDGETS[name], f'{name}: {page_counts[0]} запросов')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class MessageTemplateTestCase(TestCase):
+    """Проверка персонализации тела сообщения и обработки ошибок шаблона"""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.owner = User.objects.create(email='owner@example.com')
+        cls.client_object = Client.objects.create(
+            email='ivanov@example.com', name='Иванов Иван', comment='Постоянный клиент', owner=cls.owner
+        )
+
+    def make_mailing(self, body: str) -> Mailing:
+        mailing = Mailing.objects.create(
+            start_time=timezone.now() - timedelta(days=1),
+            frequency=Mailing.FREQUENCY[0][0],
+            status=Mailing.STATUSES[1][0],
+            message=Message.objects.create(subject='Тема', body=body),
+            owner=self.owner
+        )
+        mailing.recipients.add(self.client_object)
+        return mailing
+
+    def test_personalised_body(self) -> None:
+        message = Message.objects.create(subject='Тема', body='Здравствуйте, {{ name }} ({{ email }})! {{ comment }}')
+
+        email = build_mailing_email(message, self.client_object)
+
+        self.assertEqual(email.body, 'Здравствуйте, Иванов Иван (ivanov@example.com)! Постоянный клиент')
+
+    def test_literal_braces(self) -> None:
+        body = 'Формат ответа: {"id": 1}, {{ id }} и {% raw %} остаются как есть'
+        message = Message.objects.create(subject='Тема', body=body)
+
+        email = build_mailing_email(message, self.client_object)
+
+        self.assertFalse(is_personalised(message))
+        self.assertEqual(email.body, body)
+        self.assertIn(body, email.message().get_payload(decode=True).decode())
+
+    def test_malformed_template_rejected_by_form(self) -> None:
+        for body in ('{{ name }} {% if %}', '{{ name }} {% include "missing.html" %}'):
+            with self.subTest(body=body):
+                form = MessageForm(data={'subject': 'Тема', 'body': body})
+
+                self.assertFalse(form.is_valid())
+                self.assertIn('body', form.errors)
+
+        self.assertTrue(MessageForm(data={'subject': 'Тема', 'body': 'Здравствуйте, {{ name }}!'}).is_valid())
+
+    def test_malformed_template_does_not_stop_dispatch(self) -> None:
+        broken = self.make_mailing('{{ name }} {% if %}')
+        valid = self.make_mailing('Здравствуйте, {{ name }}!')
+
+        attempts = services.send_mailings([(broken, self.client_object), (valid, self.client_object)])
+
+        self.assertEqual(attempts, 2)
+        self.assertEqual([email.body for email in mail.outbox], ['Здравствуйте, Иванов Иван!'])
+        self.assertEqual(Log.objects.get(mailing=broken).status, Log.STATUSES[1][0])
+        self.assertEqual(Log.objects.get(mailing=valid).status, Log.STATUSES[0][0])
+
+
+class SimulationTestCase(TestCase):
+    """Проверка изоляции симуляции запусков отправки от рабочих базы данных и кеша"""
+
+    def test_simulation_does_not_touch_live_data(self) -> None:
+        owner = User.objects.create(email='owner@example.com')
+        clients = Client.objects.bulk_create([
+            Client(email=f'client{index}@example.com', name=f'Клиент {index}', owner=owner) for index in range(5)
+        ])
+        mailing = Mailing.objects.create(
+            start_time=timezone.now() - timedelta(days=1),
+            frequency=Mailing.FREQUENCY[0][0],
+            status=Mailing.STATUSES[1][0],
+            message=Message.objects.create(subject='Тема', body='Текст'),
+            owner=owner
+        )
+        mailing.recipients.set(clients)
+        RecipientSchedule.objects.update(next_send_at=timezone.now() - timedelta(hours=1))
+        cache.set('simulation_marker', 'live')
+
+        reports = simulation.simulate(
+            lambda clock: services.send_mails_regular(clock=clock),
+            days=2,
+            tick=timedelta(hours=1)
+        )
+
+        self.assertEqual(sum(report.result for report in reports), 10)
+        self.assertFalse(Log.objects.exists())
+        self.assertEqual(
+            list(RecipientSchedule.objects.values_list('last_try', flat=True)),
+            [None] * 5
+        )
+        self.assertEqual(cache.get('simulation_marker'), 'live')
+
+    def test_query_count_past_queries_log_limit(self) -> None:
+        User.objects.create(email='owner@example.com')
+
+        def step(clock) -> int:
+            for _ in range(100):
+                User.objects.exists()
+            return 0
+
+        # 120 тиков по 100 запросов больше длины connection.queries_log (9000)
+        reports = simulation.simulate(step, days=5, tick=timedelta(hours=1))
+
+        self.assertEqual(len(reports), 120)
+        self.assertEqual({report.queries for report in reports}, {100})
+
+
+class RecipientScheduleSyncTestCase(TestCase):
+    """Проверка поддержания расписания отправок (RecipientSchedule) при изменении рассылок и получателей"""
+
+    def setUp(self) -> None:
+        self.start_time = timezone.now().replace(microsecond=0) - timedelta(days=10)
+        owner = User.objects.create(email='owner@example.com')
+        self.clients = [
+            Client.objects.create(email=f'client{number}@example.com', name='Клиент', owner=owner)
+            for number in range(3)
+        ]
+        self.mailing = Mailing.objects.create(
+            start_time=self.start_time,
+            frequency=Mailing.FREQUENCY[0][0],
+            status=Mailing.STATUSES[1][0],
+            message=Message.objects.create(subject='Тема', body='Текст'),
+            owner=owner
+        )
+
+    def get_schedule(self) -> dict:
+        return dict(RecipientSchedule.objects.filter(mailing=self.mailing).values_list('client_id', 'next_send_at'))
+
+    def test_backfill_migration(self) -> None:
+        self.mailing.recipients.set(self.clients[:2])
+        last_try = self.start_time + timedelta(days=3)
+        Log.objects.create(last_try=last_try, status=Log.STATUSES[0][0], client=self.clients[0], mailing=self.mailing)
+        RecipientSchedule.objects.all().delete()
+
+        migration = importlib.import_module('mailing.migrations.0006_backfill_recipientschedule')
+        migration.backfill_recipient_schedule(apps, None)
+
+        self.assertEqual(self.get_schedule(), {
+            self.clients[0].pk: last_try + timedelta(days=1),
+            self.clients[1].pk: self.start_time,
+        })
+
+    def test_add_recipients(self) -> None:
+        self.mailing.recipients.add(self.clients[0])
+        self.clients[1].mailing_set.add(self.mailing)
+
+        self.assertEqual(self.get_schedule(), {
+            self.clients[0].pk: self.start_time,
+            self.clients[1].pk: self.start_time,
+        })
+
+    def test_remove_recipients(self) -> None:
+        self.mailing.recipients.set(self.clients)
+
+        self.mailing.recipients.remove(self.clients[0])
+        self.clients[1].mailing_set.remove(self.mailing)
+
+        self.assertEqual(list(self.get_schedule()), [self.clients[2].pk])
+
+    def test_clear_recipients(self) -> None:
+        self.mailing.recipients.set(self.clients)
+
+        self.clients[0].mailing_set.clear()
+        self.assertEqual(set(self.get_schedule()), {self.clients[1].pk, self.clients[2].pk})
+
+        self.mailing.recipients.clear()
+        self.assertEqual(self.get_schedule(), {})
+
+    def test_edit_start_time_and_frequency(self) -> None:
+        self.mailing.recipients.set(self.clients[:2])
+        last_try = self.start_time + timedelta(days=3)
+        Log.objects.create(last_try=last_try, status=Log.STATUSES[0][0], client=self.clients[0], mailing=self.mailing)
+
+        self.mailing.start_time = self.start_time + timedelta(days=1)
+        self.mailing.frequency = Mailing.FREQUENCY[1][0]
+        self.mailing.save()
+
+        self.assertEqual(self.get_schedule(), {
+            self.clients[0].pk: last_try + timedelta(days=7),
+            self.clients[1].pk: self.start_time + timedelta(days=1),
+        })
+
+    def test_finished_mailing_is_not_rebuilt(self) -> None:
+        self.mailing.recipients.set(self.clients)
+        self.mailing.status = Mailing.STATUSES[2][0]
+
+        with mock.patch.object(services, 'rebuild_schedule') as rebuild_schedule:
+            self.mailing.save()
+
+        rebuild_schedule.assert_not_called()
+
+
+class LogCompactionTestCase(TestCase):
+    """Проверка сводной статистики отправок (DeliveryStats) и очистки старых логов рассылок"""
+
+    def setUp(self) -> None:
+        # Полдень по местному времени, чтобы сдвиги на целые дни не переходили границу дня
+        self.noon = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        owner = User.objects.create(email='owner@example.com')
+        self.clients = [
+            Client.objects.create(email=f'client{number}@example.com', name='Клиент', owner=owner)
+            for number in range(2)
+        ]
+        self.mailing = Mailing.objects.create(
+            start_time=self.noon - timedelta(days=60),
+            frequency=Mailing.FREQUENCY[0][0],
+            status=Mailing.STATUSES[1][0],
+            message=Message.objects.create(subject='Тема', body='Текст'),
+            owner=owner
+        )
+        self.mailing.recipients.set(self.clients)
+
+    def make_log(self, last_try, status: str = Log.STATUSES[0][0], client: Client | None = None) -> Log:
+        return Log(last_try=last_try, status=status, client=client or self.clients[0], mailing=self.mailing)
+
+    def get_stats(self) -> dict:
+        return {(row.day, row.status): row.count for row in DeliveryStats.objects.filter(mailing=self.mailing)}
+
+    def test_rollup_counts(self) -> None:
+        yesterday = self.noon - timedelta(days=1)
+        services.record_logs([
+            self.make_log(yesterday),
+            self.make_log(yesterday + timedelta(hours=1), client=self.clients[1]),
+            self.make_log(yesterday, Log.STATUSES[1][0]),
+            self.make_log(self.noon),
+        ])
+        services.record_logs([self.make_log(self.noon, client=self.clients[1])])
+        expected = {
+            (yesterday.date(), Log.STATUSES[0][0]): 2,
+            (yesterday.date(), Log.STATUSES[1][0]): 1,
+            (self.noon.date(), Log.STATUSES[0][0]): 2,
+        }
+
+        self.assertEqual(self.get_stats(), expected)
+        DeliveryStats.objects.update(count=0)
+        services.rebuild_delivery_stats()
+        self.assertEqual(self.get_stats(), expected)
+
+    def test_compaction_respects_cutoff(self) -> None:
+        cutoff = self.noon.replace(hour=0) - timedelta(days=30)
+        services.record_logs([
+            self.make_log(self.noon - timedelta(days=40)),
+            self.make_log(cutoff - timedelta(seconds=1)),
+            self.make_log(cutoff),
+            self.make_log(self.noon - timedelta(days=1)),
+        ])
+        stats = self.get_stats()
+
+        deleted = services.compact_logs(days=30, chunk_size=1)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(
+            sorted(Log.objects.values_list('last_try', flat=True)),
+            [cutoff, self.noon - timedelta(days=1)]
+        )
+        # Сводная статистика за удаленные дни сохраняется
+        self.assertEqual(self.get_stats(), stats)
+
+    def test_last_try_survives_compaction(self) -> None:
+        last_tries = [self.noon - timedelta(days=45), self.noon - timedelta(days=40)]
+        services.record_logs([
+            self.make_log(last_try, client=client) for last_try, client in zip(last_tries, self.clients)
+        ])
+
+        self.assertEqual(services.compact_logs(days=30), 2)
+        services.rebuild_schedule(mailing_ids=[self.mailing.pk])
+
+        schedule = {
+            item.client_id: (item.last_try, item.next_send_at)
+            for item in RecipientSchedule.objects.filter(mailing=self.mailing)
+        }
+        self.assertEqual(schedule, {
+            client.pk: (last_try, last_try + timedelta(days=1)) for last_try, client in zip(last_tries, self.clients)
+        })
+        due = services.get_due_recipients(self.noon)
+        self.assertEqual(len(due), 2)
+
+
+class UserStatsTestCase(TestCase):
+    """Проверка инкрементального обновления счетчиков статистики пользователей (UserStats)"""
+
+    def setUp(self) -> None:
+        self.first = User.objects.create(email='first@example.com')
+        self.second = User.objects.create(email='second@example.com')
+        self.message = Message.objects.create(subject='Тема', body='Текст')
+
+    def get_stats(self, user: User) -> tuple[int, int, int]:
+        stats = UserStats.objects.get(pk=user.pk)
+        return stats.total_mailings, stats.active_mailings, stats.unique_clients
+
+    def make_mailing(self, owner: User, status: str = Mailing.STATUSES[0][0]) -> Mailing:
+        return Mailing.objects.create(
+            start_time=timezone.now(),
+            frequency=Mailing.FREQUENCY[0][0],
+            status=status,
+            message=self.message,
+            owner=owner
+        )
+
+    def test_client_owner_change(self) -> None:
+        client = Client.objects.create(email='client@example.com', name='Клиент', owner=self.first)
+        Client.objects.create(email='other@example.com', name='Клиент', owner=self.second)
+
+        client.owner = self.second
+        client.save()
+
+        self.assertEqual(self.get_stats(self.first), (0, 0, 0))
+        self.assertEqual(self.get_stats(self.second), (0, 0, 2))
+
+    def test_shared_email_is_counted_once(self) -> None:
+        clients = [
+            Client.objects.create(email='client@example.com', name=f'Клиент {number}', owner=self.first)
+            for number in range(2)
+        ]
+        self.assertEqual(self.get_stats(self.first), (0, 0, 1))
+
+        clients[0].email = 'renamed@example.com'
+        clients[0].save()
+        self.assertEqual(self.get_stats(self.first), (0, 0, 2))
+
+        clients[0].email = 'client@example.com'
+        clients[0].save()
+        self.assertEqual(self.get_stats(self.first), (0, 0, 1))
+
+        clients[0].delete()
+        self.assertEqual(self.get_stats(self.first), (0, 0, 1))
+        clients[1].delete()
+        self.assertEqual(self.get_stats(self.first), (0, 0, 0))
+
+    def test_mailing_delete(self) -> None:
+        self.make_mailing(self.first)
+        active = self.make_mailing(self.first, Mailing.STATUSES[1][0])
+        self.assertEqual(self.get_stats(self.first), (2, 1, 0))
+
+        active.delete()
+
+        self.assertEqual(self.get_stats(self.first), (1, 0, 0))
+
+    def test_mailing_status_transitions(self) -> None:
+        mailing = self.make_mailing(self.first)
+
+        mailing.status = Mailing.STATUSES[1][0]
+        mailing.save()
+        self.assertEqual(self.get_stats(self.first), (1, 1, 0))
+
+        mailing.owner = self.second
+        mailing.save()
+        self.assertEqual(self.get_stats(self.first), (0, 0, 0))
+        self.assertEqual(self.get_stats(self.second), (1, 1, 0))
+
+        mailing.status = Mailing.STATUSES[2][0]
+        mailing.save()
+        self.assertEqual(self.get_stats(self.second), (1, 0, 0))
+
+        Mailing.objects.filter(pk=mailing.pk).update(status=Mailing.STATUSES[0][0])
+        services.update_mailing_statuses(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.get_stats(self.second), (1, 1, 0))
+
+    def test_rebuild_fixes_drift(self) -> None:
+        self.make_mailing(self.first, Mailing.STATUSES[1][0])
+        Client.objects.create(email='client@example.com', name='Клиент', owner=self.first)
+        UserStats.objects.filter(pk=self.first.pk).update(total_mailings=7, active_mailings=0, unique_clients=3)
+
+        services.rebuild_user_stats([self.first.pk])
+
+        self.assertEqual(self.get_stats(self.first), (1, 1, 1))
+
+
+class StatisticCardCacheTestCase(TestCase):
+    """Проверка сброса кеша карточки статистики при создании, изменении и удалении клиентов и рассылок"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.owner = User.objects.create(email='owner@example.com')
+        self.enterContext(simulation.patch_settings(CACHE_ENABLED=True))
+
+    def assertCardChanges(self, change, **expected) -> None:
+        previous = services.cache_statistic_card(self.owner)
+        key = services.get_statistic_card_key(self.owner.pk)
+
+        change()
+
+        card_info = services.cache_statistic_card(self.owner)
+        self.assertEqual({name: card_info[name] for name in expected}, expected)
+        self.assertEqual(card_info, services.get_statistic_card(self.owner))
+        if card_info != previous:
+            self.assertNotEqual(services.get_statistic_card_key(self.owner.pk), key)
+
+    def test_client_changes(self) -> None:
+        client = Client(email='client@example.com', name='Клиент', owner=self.owner)
+        other = Client(email='other@example.com', name='Клиент', owner=self.owner)
+
+        self.assertCardChanges(client.save, unique_clients=1)
+        self.assertCardChanges(other.save, unique_clients=2)
+
+        def edit() -> None:
+            other.email = client.email
+            other.save()
+
+        self.assertCardChanges(edit, unique_clients=1)
+        # Удаление клиента с повторяющимся e-mail не меняет карточку
+        self.assertCardChanges(other.delete, unique_clients=1)
+        self.assertCardChanges(client.delete, unique_clients=0)
+
+    def test_mailing_changes(self) -> None:
+        mailing = Mailing(
+            start_time=timezone.now(),
+            frequency=Mailing.FREQUENCY[0][0],
+            message=Message.objects.create(subject='Тема', body='Текст'),
+            owner=self.owner
+        )
+
+        self.assertCardChanges(mailing.save, total_mailings=1, active_mailings=0)
+
+        def edit() -> None:
+            mailing.status = Mailing.STATUSES[1][0]
+            mailing.save()
+
+        self.assertCardChanges(edit, total_mailings=1, active_mailings=1)
+        self.assertCardChanges(mailing.delete, total_mailings=0, active_mailings=0)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Почтовый бэкенд, на котором каждая отправка завершается ошибкой SMTP"""
+
+    def send_messages(self, email_messages) -> int:
+        raise SMTPException('Сервер недоступен')
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    """Почтовый бэкенд, к серверу которого не удается подключиться"""
+
+    def open(self) -> None:
+        raise ConnectionRefusedError('Сервер недоступен')
+
+    def send_messages(self, email_messages) -> int:
+        self.open()
+
+
+class RetryQueueTestCase(TestCase):
+    """Проверка очереди повторных отправок (DeliveryRetry)"""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        owner = User.objects.create(email='owner@example.com')
+        cls.client_object = Client.objects.create(email='client@example.com', name='Клиент', owner=owner)
+        cls.mailing = Mailing.objects.create(
+            start_time=timezone.now() - timedelta(days=1),
+            frequency=Mailing.FREQUENCY[0][0],
+            status=Mailing.STATUSES[1][0],
+            message=Message.objects.create(subject='Тема', body='Текст'),
+            owner=owner
+        )
+        cls.mailing.recipients.add(cls.client_object)
+
+    def make_log(self, status: str, last_try=None) -> Log:
+        return Log(
+            last_try=last_try or timezone.now(),
+            status=status,
+            client=self.client_object,
+            mailing=self.mailing
+        )
+
+    def get_retry(self) -> DeliveryRetry:
+        return DeliveryRetry.objects.get(mailing=self.mailing, client=self.client_object)
+
+    def test_failed_send_schedules_retry(self) -> None:
+        log = self.make_log(Log.STATUSES[1][0])
+
+        services.update_retries([log])
+
+        retry = self.get_retry()
+        base_delay = timedelta(seconds=config_settings.MAILING_RETRY_BASE_DELAY)
+        self.assertEqual(retry.attempts, 1)
+        self.assertEqual(retry.status, DeliveryRetry.STATUSES[0][0])
+        self.assertGreaterEqual(retry.retry_at, log.last_try + base_delay / 2)
+        self.assertLessEqual(retry.retry_at, log.last_try + base_delay)
+
+    def test_backoff(self) -> None:
+        for attempts in range(1, 12):
+            with self.subTest(attempts=attempts):
+                delay = min(
+                    config_settings.MAILING_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+                    config_settings.MAILING_RETRY_MAX_DELAY
+                )
+                for _ in range(20):
+                    seconds = services.get_retry_delay(attempts).total_seconds()
+                    self.assertGreaterEqual(seconds, delay / 2)
+                    self.assertLessEqual(seconds, delay)
+
+    def test_max_attempts(self) -> None:
+        for attempts in range(1, config_settings.MAILING_RETRY_MAX_ATTEMPTS + 1):
+            services.update_retries([self.make_log(Log.STATUSES[1][0])])
+            retry = self.get_retry()
+            self.assertEqual(retry.attempts, attempts)
+
+        self.assertEqual(retry.status, DeliveryRetry.STATUSES[1][0])
+        self.assertEqual(services.claim_retries(retry.retry_at, 60), [])
+
+    def test_success_clears_retry(self) -> None:
+        services.update_retries([self.make_log(Log.STATUSES[1][0])])
+
+        services.update_retries([self.make_log(Log.STATUSES[0][0])])
+
+        self.assertFalse(DeliveryRetry.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='mailing.tests.UnreachableEmailBackend', MAILING_RATE_LIMIT=0)
+    def test_connection_failure_schedules_retries(self) -> None:
+        with mock.patch.object(services, 'mail_admins') as mail_admins:
+            attempts = services.send_mailings([(self.mailing, self.client_object)])
+
+        self.assertEqual(attempts, 1)
+        mail_admins.assert_called_once()
+        self.assertEqual(
+            list(Log.objects.values_list('client_id', 'status')),
+            [(self.client_object.pk, Log.STATUSES[1][0])]
+        )
+        self.assertEqual(self.get_retry().attempts, 1)
+
+    @override_settings(EMAIL_BACKEND='mailing.tests.FailingEmailBackend', MAILING_RATE_LIMIT=0,
+                       MAILING_METRICS_ENABLED=False)
+    def test_new_cycle_resets_attempts(self) -> None:
+        DeliveryRetry.objects.create(
+            mailing=self.mailing,
+            client=self.client_object,
+            attempts=config_settings.MAILING_RETRY_MAX_ATTEMPTS,
+            retry_at=timezone.now() - timedelta(days=1),
+            status=DeliveryRetry.STATUSES[1][0]
+        )
+        RecipientSchedule.objects.update(next_send_at=timezone.now() - timedelta(minutes=1))
+
+        attempts = services.send_mails_regular()
+
+        retry = self.get_retry()
+        self.assertEqual(attempts, 1)
+        self.assertEqual(retry.attempts, 1)
+        self.assertEqual(retry.status, DeliveryRetry.STATUSES[0][0])
+
+
+@override_settings(MAILING_METRICS_ENABLED=False)
+class MailingSchedulerTestCase(TestCase):
+    """Проверка обработки событий старта, окончания рассылок и отправки писем планировщиком"""
+
+    def setUp(self) -> None:
+        self.now = timezone.now().replace(microsecond=0)
+        self.owner = User.objects.create(email='owner@example.com')
+        self.client_object = Client.objects.create(email='client@example.com', name='Клиент', owner=self.owner)
+        self.scheduler = MailingScheduler(clock=lambda: self.now)
+
+    def make_mailing(self, status: str, start_time, end_time=None) -> Mailing:
+        mailing = Mailing.objects.create(
+            start_time=start_time,
+            end_time=end_time,
+            frequency=Mailing.FREQUENCY[0][0],
+            status=status,
+            message=Message.objects.create(subject='Тема', body='Текст'),
+            owner=self.owner
+        )
+        mailing.recipients.add(self.client_object)
+        return mailing
+
+    def get_send_times(self) -> list:
+        return [event[0] for event in self.scheduler.events if event[2] == MailingScheduler.SEND]
+
+    def test_start_event_at_start_time(self) -> None:
+        mailing = self.make_mailing(Mailing.STATUSES[0][0], start_time=self.now)
+
+        with mock.patch.object(services, 'send_mails_regular', return_value=0):
+            self.scheduler.run_pending()
+
+        mailing.refresh_from_db()
+        self.assertEqual(mailing.status, Mailing.STATUSES[1][0])
+
+    def test_end_event_at_end_time(self) -> None:
+        mailing = self.make_mailing(
+            Mailing.STATUSES[1][0],
+            start_time=self.now - timedelta(days=1),
+            end_time=self.now
+        )
+
+        with mock.patch.object(services, 'send_mails_regular', return_value=0):
+            self.scheduler.run_pending()
+
+        mailing.refresh_from_db()
+        self.assertEqual(mailing.status, Mailing.STATUSES[2][0])
+
+    def test_counters_follow_transitioned_rows(self) -> None:
+        self.make_mailing(Mailing.STATUSES[0][0], start_time=self.now)
+        edited = self.make_mailing(Mailing.STATUSES[1][0], start_time=self.now - timedelta(days=1))
+        # Рассылка, измененная в то же время, но не менявшая статус, не должна попасть в счетчик
+        Mailing.objects.filter(pk=edited.pk).update(updated_at=self.now)
+        services.rebuild_user_stats([self.owner.pk])
+
+        services.update_mailing_statuses(self.now)
+
+        self.assertEqual(UserStats.objects.get(pk=self.owner.pk).active_mailings, 2)
+
+    def test_failed_start_is_retried(self) -> None:
+        mailing = self.make_mailing(Mailing.STATUSES[0][0], start_time=self.now)
+
+        with mock.patch.object(services, 'update_mailing_statuses', side_effect=RuntimeError), \
+                self.assertLogs('mailing.scheduler', 'ERROR'):
+            self.scheduler.run_pending()
+        mailing.refresh_from_db()
+        self.assertEqual(mailing.status, Mailing.STATUSES[0][0])
+
+        self.now += MailingScheduler.RETRY_INTERVAL
+        self.scheduler.run_pending()
+
+        mailing.refresh_from_db()
+        self.assertEqual(mailing.status, Mailing.STATUSES[1][0])
+
+    def make_due_mailing(self) -> Mailing:
+        mailing = self.make_mailing(Mailing.STATUSES[1][0], start_time=self.now - timedelta(days=1))
+        RecipientSchedule.objects.update(next_send_at=self.now - timedelta(minutes=1))
+        return mailing
+
+    def test_failed_send_is_rescheduled(self) -> None:
+        self.make_due_mailing()
+
+        with mock.patch.object(services, 'send_mails_regular', side_effect=RuntimeError) as send, \
+                self.assertLogs('mailing.scheduler', 'ERROR'):
+            self.scheduler.run_pending()
+
+        send.assert_called_once()
+        # После ошибки отправка повторяется не раньше следующей подгрузки, а не каждую секунду
+        self.assertEqual(self.get_send_times(), [self.scheduler.next_reload])
+
+        self.now = self.scheduler.next_reload
+        with mock.patch.object(services, 'send_mails_regular', return_value=1) as send:
+            self.scheduler.run_pending()
+        send.assert_called_once()
+        self.assertEqual(self.get_send_times(), [self.now + MailingScheduler.MIN_SEND_INTERVAL])
+
+    def test_idle_send_backs_off_until_reload(self) -> None:
+        self.make_due_mailing()
+
+        with mock.patch.object(services, 'send_mails_regular', return_value=0) as send:
+            self.scheduler.run_pending()
+            self.now += MailingScheduler.MIN_SEND_INTERVAL
+            self.scheduler.run_pending()
+
+        send.assert_called_once()
+        self.assertEqual(self.get_send_times(), [self.scheduler.next_reload])
+
+    def test_live_lease_delays_send(self) -> None:
+        self.make_due_mailing()
+        claimed_until = self.now + timedelta(minutes=10)
+        RecipientSchedule.objects.update(claimed_by='dead-worker', claimed_until=claimed_until)
+
+        with mock.patch.object(services, 'send_mails_regular', return_value=0) as send:
+            self.scheduler.run_pending()
+
+        send.assert_not_called()
+        self.assertEqual(self.get_send_times(), [claimed_until])
+
+    def test_not_started_mailing_delays_send(self) -> None:
+        start_time = self.now + timedelta(hours=1)
+        self.make_mailing(Mailing.STATUSES[1][0], start_time=start_time)
+        RecipientSchedule.objects.update(next_send_at=self.now - timedelta(minutes=1))
+
+        with mock.patch.object(services, 'send_mails_regular', return_value=0) as send:
+            self.scheduler.run_pending()
+
+        send.assert_not_called()
+        self.assertEqual(self.get_send_times(), [start_time])
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', MAILING_RATE_LIMIT=1000,
+                       MAILING_RATE_BURST=1000, MAILING_DAILY_CAP=1)
+    def test_daily_cap_backs_off_until_reset(self) -> None:
+        cache.clear()
+        self.make_due_mailing()
+        self.make_mailing(Mailing.STATUSES[1][0], start_time=self.now - timedelta(days=1))
+        RecipientSchedule.objects.update(next_send_at=self.now - timedelta(minutes=1))
+        reset = timezone.make_aware(
+            datetime.combine(timezone.localdate() + timedelta(days=1), datetime.min.time())
+        )
+
+        self.scheduler.run_pending()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(self.get_send_times(), [reset])
+        # Подгрузка рассылок не отменяет ожидание сброса дневного лимита
+        self.now = self.scheduler.next_reload
+        self.scheduler.run_pending()
+        self.assertEqual(self.get_send_times(), [reset])
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', MAILING_RATE_LIMIT=0,
+                   MAILING_METRICS_ENABLED=False)
+class ClaimedDeliveryTestCase(TestCase):
+    """Проверка отправки в режиме захвата работы: захват пачек, истечение аренды и снятие захвата"""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        owner = User.objects.create(email='owner@example.com')
+        cls.mailing = Mailing.objects.create(
+            start_time=timezone.now() - timedelta(days=1),
+            frequency=Mailing.FREQUENCY[0][0],
+            status=Mailing.STATUSES[1][0],
+            message=Message.objects.create(subject='Тема', body='Текст'),
+            owner=owner
+        )
+        cls.mailing.recipients.set([
+            Client.objects.create(email=f'client{number}@example.com', name='Клиент', owner=owner)
+            for number in range(4)
+        ])
+
+    def setUp(self) -> None:
+        self.now = timezone.now()
+        RecipientSchedule.objects.update(next_send_at=self.now - timedelta(minutes=1))
+        cache.clear()
+
+    def test_workers_claim_disjoint_batches(self) -> None:
+        first = services.claim_due_recipients(self.now, 'first', 2, 60)
+        second = services.claim_due_recipients(self.now, 'second', 2, 60)
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({client.pk for _, client in first} & {client.pk for _, client in second})
+        self.assertEqual(services.claim_due_recipients(self.now, 'third', 2, 60), [])
+
+    def test_lease_expiry(self) -> None:
+        services.claim_due_recipients(self.now, 'dead-worker', 10, 60)
+
+        self.assertEqual(services.claim_due_recipients(self.now + timedelta(seconds=30), 'worker', 10, 60), [])
+        recipients = services.claim_due_recipients(self.now + timedelta(seconds=61), 'worker', 10, 60)
+
+        self.assertEqual(len(recipients), 4)
+        self.assertEqual(RecipientSchedule.objects.filter(claimed_by='worker').count(), 4)
+
+    @override_settings(MAILING_RATE_LIMIT=1000, MAILING_RATE_BURST=1000, MAILING_DAILY_CAP=1)
+    def test_deferred_claims_are_released(self) -> None:
+        attempts = services.send_mails_claimed(worker_id='worker', batch_size=10)
+
+        self.assertEqual(attempts, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(RecipientSchedule.objects.filter(claimed_by__isnull=False).exists())
+
+    def test_contended_claim_waits(self) -> None:
+        claim = services.claim_due_recipients
+        calls = []
+
+        def claim_after_contention(*args):
+            # Первый захват проигрывает гонку другому процессу, записи остаются ожидающими
+            calls.append(args)
+            return [] if len(calls) == 1 else claim(*args)
+
+        with mock.patch.object(services, 'claim_due_recipients', side_effect=claim_after_contention), \
+                mock.patch.object(services.time, 'sleep') as sleep:
+            attempts = services.send_mails_claimed(worker_id='worker', batch_size=10)
+
+        sleep.assert_called_once_with(config_settings.MAILING_CLAIM_RETRY_DELAY)
+        self.assertEqual(attempts, 4)
+
+
+class CrashingEmailBackend(BaseEmailBackend):
+    """Почтовый бэкенд, который отправляет первое письмо, а на втором падает (имитация падения процесса)"""
+
+    def send_messages(self, email_messages) -> int:
+        if mail.outbox:
+            raise RuntimeError('Процесс доставки упал')
+        mail.outbox.extend(email_messages)
+        return len(email_messages)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', MAILING_RATE_LIMIT=0)
+class OutboxDeliveryTestCase(TestCase):
+    """Проверка доставки писем из таблицы исходящих писем (Outbox): захват, аренда, восстановление и очистка"""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        owner = User.objects.create(email='owner@example.com')
+        cls.clients = [
+            Client.objects.create(email=f'client{number}@example.com', name='Клиент', owner=owner)
+            for number in range(3)
+        ]
+        cls.mailing = Mailing.objects.create(
+            start_time=timezone.now() - timedelta(days=1),
+            frequency=Mailing.FREQUENCY[0][0],
+            status=Mailing.STATUSES[1][0],
+            message=Message.objects.create(subject='Тема', body='Текст'),
+            owner=owner
+        )
+
+    def setUp(self) -> None:
+        for client in self.clients:
+            Outbox.objects.create(email=client.email, subject='Тема', body='Текст', client=client, mailing=self.mailing)
+
+    def test_delivery(self) -> None:
+        attempts = services.deliver_outbox(batch_size=2)
+
+        self.assertEqual(attempts, 3)
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox), [client.email for client in self.clients])
+        self.assertFalse(Outbox.objects.exclude(status=Outbox.STATUSES[1][0]).exists())
+        self.assertFalse(Outbox.objects.filter(claimed_by__isnull=False).exists())
+        self.assertEqual(Log.objects.filter(status=Log.STATUSES[0][0]).count(), 3)
+
+    def test_crashed_claim_resumes_after_lease(self) -> None:
+        now = timezone.now()
+        claimed = services.claim_outbox(now, 'dead-worker', 10, 60)
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(Outbox.objects.filter(status=Outbox.STATUSES[3][0]).count(), 3)
+
+        # Пока аренда упавшего процесса не истекла, письма никому не выдаются
+        self.assertEqual(services.deliver_outbox(clock=lambda: now + timedelta(seconds=30)), 0)
+        self.assertEqual(mail.outbox, [])
+
+        attempts = services.deliver_outbox(clock=lambda: now + timedelta(seconds=61))
+
+        self.assertEqual(attempts, 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(Outbox.objects.filter(status=Outbox.STATUSES[1][0]).count(), 3)
+
+    @override_settings(EMAIL_BACKEND='mailing.tests.CrashingEmailBackend')
+    def test_crash_mid_batch_records_sent(self) -> None:
+        with self.assertRaises(RuntimeError):
+            services.deliver_outbox(batch_size=10)
+
+        sent = Outbox.objects.get(status=Outbox.STATUSES[1][0])
+        self.assertEqual(sent.email, mail.outbox[0].to[0])
+        self.assertIsNone(sent.claimed_by)
+        self.assertEqual(Log.objects.count(), 1)
+        # Неотправленные письма остаются захваченными до истечения аренды и не будут отправлены дважды
+        self.assertEqual(Outbox.objects.filter(status=Outbox.STATUSES[3][0]).count(), 2)
+
+    def test_purge_removes_old_sent(self) -> None:
+        old, recent, pending = Outbox.objects.order_by('pk')
+        sent = Outbox.STATUSES[1][0]
+        Outbox.objects.filter(pk=old.pk).update(status=sent, sent_at=timezone.now() - timedelta(days=30))
+        Outbox.objects.filter(pk=recent.pk).update(status=sent, sent_at=timezone.now())
+
+        deleted = services.purge_outbox(days=7, chunk_size=1)
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(set(Outbox.objects.values_list('pk', flat=True)), {recent.pk, pending.pk})
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', MAILING_RATE_LIMIT=0,
+                   MAILING_METRICS_ENABLED=False)
+class OutboxPlanningTestCase(TestCase):
+    """Проверка планирования писем в таблицу исходящих писем (Outbox) без повторов и с повторными отправками"""
+
+    def setUp(self) -> None:
+        self.now = timezone.now()
+        owner = User.objects.create(email='owner@example.com')
+        self.client_object = Client.objects.create(email='client@example.com', name='Клиент', owner=owner)
+        self.mailing = Mailing.objects.create(
+            start_time=self.now - timedelta(days=1),
+            frequency=Mailing.FREQUENCY[0][0],
+            status=Mailing.STATUSES[1][0],
+            message=Message.objects.create(subject='Тема', body='Текст'),
+            owner=owner
+        )
+        self.mailing.recipients.add(self.client_object)
+
+    def test_edit_before_delivery_does_not_replan(self) -> None:
+        self.assertEqual(services.plan_outbox(self.now), 1)
+
+        # Изменение рассылки пересчитывает расписание (rebuild_schedule) до доставки письма
+        self.mailing.message = Message.objects.create(subject='Новая тема', body='Текст')
+        self.mailing.save()
+
+        self.assertEqual(services.plan_outbox(self.now + timedelta(minutes=1)), 0)
+        self.assertEqual(Outbox.objects.count(), 1)
+
+    def test_due_retries_are_planned(self) -> None:
+        RecipientSchedule.objects.update(next_send_at=self.now + timedelta(days=1))
+        DeliveryRetry.objects.create(
+            mailing=self.mailing,
+            client=self.client_object,
+            attempts=1,
+            retry_at=self.now - timedelta(minutes=1)
+        )
+
+        self.assertEqual(services.plan_outbox(self.now), 1)
+        # Пока письмо повторной отправки ждет доставки, оно не планируется еще раз
+        after_lease = self.now + timedelta(seconds=config_settings.MAILING_CLAIM_LEASE + 1)
+        self.assertEqual(services.plan_outbox(after_lease), 0)
+
+        self.assertEqual(services.deliver_outbox(), 1)
+        self.assertEqual(mail.outbox[0].to, [self.client_object.email])
+        self.assertFalse(DeliveryRetry.objects.exists())
+
+
+class StubSMTPServerMixin:
+    """Миксин тестов, запускающий SMTP-сервер-заглушку в отдельном потоке со своим циклом событий"""
+
+    def start_stub_server(self, **kwargs) -> StubSMTPServer:
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        server = StubSMTPServer(port=0, **kwargs)
+        asyncio.run_coroutine_threadsafe(server.start(), loop).result(5)
+
+        def stop() -> None:
+            asyncio.run_coroutine_threadsafe(server.stop(), loop).result(5)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(5)
+            loop.close()
+
+        self.addCleanup(stop)
+        return server
+
+
+class AsyncSMTPDispatcherTestCase(StubSMTPServerMixin, SimpleTestCase):
+    """Проверка асинхронного движка отправки и лимитера скорости на SMTP-сервере-заглушке"""
+
+    def setUp(self) -> None:
+        self.server = self.start_stub_server()
+        cache.clear()
+
+    def make_emails(self, count: int) -> list[OutgoingEmail]:
+        return [
+            OutgoingEmail(
+                from_email='sender@example.com',
+                recipients=[f'client{index}@example.com'],
+                data=f'Subject: Тема\r\n\r\nПисьмо {index}\r\n.начало строки с точкой'.encode()
+            )
+            for index in range(count)
+        ]
+
+    def make_dispatcher(self, **kwargs) -> AsyncSMTPDispatcher:
+        return AsyncSMTPDispatcher(host=self.server.host, port=self.server.port, timeout=5, **kwargs)
+
+    def test_sends_through_stub(self) -> None:
+        results = self.make_dispatcher(concurrency=2, messages_per_connection=2).send(self.make_emails(5))
+
+        self.assertEqual([result.success for result in results], [True] * 5)
+        self.assertEqual([result.code for result in results], [250] * 5)
+        self.assertEqual(self.server.received, 5)
+
+    def test_reconnects_once_when_connection_drops(self) -> None:
+        self.server.drop_after = 2
+        connects = []
+
+        results = self.make_dispatcher(
+            concurrency=1, messages_per_connection=5, observer=lambda name, _: connects.append(name)
+        ).send(self.make_emails(5))
+
+        self.assertEqual([result.success for result in results], [True] * 5)
+        self.assertEqual(self.server.received, 5)
+        self.assertTrue(self.server.dropped)
+        self.assertEqual(connects.count('smtp_connect'), 2)
+
+    def test_limiter_runs_outside_event_loop_thread(self) -> None:
+        threads = []
+
+        class RecordingLimiter:
+            def take(self) -> float:
+                threads.append(threading.get_ident())
+                return 0
+
+        results = self.make_dispatcher(limiter=RecordingLimiter()).send(self.make_emails(3))
+
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertTrue(all(result.success for result in results))
+
+    def test_daily_cap_defers_without_consuming_tokens(self) -> None:
+        limiter = TokenBucket(rate=0.001, burst=10, daily_cap=3, key_prefix='test_rate_limit')
+
+        results = self.make_dispatcher(limiter=limiter, max_wait=0, concurrency=1).send(self.make_emails(5))
+
+        self.assertEqual([result.success for result in results], [True] * 3 + [False] * 2)
+        self.assertEqual([result.deferred for result in results], [False] * 3 + [True] * 2)
+        self.assertEqual(self.server.received, 3)
+        tokens, _ = cache.get(limiter.state_key)
+        self.assertAlmostEqual(tokens, 7, delta=0.1)
+        self.assertIsNone(limiter.take())
+        self.assertAlmostEqual(cache.get(limiter.state_key)[0], 7, delta=0.1)
+
+
+class TokenBucketLockTestCase(SimpleTestCase):
+    """Проверка блокировки состояния лимитера скорости отправки в кеше"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.limiter = TokenBucket(rate=1, burst=1, key_prefix='test_lock')
+
+    def test_lock_is_released(self) -> None:
+        with self.limiter._lock():
+            self.assertIsNotNone(cache.get(self.limiter.lock_key))
+
+        self.assertIsNone(cache.get(self.limiter.lock_key))
+
+    def test_expired_lock_of_other_process_is_kept(self) -> None:
+        with self.limiter._lock():
+            # Блокировка истекла по LOCK_TIMEOUT, и ее взял другой процесс
+            cache.set(self.limiter.lock_key, 'other-process', timeout=None)
+
+        self.assertEqual(cache.get(self.limiter.lock_key), 'other-process')
+
+
+class AsyncDeliveryTestCase(StubSMTPServerMixin, TestCase):
+    """Проверка доставки писем рассылки асинхронным движком через SMTP-сервер-заглушку и записи логов"""
+
+    def setUp(self) -> None:
+        self.server = self.start_stub_server(rejected_recipients=('rejected@example.com',), keep_messages=True)
+        owner = User.objects.create(email='owner@example.com')
+        self.clients = [
+            Client.objects.create(email=email, name=name, owner=owner)
+            for email, name in (
+                ('ivanov@example.com', 'Иванов Иван'),
+                ('petrov@example.com', 'Петров Петр'),
+                ('rejected@example.com', 'Сидоров Сидор'),
+            )
+        ]
+        self.mailing = Mailing.objects.create(
+            start_time=timezone.now() - timedelta(days=1),
+            frequency=Mailing.FREQUENCY[0][0],
+            status=Mailing.STATUSES[1][0],
+            message=Message.objects.create(subject='Новости', body='Здравствуйте, {{ name }}!'),
+            owner=owner
+        )
+        self.mailing.recipients.set(self.clients)
+
+    def test_delivery_through_stub(self) -> None:
+        with simulation.patch_settings(
+            EMAIL_HOST=self.server.host,
+            EMAIL_PORT=self.server.port,
+            EMAIL_HOST_USER='sender@example.com',
+            EMAIL_HOST_PASSWORD=None,
+            EMAIL_USE_SSL=False,
+            MAILING_RATE_LIMIT=0,
+            MAILING_METRICS_ENABLED=False
+        ):
+            attempts = services.send_mailings_async([(self.mailing, client) for client in self.clients])
+
+        self.assertEqual(attempts, 3)
+        received = {}
+        for mail_from, recipients, data in self.server.messages:
+            self.assertEqual(mail_from, 'sender@example.com')
+            message = message_from_bytes(data, policy=policy.default)
+            self.assertEqual(message['Subject'], 'Новости')
+            received[recipients[0]] = message.get_content().strip()
+        self.assertEqual(received, {
+            'ivanov@example.com': 'Здравствуйте, Иванов Иван!',
+            'petrov@example.com': 'Здравствуйте, Петров Петр!',
+        })
+
+        logs = {log.client.email: (log.status, log.server_response) for log in Log.objects.select_related('client')}
+        self.assertEqual(logs, {
+            'ivanov@example.com': (Log.STATUSES[0][0], '250'),
+            'petrov@example.com': (Log.STATUSES[0][0], '250'),
+            'rejected@example.com': (Log.STATUSES[1][0], '550'),
+        })
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Проверка постраничного вывода по ключу: обход страниц по курсорам в обе стороны и неверные курсоры"""
+
+    PAGE_SIZE = 3
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        owner = User.objects.create(email='owner@example.com', is_active=True)
+        # Повторяющиеся имена проверяют упорядочивание по уникальному последнему полю
+        Client.objects.bulk_create([
+            Client(email=f'client{number}@example.com', name=f'Клиент {number % 4}', owner=owner)
+            for number in range(10)
+        ])
+        message = Message.objects.create(subject='Тема', body='Текст')
+        Mailing.objects.bulk_create([
+            Mailing(
+                start_time=timezone.now(),
+                frequency=Mailing.FREQUENCY[0][0],
+                message=message,
+                owner=owner
+            )
+            for _ in range(8)
+        ])
+        updated_at = timezone.now()
+        for number, mailing in enumerate(Mailing.objects.order_by('pk')):
+            Mailing.objects.filter(pk=mailing.pk).update(updated_at=updated_at - timedelta(minutes=number // 3))
+
+    def get_page(self, model, ordering: tuple[str, ...], **params):
+        view = type('PageView', (KeysetPaginationMixin, ListView), {'model': model, 'keyset_ordering': ordering})()
+        view.setup(RequestFactory().get('/', params))
+        return view.paginate_queryset(model.objects.all(), self.PAGE_SIZE)[1]
+
+    def assertRoundTrip(self, model, ordering: tuple[str, ...]) -> None:
+        expected = list(model.objects.order_by(*ordering).values_list('pk', flat=True))
+
+        forward = []
+        page = self.get_page(model, ordering)
+        self.assertFalse(page.has_previous())
+        pages = [page]
+        while page.has_next():
+            page = self.get_page(model, ordering, after=page.next_cursor)
+            pages.append(page)
+        for page in pages:
+            forward.extend(obj.pk for obj in page.object_list)
+        self.assertEqual(forward, expected)
+
+        backward = []
+        while page.has_previous():
+            page = self.get_page(model, ordering, before=page.previous_cursor)
+            backward = [obj.pk for obj in page.object_list] + backward
+        self.assertEqual(backward + [obj.pk for obj in pages[-1].object_list], expected)
+        self.assertEqual([obj.pk for obj in page.object_list], expected[:self.PAGE_SIZE])
+
+    def test_round_trip_ascending(self) -> None:
+        self.assertRoundTrip(Client, ('name', 'id'))
+
+    def test_round_trip_descending_datetime(self) -> None:
+        self.assertRoundTrip(Mailing, ('-updated_at', '-id'))
+
+    def test_cursor_round_trip(self) -> None:
+        mailing = Mailing.objects.first()
+        ordering = ('-updated_at', '-id')
+
+        values = decode_cursor(encode_cursor([mailing.updated_at, mailing.pk]), Mailing.objects.all(), ordering)
+
+        self.assertEqual(values, [mailing.updated_at, mailing.pk])
+
+    def test_invalid_cursor(self) -> None:
+        ordering = ('name', 'id')
+        cursors = {
+            'not base64': '!!!',
+            'not json': encode_cursor([1])[:-2] + '@@',
+            'not a list': 'eyJpZCI6IDF9',
+            'wrong length': encode_cursor(['Клиент 1']),
+            'wrong type': encode_cursor(['Клиент 1', 'abc']),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(name):
+                with self.assertRaises(Http404):
+                    decode_cursor(cursor, Client.objects.all(), ordering)
+
+    def test_tampered_cursor_returns_404(self) -> None:
+        self.client.force_login(User.objects.get(email='owner@example.com'))
+
+        response = self.client.get(reverse('mailing:mailing_list'), {'after': 'tampered'})
+
+        self.assertEqual(response.status_code, 404)
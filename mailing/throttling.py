@@ -0,0 +1,135 @@
+"""
+Ограничение скорости отправки писем под лимиты почтового провайдера.
+
+Лимитер реализован как "ведро токенов" (token bucket) с размером всплеска (burst),
+постоянной скоростью пополнения (rate, писем в секунду) и дневным лимитом писем (daily_cap).
+Состояние хранится в кеше Django, поэтому лимит общий для всех процессов отправки
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+class TokenBucket:
+    """
+    Лимитер скорости отправки писем.
+
+    Метод take пытается забрать токен и возвращает 0 при успехе,
+    время ожидания следующего токена в секундах, если ведро пусто,
+    или None, если исчерпан дневной лимит писем.
+    Дневной лимит проверяется до того, как забирается токен,
+    поэтому отклоненные отправки не расходуют токены
+    """
+
+    LOCK_TIMEOUT = 5
+
+    def __init__(self, rate: float, burst: int, daily_cap: int | None = None,
+                 key_prefix: str = 'mailing_rate_limit') -> None:
+        self.rate = rate
+        self.burst = burst
+        self.daily_cap = daily_cap
+        self.state_key = f'{key_prefix}:bucket'
+        self.lock_key = f'{key_prefix}:lock'
+        self.day_key_prefix = f'{key_prefix}:day'
+
+    @contextmanager
+    def _lock(self):
+        # Уникальное значение блокировки: если владелец работал дольше LOCK_TIMEOUT
+        # и блокировку уже взял другой процесс, чужая блокировка не снимается
+        token = uuid.uuid4().hex
+        while not cache.add(self.lock_key, token, timeout=self.LOCK_TIMEOUT):
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            if cache.get(self.lock_key) == token:
+                cache.delete(self.lock_key)
+
+    def _get_day_key(self) -> str:
+        return f'{self.day_key_prefix}:{timezone.localdate().isoformat()}'
+
+    def _daily_exhausted(self) -> bool:
+        return bool(self.daily_cap) and cache.get(self._get_day_key(), 0) >= self.daily_cap
+
+    def _take_daily(self) -> bool:
+        if not self.daily_cap:
+            return True
+
+        day_key = self._get_day_key()
+        cache.add(day_key, 0, timeout=2 * 24 * 60 * 60)
+        if cache.incr(day_key) > self.daily_cap:
+            cache.decr(day_key)
+            return False
+        return True
+
+    def take(self) -> float | None:
+        with self._lock():
+            if self._daily_exhausted():
+                return None
+
+            now = time.time()
+            tokens, updated = cache.get(self.state_key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+            if tokens < 1:
+                cache.set(self.state_key, (tokens, now), timeout=None)
+                return (1 - tokens) / self.rate
+
+            if not self._take_daily():
+                cache.set(self.state_key, (tokens, now), timeout=None)
+                return None
+
+            cache.set(self.state_key, (tokens - 1, now), timeout=None)
+        return 0
+
+    def get_daily_reset(self) -> datetime | None:
+        """
+        Время сброса дневного лимита (начало следующего дня),
+        если лимит на сегодня исчерпан, иначе None
+        """
+
+        if not self._daily_exhausted():
+            return None
+        return timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), datetime.min.time()))
+
+    def acquire(self, max_wait: float) -> bool:
+        """
+        Получение разрешения на отправку одного письма.
+
+        Если токен появится не позже чем через max_wait секунд, функция дожидается его,
+        иначе (а также при исчерпании дневного лимита) возвращает False -
+        такое письмо нужно отложить до следующего запуска отправки
+        """
+
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.take()
+            if wait is None:
+                return False
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+def get_rate_limiter() -> TokenBucket | None:
+    """
+    Функция, возвращающая лимитер скорости отправки писем по настройкам проекта
+    или None, если ограничение скорости не настроено
+    """
+
+    if not settings.MAILING_RATE_LIMIT:
+        return None
+
+    return TokenBucket(
+        rate=settings.MAILING_RATE_LIMIT,
+        burst=settings.MAILING_RATE_BURST,
+        daily_cap=settings.MAILING_DAILY_CAP
+    )
@@ -3,7 +3,7 @@ from django.views.decorators.cache import cache_page
 
 from mailing.apps import MailingConfig
 from mailing.views import HomeView, ClientCreateView, ClientListView, ClientUpdateView, ClientDeleteView, \
-    MailingDetailView, deactivate_mailing
+    MailingDetailView, deactivate_mailing, dispatch_metrics
 from mailing.views import MailingListView, MailingCreateView, MailingUpdateView, MailingDeleteView
 
 app_name = MailingConfig.name
@@ -20,4 +20,5 @@ urlpatterns = [
     path('<int:pk>/delete_mailing/', MailingDeleteView.as_view(), name='delete_mailing'),
     path('<int:pk>/mailing_card/', MailingDetailView.as_view(), name='mailing_card'),
     path('<int:pk>/deactivate_mailing/', deactivate_mailing, name='deactivate_mailing'),
+    path('metrics/', dispatch_metrics, name='metrics'),
 ]
@@ -1,16 +1,21 @@
+import secrets
+
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import QuerySet
+from django.db.models import Prefetch, QuerySet
 from django.forms import inlineformset_factory, Form
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, HttpResponseForbidden
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, ListView, UpdateView, DeleteView, DetailView
 
 from blog.models import BlogEntry
-from mailing import services
+from config import settings
+from config.pagination import KeysetPaginationMixin
+from mailing import metrics, services
 from mailing.forms import ClientForm, MailingForm, MessageForm
 from mailing.models import Client, Message, Log, Mailing
+from users.services import has_manager_access, has_manager_role
 
 
 class MailingAndMessageSaveMixin:
@@ -74,12 +79,13 @@ class MailingAndMessageSaveMixin:
 class OnlyForOwnerOrSuperuserMixin:
     """
     Миксин, ограничивающий демонстрацию страницы объекта для пользователя,
-    который не является ни владельцем объекта, ни суперюзером
+    который не является ни владельцем объекта, ни суперюзером.
+    Владелец сравнивается по идентификатору, без загрузки объекта пользователя
     """
 
     def get_object(self, queryset=None):
         self.object = super().get_object(queryset)
-        if self.object.owner != self.request.user and not self.request.user.is_superuser:
+        if self.object.owner_id != self.request.user.pk and not self.request.user.is_superuser:
             raise Http404
         return self.object
 
@@ -150,7 +156,7 @@ class ClientCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class ClientListView(LoginRequiredMixin, ListView):
+class ClientListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Класс-контроллер для отображения списка клиентов.
 
@@ -158,20 +164,22 @@ class ClientListView(LoginRequiredMixin, ListView):
     Список клиентов зависит от статуса текущего пользователя:
     обычный юзер может видеть только клиентов, которых он создавал,
     менеджер и суперюзер могут видеть весь перечень клиентов,
-    существующий в базе данных
+    существующий в базе данных.
+    Клиенты выводятся постранично по ключу (имя, id)
     """
 
     model = Client
     template_name = 'mailing/recipients_list.html'
+    keyset_ordering = ('name', 'id')
 
     def get_queryset(self) -> QuerySet:
         user = self.request.user
-        is_manager = user.groups.filter(name='Managers').exists()
+        is_manager = has_manager_role(user)
         if user.is_superuser or is_manager:
             queryset = super().get_queryset().all()
         else:
             queryset = super().get_queryset().filter(owner=user)
-        return queryset.order_by('name')
+        return queryset.select_related('owner').only('name', 'email', 'comment', 'owner', 'owner__email')
 
 
 class ClientUpdateView(LoginRequiredMixin, OnlyForOwnerOrSuperuserMixin, UpdateView):
@@ -189,13 +197,12 @@ class ClientUpdateView(LoginRequiredMixin, OnlyForOwnerOrSuperuserMixin, UpdateV
 
     def get_context_data(self, **kwargs) -> dict:
         """
-        Добавление в контекст конкретного объекта модели Client,
-        а также надписи в заголовке и на кнопке
+        Добавление в контекст надписи в заголовке и на кнопке
+        (объект модели Client уже передан в контекст как object)
         """
 
         context_data = super().get_context_data(**kwargs)
         extra_context = {
-            'object': Client.objects.get(pk=self.kwargs.get('pk')),
             'title': 'Изменить контакт',
             'button': 'Сохранить',
         }
@@ -228,31 +235,31 @@ class ClientDeleteView(LoginRequiredMixin, OnlyForOwnerOrSuperuserMixin, DeleteV
     template_name = 'mailing/recipient_delete.html'
     success_url = reverse_lazy('mailing:recipients_list')
 
-    def get_context_data(self, **kwargs) -> dict:
-        context_data = super().get_context_data(**kwargs)
-        context_data['object'] = Client.objects.get(pk=self.kwargs.get('pk'))
-        return context_data
-
 
-class MailingListView(LoginRequiredMixin, ListView):
+class MailingListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Класс-контроллер для отображения списка рассылок.
 
     Обычный пользователь может видеть только те рассылки, которые создал сам,
-    менеджеры и суперюзеры могут видеть весь существующий список рассылок
+    менеджеры и суперюзеры могут видеть весь существующий список рассылок.
+    Рассылки выводятся постранично по ключу (время изменения, id) от новых к старым
     """
 
     model = Mailing
     template_name = 'mailing/mailing_list.html'
+    keyset_ordering = ('-updated_at', '-id')
 
     def get_queryset(self) -> QuerySet:
         user = self.request.user
-        is_manager = user.groups.filter(name='Managers').exists()
+        is_manager = has_manager_role(user)
         if user.is_superuser or is_manager:
             queryset = super().get_queryset().all()
         else:
             queryset = super().get_queryset().filter(owner=user)
-        return queryset.order_by('-updated_at')
+        return queryset.select_related('message', 'owner').only(
+            'start_time', 'end_time', 'frequency', 'status', 'updated_at',
+            'message', 'message__subject', 'owner', 'owner__email'
+        )
 
 
 class MailingCreateView(LoginRequiredMixin, MailingAndMessageSaveMixin, CreateView):
@@ -283,6 +290,9 @@ class MailingUpdateView(LoginRequiredMixin, OnlyForOwnerOrSuperuserMixin, Mailin
     extra_context = {'button': 'Сохранить', 'title': 'Изменить рассылку'}
     success_url = reverse_lazy('mailing:mailing_list')
 
+    def get_queryset(self) -> QuerySet:
+        return super().get_queryset().select_related('message')
+
 
 class MailingDeleteView(LoginRequiredMixin, OnlyForOwnerOrSuperuserMixin, DeleteView):
     """
@@ -296,10 +306,8 @@ class MailingDeleteView(LoginRequiredMixin, OnlyForOwnerOrSuperuserMixin, Delete
     template_name = 'mailing/mailing_delete.html'
     success_url = reverse_lazy('mailing:mailing_list')
 
-    def get_context_data(self, **kwargs) -> dict:
-        context_data = super().get_context_data(**kwargs)
-        context_data['object'] = Mailing.objects.get(pk=self.kwargs.get('pk'))
-        return context_data
+    def get_queryset(self) -> QuerySet:
+        return super().get_queryset().select_related('message')
 
 
 class MailingDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
@@ -307,19 +315,31 @@ class MailingDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
     Класс-контроллер для просмотра деталей объекта рассылки.
 
     Доступ есть только у владельца рассылки (тот, кто создал рассылку), а также
-    у менеджеров и суперюзера
+    у менеджеров и суперюзера.
+    Объект рассылки загружается один раз (в проверке доступа) вместе с сообщением и владельцем,
+    получатели загружаются одним запросом
     """
     model = Mailing
     template_name = 'mailing/mailing_card.html'
 
+    def get_queryset(self) -> QuerySet:
+        return super().get_queryset().select_related('message', 'owner').prefetch_related(
+            Prefetch('recipients', queryset=Client.objects.only('name'))
+        )
+
+    def get_object(self, queryset=None) -> Mailing:
+        if getattr(self, 'object', None) is None:
+            self.object = super().get_object(queryset)
+        return self.object
+
     def test_func(self):
         user = self.request.user
-        is_manager = user.groups.filter(name='Managers').exists()
-        is_owner = user == self.get_object().owner
+        is_manager = has_manager_role(user)
+        is_owner = user.pk == self.get_object().owner_id
         return user.is_superuser or is_manager or is_owner
 
 
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='Managers').exists())
+@user_passes_test(has_manager_access)
 def deactivate_mailing(request, pk):
     """
     Контроллер для деактивации рассылки.
@@ -333,3 +353,21 @@ def deactivate_mailing(request, pk):
 
     return redirect('mailing:mailing_list')
 
+
+def dispatch_metrics(request):
+    """
+    Контроллер страницы метрик последнего запуска отправки писем в формате Prometheus.
+
+    Доступен суперюзерам, а также по заголовку Authorization: Bearer <токен>,
+    если задан токен MAILING_METRICS_TOKEN
+    """
+
+    token = settings.MAILING_METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_superuser or token and secrets.compare_digest(authorization, f'Bearer {token}')):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        metrics.render_prometheus(metrics.get_last_run()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
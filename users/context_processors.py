@@ -1,5 +1,7 @@
 from urllib.request import Request
 
+from users.services import has_manager_role
+
 
 def is_manager(request: Request) -> dict:
     """
@@ -7,7 +9,4 @@ def is_manager(request: Request) -> dict:
     принадлежит ли текущий пользователь к группе менеджеров
     """
 
-    if request.user.is_authenticated:
-        return {'is_manager': request.user.groups.filter(name='Managers').exists()}
-    else:
-        return {'is_manager': False}
+    return {'is_manager': has_manager_role(request.user)}
@@ -1,12 +1,14 @@
 from django.contrib.auth.models import Group
 from django.core.management import BaseCommand
 
+from users.services import MANAGERS_GROUP
+
 
 class Command(BaseCommand):
     """Кастомная консольная команда для создания группы менеджеров ('Managers')"""
 
     def handle(self, *args, **options) -> None:
-        group, created = Group.objects.get_or_create(name='Managers')
+        group, created = Group.objects.get_or_create(name=MANAGERS_GROUP)
         if created:
             print('Группа "Managers" была успешно создана')
         else:
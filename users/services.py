@@ -1,6 +1,11 @@
+from collections.abc import Iterable
+
+from django.core.cache import cache
 from django.core.mail import send_mail
 from config import settings
 
+MANAGERS_GROUP = 'Managers'
+
 
 def send_verification_url(email: str, url: str) -> None:
     """Функция для отправки ссылки верификации на почту юзера"""
@@ -11,4 +16,45 @@ def send_verification_url(email: str, url: str) -> None:
                 f'{url}',
         from_email=settings.EMAIL_HOST_USER,
         recipient_list=[email]
-    )
\ No newline at end of file
+    )
+
+
+def get_manager_role_key(user_id: int) -> str:
+    """Функция, возвращающая ключ кеша признака принадлежности пользователя к группе менеджеров"""
+
+    return f'user_manager_role:{user_id}'
+
+
+def has_manager_role(user) -> bool:
+    """
+    Функция проверки, принадлежит ли пользователь к группе менеджеров.
+
+    Результат запоминается на объекте пользователя (request.user один на весь запрос),
+    поэтому в пределах запроса группа проверяется не больше одного раза,
+    а при включенном кеше хранится в кеше Django до изменения групп пользователя
+    """
+
+    if not user.is_authenticated:
+        return False
+
+    if not hasattr(user, '_has_manager_role'):
+        key = get_manager_role_key(user.pk)
+        role = cache.get(key) if settings.CACHE_ENABLED else None
+        if role is None:
+            role = user.groups.filter(name=MANAGERS_GROUP).exists()
+            if settings.CACHE_ENABLED:
+                cache.set(key, role, timeout=settings.USER_ROLE_CACHE_TIMEOUT)
+        user._has_manager_role = role
+    return user._has_manager_role
+
+
+def has_manager_access(user) -> bool:
+    """Функция проверки, является ли пользователь менеджером или суперюзером"""
+
+    return user.is_superuser or has_manager_role(user)
+
+
+def invalidate_manager_role(user_ids: Iterable[int]) -> None:
+    """Функция, сбрасывающая кеш признака принадлежности пользователей к группе менеджеров"""
+
+    cache.delete_many([get_manager_role_key(user_id) for user_id in set(user_ids)])
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from users import services
+from users.models import User
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_role_on_groups_change(sender, instance, action: str, reverse: bool, pk_set: set | None,
+                                     **kwargs) -> None:
+    """
+    Сбрасывает кеш роли пользователей при изменении их групп
+    как со стороны пользователя (user.groups), так и со стороны группы (group.user_set).
+    При очистке группы пользователи определяются до удаления связей (pre_clear)
+    """
+
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        services.invalidate_manager_role([instance.pk])
+    elif action == 'pre_clear':
+        services.invalidate_manager_role(instance.user_set.values_list('pk', flat=True))
+    elif pk_set:
+        services.invalidate_manager_role(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_role_on_group_change(sender, instance: Group, **kwargs) -> None:
+    """
+    Сбрасывает кеш роли участников группы при ее переименовании или удалении
+    (удаление группы удаляет связи с пользователями без сигнала m2m_changed)
+    """
+
+    services.invalidate_manager_role(instance.user_set.values_list('pk', flat=True))
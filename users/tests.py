@@ -1,3 +1,73 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from config import settings as config_settings
+from users.models import User
+from users.services import MANAGERS_GROUP, has_manager_role
+
+
+class ManagerRoleCacheTestCase(TestCase):
+    """Проверка сброса кеша роли менеджера при изменении групп пользователя и самой группы менеджеров"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.enterContext(mock.patch.object(config_settings, 'CACHE_ENABLED', True))
+        self.user = User.objects.create(email='user@example.com')
+        self.managers = Group.objects.create(name=MANAGERS_GROUP)
+
+    def has_role(self) -> bool:
+        # Новый объект пользователя, чтобы роль не бралась из запомненной на объекте
+        return has_manager_role(User.objects.get(pk=self.user.pk))
+
+    def test_add_group(self) -> None:
+        for side, add in (('user', self.user.groups.add), ('group', lambda group: group.user_set.add(self.user))):
+            with self.subTest(side):
+                self.user.groups.clear()
+                self.assertFalse(self.has_role())
+
+                add(self.managers)
+
+                self.assertTrue(self.has_role())
+
+    def test_remove_group(self) -> None:
+        for side, remove in (
+            ('user', self.user.groups.remove),
+            ('group', lambda group: group.user_set.remove(self.user))
+        ):
+            with self.subTest(side):
+                self.user.groups.add(self.managers)
+                self.assertTrue(self.has_role())
+
+                remove(self.managers)
+
+                self.assertFalse(self.has_role())
+
+    def test_clear_groups(self) -> None:
+        for side, clear in (('user', self.user.groups.clear), ('group', self.managers.user_set.clear)):
+            with self.subTest(side):
+                self.user.groups.add(self.managers)
+                self.assertTrue(self.has_role())
+
+                clear()
+
+                self.assertFalse(self.has_role())
+
+    def test_rename_group(self) -> None:
+        self.user.groups.add(self.managers)
+        self.assertTrue(self.has_role())
+
+        self.managers.name = 'Former managers'
+        self.managers.save()
+
+        self.assertFalse(self.has_role())
+
+    def test_delete_group(self) -> None:
+        self.user.groups.add(self.managers)
+        self.assertTrue(self.has_role())
+
+        self.managers.delete()
+
+        self.assertFalse(self.has_role())
@@ -9,6 +9,8 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy, reverse
 from django.views.generic import CreateView, UpdateView, ListView
 from django.contrib import messages
+
+from config.pagination import KeysetPaginationMixin
 from users import services
 from users.forms import LoginForm, UserRegisterForm, UserForm
 from users.models import User
@@ -75,23 +77,22 @@ def verification(request, verification_code: str) -> HttpResponse:
     return redirect(reverse('users:login'))
 
 
-class UserListView(UserPassesTestMixin, ListView):
+class UserListView(UserPassesTestMixin, KeysetPaginationMixin, ListView):
     """
     Класс-контроллер для отображения страницы со списком всех зарегистрированных пользователей.
-    Страница доступна только менеджерам и суперюзерам
+    Страница доступна только менеджерам и суперюзерам,
+    пользователи выводятся постранично по ключу (e-mail, id)
     """
 
     model = User
     template_name = 'users/users_list.html'
-    ordering = 'email'
+    keyset_ordering = ('email', 'id')
 
     def test_func(self) -> bool:
-        user = self.request.user
-        is_manager = user.groups.filter(name='Managers').exists()
-        return user.is_superuser or is_manager
+        return services.has_manager_access(self.request.user)
 
 
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='Managers').exists())
+@user_passes_test(services.has_manager_access)
 def deactivate_user(request, pk: int) -> HttpResponse:
     """
     Контроллер для изменения статуса пользователя с активного на неактивный и наоборот.
@@ -103,4 +104,3 @@ def deactivate_user(request, pk: int) -> HttpResponse:
     user.save()
 
     return redirect('users:users_list')
-